@@ -22,6 +22,9 @@ from app.models.user_models import SQLModel  # noqa
 from app.models.product_models import Product  # noqa
 from app.models.order_models import Order  # noqa
 from app.models.customer_models import Customer  # noqa
+from app.models.dashboard_models import EntityCounter  # noqa
+from app.models.exchange_rate_models import ExchangeRateSnapshot  # noqa
+from app.models.search_models import SearchResult  # noqa
 from app.core.config import settings # noqa
 
 target_metadata = SQLModel.metadata
@@ -0,0 +1,41 @@
+"""Add entity counters table
+
+Revision ID: 0340491de71b
+Revises: 82afe6a326cd
+Create Date: 2026-10-18 16:02:27.514309
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '0340491de71b'
+down_revision = '82afe6a326cd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'entity_counters',
+        sa.Column('entity', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('is_valid', sa.Boolean(), nullable=False),
+        sa.Column('status', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('entity', 'is_valid', 'status'),
+    )
+    # Count the existing rows, a null is_valid is counted as invalid like the list filters do
+    op.execute('''
+        INSERT INTO entity_counters (entity, is_valid, status, count)
+        SELECT 'customer', is_valid IS TRUE, '', count(*) FROM customer GROUP BY 2
+        UNION ALL
+        SELECT 'product', is_valid IS TRUE, '', count(*) FROM product GROUP BY 2
+        UNION ALL
+        SELECT 'order', is_valid IS TRUE, coalesce(order_status, ''), count(*) FROM "order" GROUP BY 2, 3
+    ''')
+
+
+def downgrade():
+    op.drop_table('entity_counters')
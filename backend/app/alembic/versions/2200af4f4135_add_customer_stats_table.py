@@ -0,0 +1,52 @@
+"""Add customer stats table
+
+Revision ID: 2200af4f4135
+Revises: 453dfb0121a1
+Create Date: 2026-10-18 18:02:41.530718
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2200af4f4135'
+down_revision = '453dfb0121a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'customer_stats',
+        sa.Column('customer_id', sa.Uuid(), nullable=False),
+        sa.Column('order_count', sa.Integer(), nullable=False),
+        sa.Column('lifetime_revenue', sa.Float(), nullable=False),
+        sa.Column('first_order_date', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('last_order_date', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('average_order_value', sa.Float(), sa.Computed(
+            'CASE WHEN order_count > 0 THEN lifetime_revenue / order_count ELSE 0 END', persisted=True,
+        ), nullable=True),
+        sa.ForeignKeyConstraint(['customer_id'], ['customer.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('customer_id'),
+    )
+    op.create_index('ix_customer_stats_order_count', 'customer_stats', ['order_count', 'customer_id'], unique=False)
+    op.create_index('ix_customer_stats_lifetime_revenue', 'customer_stats', ['lifetime_revenue', 'customer_id'], unique=False)
+    op.create_index('ix_customer_stats_average_order_value', 'customer_stats', ['average_order_value', 'customer_id'], unique=False)
+
+    # Every customer gets a row, customers without orders start at zero. Like
+    # the incremental updates, undated orders are left out
+    op.execute('''
+        INSERT INTO customer_stats (customer_id, order_count, lifetime_revenue, first_order_date, last_order_date)
+        SELECT c.id, count(o.id), coalesce(sum(o.total_price), 0), min(o.order_date), max(o.order_date)
+        FROM customer c
+        LEFT JOIN "order" o ON o.customer_id = c.id::text AND o.is_valid AND o.order_date IS NOT NULL
+        GROUP BY c.id
+    ''')
+
+
+def downgrade():
+    op.drop_index('ix_customer_stats_average_order_value', table_name='customer_stats')
+    op.drop_index('ix_customer_stats_lifetime_revenue', table_name='customer_stats')
+    op.drop_index('ix_customer_stats_order_count', table_name='customer_stats')
+    op.drop_table('customer_stats')
@@ -0,0 +1,114 @@
+"""Convert order dates to timestamptz
+
+Revision ID: 3d5f0c8e7a21
+Revises: ab4912d7bbb0
+Create Date: 2026-10-18 11:26:52.918344
+
+The string columns are converted online: new timestamptz columns are added,
+kept in sync by a trigger while they are backfilled in small batches (one
+short transaction each), then swapped in under a brief lock.
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '3d5f0c8e7a21'
+down_revision = 'ab4912d7bbb0'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+# Old values are "YYYY-MM-DD HH:MM:SS" strings written in UTC. The columns
+# were free-form, empty or unparsable values become NULL instead of failing
+# the backfill halfway through
+TO_TIMESTAMPTZ = "order_date_to_timestamptz({column})"
+
+
+def upgrade():
+    op.add_column('order', sa.Column('order_date_ts', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('order', sa.Column('order_update_date_ts', sa.DateTime(timezone=True), nullable=True))
+
+    op.execute('''
+        CREATE FUNCTION order_date_to_timestamptz(value text) RETURNS timestamptz AS $$
+        BEGIN
+            RETURN CAST(NULLIF(trim(value), '') AS timestamp) AT TIME ZONE 'UTC';
+        EXCEPTION WHEN data_exception THEN
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql IMMUTABLE
+    ''')
+
+    # Keep rows written by the running application in sync during the backfill
+    op.execute(f'''
+        CREATE FUNCTION order_dates_ts_sync() RETURNS trigger AS $$
+        BEGIN
+            NEW.order_date_ts := {TO_TIMESTAMPTZ.format(column="NEW.order_date")};
+            NEW.order_update_date_ts := {TO_TIMESTAMPTZ.format(column="NEW.order_update_date")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    ''')
+    op.execute('''
+        CREATE TRIGGER order_dates_ts_sync BEFORE INSERT OR UPDATE ON "order"
+        FOR EACH ROW EXECUTE PROCEDURE order_dates_ts_sync()
+    ''')
+
+    # Backfill in id order, committing every batch so no lock is held for long
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        last_id = ''
+        while True:
+            batch = connection.execute(sa.text(f'''
+                WITH batch AS (
+                    SELECT id FROM "order" WHERE id > :last_id ORDER BY id LIMIT :batch_size
+                )
+                UPDATE "order"
+                SET order_date_ts = {TO_TIMESTAMPTZ.format(column='"order".order_date')},
+                    order_update_date_ts = {TO_TIMESTAMPTZ.format(column='"order".order_update_date')}
+                FROM batch
+                WHERE "order".id = batch.id
+                RETURNING "order".id,
+                          (order_date_ts IS NULL AND NULLIF(trim(order_date), '') IS NOT NULL)
+                          OR (order_update_date_ts IS NULL AND NULLIF(trim(order_update_date), '') IS NOT NULL)
+            '''), {"last_id": last_id, "batch_size": BATCH_SIZE}).all()
+            if not batch:
+                break
+            for order_id, unparsable in batch:
+                if unparsable:
+                    logger.warning("Clearing unparsable dates of order %s", order_id)
+            last_id = max(order_id for order_id, _ in batch)
+
+    # Swap the columns, the trigger kept every row current so this is metadata only
+    op.execute('LOCK TABLE "order" IN ACCESS EXCLUSIVE MODE')
+    op.execute('DROP TRIGGER order_dates_ts_sync ON "order"')
+    op.execute('DROP FUNCTION order_dates_ts_sync()')
+    op.execute('DROP FUNCTION order_date_to_timestamptz(text)')
+    op.drop_column('order', 'order_date')
+    op.drop_column('order', 'order_update_date')
+    op.alter_column('order', 'order_date_ts', new_column_name='order_date')
+    op.alter_column('order', 'order_update_date_ts', new_column_name='order_update_date')
+
+    with op.get_context().autocommit_block():
+        op.create_index('ix_order_is_valid_order_date', 'order',
+                        ['is_valid', 'order_date', 'id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    op.drop_index('ix_order_is_valid_order_date', table_name='order')
+    op.alter_column('order', 'order_date',
+                    existing_type=sa.DateTime(timezone=True),
+                    type_=sqlmodel.sql.sqltypes.AutoString(),
+                    postgresql_using="to_char(order_date AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')")
+    op.alter_column('order', 'order_update_date',
+                    existing_type=sa.DateTime(timezone=True),
+                    type_=sqlmodel.sql.sqltypes.AutoString(),
+                    postgresql_using="to_char(order_update_date AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')")
@@ -0,0 +1,25 @@
+"""Add order rate snapshot
+
+Revision ID: 453dfb0121a1
+Revises: 0340491de71b
+Create Date: 2026-10-18 17:20:03.118472
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '453dfb0121a1'
+down_revision = '0340491de71b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing totals were computed by the frontend, their rates are unknown
+    op.add_column('order', sa.Column('rate_snapshot', sa.JSON(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('order', 'rate_snapshot')
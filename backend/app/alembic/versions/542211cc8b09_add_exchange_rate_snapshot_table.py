@@ -0,0 +1,34 @@
+"""Add exchange rate snapshot table
+
+Revision ID: 542211cc8b09
+Revises: 69ad4bcdaadc
+Create Date: 2026-10-18 20:24:09.318502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '542211cc8b09'
+down_revision = '69ad4bcdaadc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'exchange_rate_snapshot',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fetched_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('source', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column('rates', sa.JSON(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_exchange_rate_snapshot_fetched_at'), 'exchange_rate_snapshot', ['fetched_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_exchange_rate_snapshot_fetched_at'), table_name='exchange_rate_snapshot')
+    op.drop_table('exchange_rate_snapshot')
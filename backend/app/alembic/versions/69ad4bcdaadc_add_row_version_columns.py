@@ -0,0 +1,32 @@
+"""Add row version columns for delta sync
+
+Revision ID: 69ad4bcdaadc
+Revises: 2200af4f4135
+Create Date: 2026-10-18 19:11:27.804153
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '69ad4bcdaadc'
+down_revision = '2200af4f4135'
+branch_labels = None
+depends_on = None
+
+TABLES = ('order', 'product', 'customer')
+
+
+def upgrade():
+    # The default is volatile, so the tables are rewritten and existing rows
+    # all get the version of this migration
+    for table in TABLES:
+        op.add_column(table, sa.Column('row_version', sa.BigInteger(), server_default=sa.text('txid_current()'), nullable=True))
+        op.create_index(op.f(f'ix_{table}_row_version'), table, ['row_version'], unique=False)
+
+
+def downgrade():
+    for table in TABLES:
+        op.drop_index(op.f(f'ix_{table}_row_version'), table_name=table)
+        op.drop_column(table, 'row_version')
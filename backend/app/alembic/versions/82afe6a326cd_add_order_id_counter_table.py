@@ -0,0 +1,37 @@
+"""Add order id counter table
+
+Revision ID: 82afe6a326cd
+Revises: 8b27e4f1c6d9
+Create Date: 2026-10-18 15:12:40.381925
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '82afe6a326cd'
+down_revision = '8b27e4f1c6d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'order_id_counter',
+        sa.Column('period', sa.Integer(), nullable=False),
+        sa.Column('last_value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('period'),
+    )
+    # Continue numbering after the highest existing id of every month
+    op.execute('''
+        INSERT INTO order_id_counter (period, last_value)
+        SELECT id::bigint / 10000, max(id::bigint % 10000)
+        FROM "order"
+        WHERE id ~ '^[0-9]{9,10}$'
+        GROUP BY id::bigint / 10000
+    ''')
+
+
+def downgrade():
+    op.drop_table('order_id_counter')
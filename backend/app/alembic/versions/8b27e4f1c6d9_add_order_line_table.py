@@ -0,0 +1,97 @@
+"""Add order line table replacing order.order_items
+
+Revision ID: 8b27e4f1c6d9
+Revises: 3d5f0c8e7a21
+Create Date: 2026-10-18 13:05:19.640127
+
+"""
+import json
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = '8b27e4f1c6d9'
+down_revision = '3d5f0c8e7a21'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+
+def upgrade():
+    op.create_table(
+        'order_line',
+        sa.Column('order_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('product_id', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column('line_no', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Float(), nullable=False),
+        sa.Column('unit_price', sa.Float(), nullable=True),
+        sa.Column('currency', sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.ForeignKeyConstraint(['order_id'], ['order.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('order_id', 'product_id'),
+    )
+    op.create_index(op.f('ix_order_line_product_id'), 'order_line', ['product_id'], unique=False)
+
+    # The products table is small, the current price is the best known sale price
+    connection = op.get_bind()
+    products = {
+        product_id: (unit_price, price_currency)
+        for product_id, unit_price, price_currency in connection.execute(
+            sa.text('SELECT id, unit_price, price_currency FROM product')
+        )
+    }
+
+    # Parse the JSON of every order in id order, one batch at a time
+    last_id = ''
+    while True:
+        orders = connection.execute(sa.text('''
+            SELECT id, order_items FROM "order"
+            WHERE id > :last_id ORDER BY id LIMIT :batch_size
+        '''), {"last_id": last_id, "batch_size": BATCH_SIZE}).all()
+        if not orders:
+            break
+        last_id = orders[-1].id
+
+        lines = []
+        for order_id, order_items in orders:
+            if not order_items:
+                continue
+            try:
+                items = json.loads(order_items)
+                quantities = {str(product_id): float(quantity) for product_id, quantity in items.items()}
+            except (AttributeError, TypeError, ValueError):
+                logger.warning("Skipping unparsable order_items of order %s", order_id)
+                continue
+            for line_no, (product_id, quantity) in enumerate(quantities.items()):
+                unit_price, currency = products.get(product_id, (None, None))
+                lines.append({
+                    "order_id": order_id, "product_id": product_id, "line_no": line_no,
+                    "quantity": quantity, "unit_price": unit_price, "currency": currency,
+                })
+        if lines:
+            connection.execute(sa.text('''
+                INSERT INTO order_line (order_id, product_id, line_no, quantity, unit_price, currency)
+                VALUES (:order_id, :product_id, :line_no, :quantity, :unit_price, :currency)
+            '''), lines)
+
+    op.drop_column('order', 'order_items')
+
+
+def downgrade():
+    op.add_column('order', sa.Column('order_items', sa.VARCHAR(length=65025), nullable=True))
+    op.execute('''
+        UPDATE "order" SET order_items = lines.order_items
+        FROM (
+            SELECT order_id, json_object_agg(product_id, quantity ORDER BY line_no)::text AS order_items
+            FROM order_line GROUP BY order_id
+        ) AS lines
+        WHERE "order".id = lines.order_id
+    ''')
+    op.drop_index(op.f('ix_order_line_product_id'), table_name='order_line')
+    op.drop_table('order_line')
@@ -0,0 +1,46 @@
+"""Add full text search indexes on customers, products and orders
+
+Revision ID: a5cf749b73d9
+Revises: 542211cc8b09
+Create Date: 2026-10-18 22:41:37.105283
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5cf749b73d9'
+down_revision = '542211cc8b09'
+branch_labels = None
+depends_on = None
+
+# Must stay identical to the documents in app.models.search_models
+SEARCH_DOCUMENTS = {
+    'customer': (
+        "setweight(to_tsvector('simple', coalesce(company, '')), 'A')"
+        " || setweight(to_tsvector('simple', coalesce(full_name, '')), 'B')"
+        " || setweight(to_tsvector('simple', coalesce(email, '')), 'C')"
+        " || setweight(to_tsvector('simple', coalesce(translate(email, '@.', '  '), '')), 'C')"
+        " || setweight(to_tsvector('simple', coalesce(phone, '')), 'C')"
+    ),
+    'product': (
+        "setweight(to_tsvector('simple', coalesce(id, '')), 'A')"
+        " || setweight(to_tsvector('simple', coalesce(brand, '')), 'B')"
+        " || setweight(to_tsvector('simple', coalesce(type, '')), 'C')"
+    ),
+    'order': (
+        "setweight(to_tsvector('simple', coalesce(id, '')), 'A')"
+        " || setweight(to_tsvector('simple', coalesce(notes, '')), 'C')"
+    ),
+}
+
+
+def upgrade():
+    for table, document in SEARCH_DOCUMENTS.items():
+        op.create_index(f'ix_{table}_search', table, [sa.text(f'({document})')], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    for table in SEARCH_DOCUMENTS:
+        op.drop_index(f'ix_{table}_search', table_name=table)
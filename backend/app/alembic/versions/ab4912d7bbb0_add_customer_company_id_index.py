@@ -0,0 +1,30 @@
+"""Add customer (company, id) index for keyset pagination
+
+Revision ID: ab4912d7bbb0
+Revises: fcb6e2591a5d
+Create Date: 2026-10-18 10:03:17.204885
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision = 'ab4912d7bbb0'
+down_revision = 'fcb6e2591a5d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Build the index without blocking writes to the customer table
+    with op.get_context().autocommit_block():
+        op.create_index('ix_customer_company_id', 'customer', ['company', 'id'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_customer_company_id', table_name='customer',
+                      postgresql_concurrently=True)
@@ -12,6 +12,7 @@ from app.core import security
 from app.core.config import settings
 from app.core.db import engine
 from app.models.user_models import TokenPayload, User
+from app.utilities.currency_utils import get_currency_rates
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -55,3 +56,15 @@ def get_current_active_superuser(current_user: CurrentUser) -> User:
             status_code=403, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+
+def get_output_currency(output_currency: str | None = None) -> str | None:
+    if output_currency is None:
+        return None
+    if output_currency not in get_currency_rates():
+        raise HTTPException(status_code=400, detail=f"Unknown currency {output_currency}")
+    return output_currency.upper()
+
+
+# The validated, uppercased output_currency query parameter, None when not given
+OutputCurrency = Annotated[str | None, Depends(get_output_currency)]
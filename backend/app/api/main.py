@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.routes import items, login, private, users, utils, auth, customers, orders, products
+from app.api.routes import items, login, private, users, utils, auth, customers, dashboard, orders, products, search, sync
 from app.core.config import settings
 
 api_router = APIRouter()
@@ -12,6 +12,9 @@ api_router.include_router(auth.router)
 api_router.include_router(customers.router)
 api_router.include_router(orders.router)
 api_router.include_router(products.router)
+api_router.include_router(dashboard.router)
+api_router.include_router(sync.router)
+api_router.include_router(search.router)
 
 if settings.ENVIRONMENT == "local":
     api_router.include_router(private.router)
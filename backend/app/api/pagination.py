@@ -0,0 +1,171 @@
+import base64
+import json
+import uuid
+from collections.abc import Callable, Sequence
+from typing import Any, TypeVar
+
+from fastapi import HTTPException
+from sqlalchemy import (
+    BigInteger,
+    and_,
+    cast,
+    column,
+    false,
+    literal,
+    or_,
+    table,
+    tuple_,
+)
+from sqlalchemy.dialects.postgresql import REGCLASS
+from sqlalchemy.sql import ColumnElement
+from sqlmodel import Session, func, select
+from sqlmodel.sql.expression import SelectOfScalar
+
+T = TypeVar("T")
+
+
+def encode_cursor(values: Sequence[Any], descending: bool = False) -> str:
+    """
+    Encode the sort key of the last row of a page as an opaque cursor.
+    """
+    payload = {
+        "k": [str(value) if isinstance(value, uuid.UUID) else value for value in values],
+        "d": descending,
+    }
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_count: int, descending: bool = False) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["k"]
+        cursor_descending = payload["d"]
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != key_count:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_descending != descending:
+        raise HTTPException(
+            status_code=400, detail="Cursor does not match the requested sort order"
+        )
+    return values
+
+
+def apply_keyset(
+    query: SelectOfScalar[T],
+    keys: Sequence[Any],
+    cursor: str | None = None,
+    descending: bool = False,
+) -> SelectOfScalar[T]:
+    """
+    Order the query by `keys`, columns or model attributes, and when a cursor
+    is given, seek past the last
+    row of the previous page with a row comparison on the same keys. The last
+    key must be unique so that the order is total. NULLs sort above every
+    value, last in ascending and first in descending order, as in the indexes
+    the keys are read from.
+    """
+    if cursor:
+        query = query.where(_seek(keys, decode_cursor(cursor, len(keys), descending), descending))
+    if descending:
+        return query.order_by(*(key.desc().nulls_first() for key in keys))
+    return query.order_by(*(key.asc().nulls_last() for key in keys))
+
+
+def _seek(keys: Sequence[Any], values: Sequence[Any], descending: bool) -> ColumnElement[bool]:
+    """
+    Rows sorting after `values` on `keys`. A row comparison never matches
+    NULLs, so keys of nullable columns are compared one at a time.
+    """
+    if not any(getattr(getattr(key, "expression", key), "nullable", True) for key in keys):
+        literals = [literal(value, key.type) for key, value in zip(keys, values, strict=True)]
+        if descending:
+            return tuple_(*keys) < tuple_(*literals)
+        return tuple_(*keys) > tuple_(*literals)
+
+    key, value = keys[0], values[0]
+    if value is None:
+        after = key.is_not(None) if descending else false()
+        equal = key.is_(None)
+    else:
+        value = literal(value, key.type)
+        after = key < value if descending else or_(key > value, key.is_(None))
+        equal = key == value
+    if len(keys) == 1:
+        return after
+    return or_(after, and_(equal, _seek(keys[1:], values[1:], descending)))
+
+
+def get_next_cursor(
+    rows: Sequence[T],
+    limit: int,
+    key_values: Callable[[T], Sequence[Any]],
+    descending: bool = False,
+) -> str | None:
+    """
+    Return the cursor of the page following `rows`, or None on the last page.
+    """
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(key_values(rows[-1]), descending)
+
+
+def fetch_page(
+    session: Session,
+    model: type[T],
+    filters: Sequence[ColumnElement[bool]],
+    keys: Sequence[Any],
+    *,
+    cursor: str | None = None,
+    descending: bool = False,
+    skip: int = 0,
+    limit: int = 100,
+    include_count: bool = True,
+    approximate_count: bool = False,
+) -> tuple[list[T], int | None]:
+    """
+    Fetch one keyset page of `model` rows matching `filters`, together with
+    the total number of matching rows.
+
+    The total is selected as a scalar subquery next to the page rows, so the
+    page and its count take a single round trip. With `include_count` off no
+    count is computed and None is returned. With `approximate_count` on,
+    unfiltered queries read the planner's row estimate (pg_class.reltuples)
+    instead of counting the table.
+    """
+    count_query = _count_query(model, filters, approximate_count) if include_count else None
+
+    # The count must not correlate to the page query, whose FROM it shares
+    # when filters join other tables
+    columns = [model] if count_query is None else [model, count_query.scalar_subquery().correlate(None)]
+    query = apply_keyset(select(*columns).where(*filters), keys, cursor=cursor, descending=descending)
+    if not cursor:
+        query = query.offset(skip)
+    results = session.exec(query.limit(limit)).all()
+
+    if count_query is None:
+        return list(results), None
+    if results:
+        return [row for row, _ in results], results[0][1]
+    # The page is past the end, the count needs its own query
+    count = session.exec(count_query).one() if cursor or skip else 0
+    return [], count
+
+
+def _count_query(
+    model: type[Any], filters: Sequence[ColumnElement[bool]], approximate_count: bool
+) -> SelectOfScalar[int]:
+    if approximate_count and not filters:
+        # reltuples is negative (or zero before PG 14) until the table is
+        # first analyzed, fall back to counting then
+        pg_class = table("pg_class", column("oid"), column("reltuples"))
+        estimate = (
+            select(cast(pg_class.c.reltuples, BigInteger))
+            .where(pg_class.c.oid == cast(literal(f'"{model.__tablename__}"'), REGCLASS))
+            .scalar_subquery()
+        )
+        exact = select(func.count()).select_from(model).scalar_subquery()
+        return select(func.coalesce(func.nullif(func.greatest(estimate, 0), 0), exact))
+    return select(func.count()).select_from(model).where(*filters)
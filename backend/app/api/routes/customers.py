@@ -1,11 +1,13 @@
 import uuid
-from typing import Any
+from typing import Any, Literal
 import base64
 
 from fastapi import APIRouter, HTTPException, UploadFile
-from sqlmodel import func, select
+from sqlmodel import col
 
 from app.api.deps import CurrentUser, SessionDep
+from app.api.pagination import fetch_page, get_next_cursor
+from app.crud import counter_crud
 from app.models.customer_models import *
 from app.models.user_models import Message
 
@@ -19,13 +21,8 @@ def read_customer_count(
     Retrieve customers only for the count.
     """
 
-    # Build base query
-    count_query = select(func.count()).select_from(Customer)
-    # Add filters
-    if not display_invalid:
-        count_query = count_query.where(Customer.is_valid == True)
-
-    count = session.exec(count_query).one()
+    count = counter_crud.read_count(session=session, entity=counter_crud.CUSTOMER,
+                                    display_invalid=display_invalid)
 
     return CustomerCount(count=count)
 
@@ -72,31 +69,60 @@ def read_customer(session: SessionDep, current_user: CurrentUser, id: uuid.UUID)
     #if not current_user.is_superuser:
     #    raise HTTPException(status_code=400, detail="Not enough permissions")
     return customer
+
+@router.get("/{id}/stats", response_model=CustomerStatsPublic)
+def read_customer_stats(session: SessionDep, current_user: CurrentUser, id: uuid.UUID) -> Any:
+    """
+    Get the order statistics of a customer.
+    """
+    stats = session.get(CustomerStats, id)
+    if not stats:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return stats
     
 @router.get("/", response_model=CustomersPublic)
 def read_customers(
     session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 100,
-    display_invalid: bool = False,
+    display_invalid: bool = False, cursor: str | None = None,
+    include_count: bool = True, approximate_count: bool = False,
+    sort_by: Literal["company", "order_count", "lifetime_revenue", "average_order_value"] = "company",
+    sort_order: str = "asc",
 ) -> Any:
     """
-    Retrieve customers.
+    Retrieve customers ordered by company or by one of their order statistics.
+    Args:
+        cursor: Optional next_cursor of the previous page, replaces skip
+        include_count: Set to false to skip counting, count is then null
+        approximate_count: Estimate the count of unfiltered listings from table statistics
+        sort_by: "company", or "order_count", "lifetime_revenue" or "average_order_value"
+        sort_order: "asc" for ascending, "desc" for descending order
     """
-
-    query = select(Customer)
-    count_query = select(func.count()).select_from(Customer)
+    descending = sort_order.lower() == "desc"
 
     # Add filters
+    filters = []
     if not display_invalid:
-        query = query.where(Customer.is_valid == True)
-        count_query = count_query.where(Customer.is_valid == True)
+        filters.append(col(Customer.is_valid) == True)
+
+    # The id breaks ties between customers with the same sort value
+    if sort_by == "company":
+        keys = [Customer.company, Customer.id]
+    else:
+        # Statistics sorts walk the customer_stats index of the sort column
+        filters.append(col(CustomerStats.customer_id) == Customer.id)
+        keys = [getattr(CustomerStats, sort_by), CustomerStats.customer_id]
+
+    def key_values(customer: Customer) -> tuple[Any, ...]:
+        if sort_by == "company":
+            return customer.company, customer.id
+        return getattr(customer.stats, sort_by), customer.id
 
-    # Add pagination
-    query = query.offset(skip).limit(limit)
-        
-    count = session.exec(count_query).one()
-    customers = session.exec(query).all()
+    customers, count = fetch_page(session, Customer, filters, keys, cursor=cursor, descending=descending,
+                                  skip=skip, limit=limit,
+                                  include_count=include_count, approximate_count=approximate_count)
+    next_cursor = get_next_cursor(customers, limit, key_values, descending)
 
-    return CustomersPublic(data=customers, count=count)
+    return CustomersPublic(data=customers, count=count, next_cursor=next_cursor)
 
 @router.post("/", response_model=Customer)
 def create_customer(
@@ -107,7 +133,10 @@ def create_customer(
     """
     new_uuid = uuid.uuid4()
     customer = Customer.model_validate(customer_in, update={"id": new_uuid})
+    customer.stats = CustomerStats()
     session.add(customer)
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.CUSTOMER, removed=[],
+                                       added=[counter_crud.get_counter_key(customer.is_valid)])
     session.commit()
     session.refresh(customer)
     return customer
@@ -129,8 +158,11 @@ def update_customer(
     if not current_user.is_superuser:
         raise HTTPException(status_code=400, detail="Not enough permissions")
     update_dict = customer_in.model_dump(exclude_unset=True)
+    previous_key = counter_crud.get_counter_key(customer.is_valid)
     customer.sqlmodel_update(update_dict)
     session.add(customer)
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.CUSTOMER, removed=[previous_key],
+                                       added=[counter_crud.get_counter_key(customer.is_valid)])
     session.commit()
     session.refresh(customer)
     return customer
@@ -151,9 +183,12 @@ def delete_customer(
     customer_in = CustomerUpdate(is_valid=False, customer_id=customer.id, description="Marked as Deleted")
 
     update_dict = customer_in.model_dump(exclude_unset=True)
+    previous_key = counter_crud.get_counter_key(customer.is_valid)
     #update_dict = order.model_dump(exclude_unset=True, update={"is_valid": False} )
     customer.sqlmodel_update(update_dict)
     session.add(customer)
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.CUSTOMER, removed=[previous_key],
+                                       added=[counter_crud.get_counter_key(customer.is_valid)])
     session.commit()
     session.refresh(customer)
     return Message(message="Customer deleted successfully, mark as invalid")
\ No newline at end of file
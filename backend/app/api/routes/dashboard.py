@@ -0,0 +1,35 @@
+from typing import Any
+
+from fastapi import APIRouter
+from sqlmodel import select
+
+from app.api.deps import CurrentUser, SessionDep
+from app.crud import counter_crud
+from app.models.dashboard_models import DashboardSummary, EntityCounter
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+
+@router.get("/summary", response_model=DashboardSummary)
+def read_dashboard_summary(session: SessionDep, current_user: CurrentUser) -> Any:
+    """
+    Counts of valid customers, orders and products, read from the entity
+    counters in a single query.
+    """
+    counters = session.exec(
+        select(EntityCounter).where(EntityCounter.is_valid == True)
+    ).all()
+
+    totals = {counter_crud.CUSTOMER: 0, counter_crud.ORDER: 0, counter_crud.PRODUCT: 0}
+    orders_by_status: dict[str, int] = {}
+    for counter in counters:
+        totals[counter.entity] = totals.get(counter.entity, 0) + counter.count
+        if counter.entity == counter_crud.ORDER and counter.status and counter.count:
+            orders_by_status[counter.status] = counter.count
+
+    return DashboardSummary(
+        customer_count=totals[counter_crud.CUSTOMER],
+        order_count=totals[counter_crud.ORDER],
+        product_count=totals[counter_crud.PRODUCT],
+        orders_by_status=orders_by_status,
+    )
@@ -1,85 +1,165 @@
+import asyncio
 import uuid
-import json
-from datetime import datetime
-from typing import Any
-
-from fastapi import APIRouter, HTTPException
-from sqlmodel import func, select, cast, DateTime, and_
+from collections.abc import AsyncIterator, Iterator, Sequence
+from functools import lru_cache
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Annotated, Any, Literal
+
+from fastapi import APIRouter, Header, HTTPException, Response, UploadFile
+from sqlalchemy import String, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql import ColumnElement
+from sqlmodel import Session, col, func, select
 #from sqlalchemy import func, cast, DateTime  
 
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import CurrentUser, OutputCurrency, SessionDep
+from app.api.pagination import fetch_page, get_next_cursor
+from app.core.config import settings
+from app.core.db import engine
+from app.crud import counter_crud, order_crud
+from app.crud.product_crud import product_catalog
 from app.models.order_models import *
 from app.models.customer_models import *
 from app.models.product_models import *
 from app.models.user_models import Message
-from app.utilities.currency_utils import convert_to_sgd, convert_to_target_currency
+from app.utilities.currency_utils import (UnknownCurrencyError, get_currency_rates,
+                                          get_rates_version, rate_at)
+from app.utilities.datetime_utils import as_utc, utc_now
+from app.utilities.invoice_cache_utils import InvoiceDiskCache, invoice_cache_key
+from app.utilities.invoice_utils import (InvoiceData, InvoiceLine, XLSX_MEDIA_TYPE, get_invoice_pool,
+                                        render_invoice, stream_invoice_zip)
+from app.utilities.order_export_utils import (EXPORT_BATCH_SIZE, EXPORT_MEDIA_TYPES, stream_csv,
+                                             stream_ndjson, stream_xlsx)
+from app.utilities.order_events_utils import (OrderEventBroker, format_sse, notify_order_changed,
+                                              notify_orders_changed, notify_orders_resync)
+from app.utilities.order_import_utils import iter_order_frames, validate_order_frame
 from pydantic import BaseModel
-from fastapi.responses import FileResponse, Response
-from openpyxl import load_workbook
-from pathlib import Path
+from fastapi.responses import StreamingResponse
 
 router = APIRouter(prefix="/orders", tags=["orders"])
-BASE_DIR = Path(__file__).resolve().parent.parent.parent.parent  # Adjust if needed
+
+# Imported files are read, validated and committed this many rows at a time
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_IMPORT_ERRORS = 1000
+
+invoice_cache = InvoiceDiskCache(settings.INVOICE_CACHE_DIR, settings.INVOICE_CACHE_MAX_BYTES)
+
+# Fed by the LISTEN connection the app lifespan runs
+order_events = OrderEventBroker(settings.ORDER_EVENTS_QUEUE_SIZE)
 
 
 # Route to get an order invoice
 @router.get("/get-order-invoice/{order_id}")
-def get_order_invoice(session: SessionDep, order_id: str, output_currency: str = "SGD"):
+def get_order_invoice(session: SessionDep, order_id: str, output_currency: OutputCurrency = None,
+                      if_none_match: Annotated[str | None, Header()] = None) -> Response:
+    output_currency = output_currency or "SGD"
 
     order = session.get(Order, order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    
+
     customer = session.get(Customer, order.customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
-    
+    product_prices = get_missing_line_prices([order])
+
+    # The invoice date, the customer details and the catalog prices of lines
+    # without a price snapshot are printed on the invoice, so they are part of the key too
     current_date = datetime.now().strftime("%d-%m-%Y")
+    cache_key = invoice_cache_key(order.id, order.order_update_date, output_currency,
+                                  get_rates_version(), current_date, customer.company, customer.phone,
+                                  sorted(product_prices.items()))
+    etag = f'"{cache_key}"'
+    headers = {
+        "ETag": etag,
+        "Content-Disposition": f'attachment; filename="Invoice_{order_id}_{current_date}.xlsx"',
+    }
+    if if_none_match and (if_none_match.strip() == "*"
+                          or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    content = invoice_cache.get(order.id, cache_key)
+    if content is None:
+        invoice = build_invoice_data(
+            order=order,
+            customer=customer,
+            output_currency=output_currency,
+            invoice_date=current_date,
+            product_prices=product_prices,
+        )
+        content = render_invoice(invoice)
+        invoice_cache.put(order.id, cache_key, content)
+
+    return Response(content=content, media_type=XLSX_MEDIA_TYPE, headers=headers)
+
+# Route to export the invoices of many orders as one ZIP archive
+@router.post("/invoices/export")
+def export_order_invoices(
+    session: SessionDep, current_user: CurrentUser, export_in: InvoiceExportRequest
+) -> StreamingResponse:
+    """
+    Export the invoices of the given orders, or of the orders matching the
+    filter, as a ZIP archive. Invoices are rendered in a pool of worker
+    processes and streamed into the archive as they complete; the archive
+    ends with export_summary.json reporting the throughput.
+    """
+    if export_in.order_ids:
+        query = select(Order).where(col(Order.id).in_(export_in.order_ids))
+    else:
+        query = select(Order).where(*get_order_filters(export_in.filter or OrderFilter()))
+    query = query.order_by(Order.id).limit(settings.INVOICE_EXPORT_MAX_ORDERS + 1)
+    orders = session.exec(query).all()
+    if not orders:
+        raise HTTPException(status_code=404, detail="No orders found")
+    if export_in.output_currency not in get_currency_rates():
+        raise HTTPException(status_code=400, detail=f"Unknown currency {export_in.output_currency}")
+    if len(orders) > settings.INVOICE_EXPORT_MAX_ORDERS:
+        raise HTTPException(status_code=400,
+                            detail=f"Cannot export more than {settings.INVOICE_EXPORT_MAX_ORDERS} invoices at once")
+
+    # Customers and missing prices are loaded once for the whole export
+    customer_ids = set()
+    for order in orders:
+        try:
+            customer_ids.add(uuid.UUID(order.customer_id))
+        except (TypeError, ValueError):
+            pass
+    customers = {}
+    if customer_ids:
+        customers = {str(customer.id): customer
+                     for customer in session.exec(select(Customer).where(col(Customer.id).in_(customer_ids)))}
+    product_prices = get_missing_line_prices(orders)
 
-    template_path = BASE_DIR / "app/Invoice_Template.xlsx"
-    output_dir = BASE_DIR / "temp"
-    output_dir.mkdir(parents=True, exist_ok=True)  # Ensure 'temp' directory exists
-    output_path = output_dir / f"Invoice_out.xlsx"
-
-    # Load the workbook (this preserves formatting)
-    wb = load_workbook(template_path)
-
-    # Select the correct sheet
-    sheet = wb["Invoice"]  # Ensure this sheet exists in your template
-
-    # General Info - Modify the required cell (example: setting Order ID)
-    sheet["G2"] = current_date # Adjust to the current date
-    sheet["G3"] = order_id # Adjust to the order id
-    sheet["B7"] = customer.company # Adjust to the customer company name
-    sheet["C11"] = customer.phone # Adjust to the customer contact number 
-    sheet["F14"] = "UNIT PRICE ({})".format(output_currency)
-    sheet["G14"] = "SUBTOTAL ({})".format(output_currency)
-
-    # Product - Write with order product list
-    process_order_item_excel(session=session,
-                            sheet=sheet, 
-                            output_currency=output_currency,
-                            order_items=order.order_items,
-                            total_price=order.total_price,
-                            start_row=15,
-                            end_row=36)
-
-    # Save the modified file
-    wb.save(output_path)
-
-    # Return file as response
-    return FileResponse(
-        path=output_path, 
-        filename=f"Invoice_{order_id}_{current_date}.xlsx", 
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    current_date = datetime.now().strftime("%d-%m-%Y")
+    invoices = []
+    for order in orders:
+        customer = customers.get(order.customer_id or "")
+        if customer is None:
+            raise HTTPException(status_code=404, detail=f"Customer of order {order.id} not found")
+        invoices.append(build_invoice_data(
+            order=order,
+            customer=customer,
+            output_currency=export_in.output_currency.upper(),
+            invoice_date=current_date,
+            product_prices=product_prices,
+        ))
+
+    pool = get_invoice_pool(settings.INVOICE_EXPORT_WORKERS)
+    return StreamingResponse(
+        stream_invoice_zip(invoices, pool, max_pending=settings.INVOICE_EXPORT_WORKERS * 4),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="Invoices_{current_date}.zip"',
+            "X-Invoice-Count": str(len(invoices)),
+        },
     )
 
 @router.get("/order_count", response_model=OrdersCount)
 def read_customer_orders_count(
     session: SessionDep, current_user: CurrentUser, 
-    display_invalid: bool = False, customer_id: str = None, order_status: str = None,
-    start_date: str = None,
-    end_date: str = None 
+    display_invalid: bool = False, customer_id: str | None = None, order_status: str | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None 
 ) -> Any:
     """
     Retrieve orders only for the count.
@@ -87,34 +167,186 @@ def read_customer_orders_count(
         start_date: Optional start date in format "YYYY-MM-DD HH:MM:SS"
         end_date: Optional end date in format "YYYY-MM-DD HH:MM:SS"
     """
-    # Build base query
-    count_query = select(func.count()).select_from(Order)
-
-    # Add filters
-    if not display_invalid:
-        count_query = count_query.where(Order.is_valid == True)
-
-    if customer_id:
-        count_query = count_query.where(Order.customer_id == customer_id)
-
-    if order_status:
-        count_query = count_query.where(Order.order_status == order_status)
-
-    # Add date range filter
-    if start_date or end_date:
-        date_filters = []
-        if start_date:
-            date_filters.append(cast(Order.order_date, DateTime) >= cast(start_date, DateTime))
-        if end_date:
-            date_filters.append(cast(Order.order_date, DateTime) <= cast(end_date, DateTime))
-        
-        count_query = count_query.where(and_(*date_filters))
-        
+    # Counts by validity and status are kept in entity_counters
+    if not customer_id and not start_date and not end_date:
+        count = counter_crud.read_count(session=session, entity=counter_crud.ORDER,
+                                        display_invalid=display_invalid, status=order_status)
+        return OrdersCount(count=count)
+
+    # Build base query with filters
+    order_filter = OrderFilter(display_invalid=display_invalid, customer_id=customer_id,
+                               order_status=order_status, start_date=start_date, end_date=end_date)
+    count_query = select(func.count()).select_from(Order).where(*get_order_filters(order_filter))
+
     count = session.exec(count_query).one()
 
     return OrdersCount(count=count)
 
-@router.get("/{id}", response_model=Order)
+@router.get("/analytics", response_model=OrderAnalytics)
+def read_order_analytics(
+    session: SessionDep, current_user: CurrentUser,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None
+) -> Any:
+    """
+    Retrieve order KPIs for a date window from the daily rollup table.
+    Args:
+        start_date: Optional start date in format "YYYY-MM-DD HH:MM:SS", only the UTC day is used
+        end_date: Optional end date in format "YYYY-MM-DD HH:MM:SS", only the UTC day is used
+    """
+    query = select(
+        OrderDailyRollup.order_status,
+        func.sum(OrderDailyRollup.order_count),
+        func.sum(OrderDailyRollup.revenue),
+    ).group_by(OrderDailyRollup.order_status)
+
+    if start_date:
+        query = query.where(OrderDailyRollup.day >= as_utc(start_date).date())
+    if end_date:
+        query = query.where(OrderDailyRollup.day <= as_utc(end_date).date())
+
+    orders_by_status = {}
+    revenue_by_status = {}
+    for order_status, order_count, revenue in session.exec(query).all():
+        if order_count:
+            orders_by_status[order_status] = int(order_count)
+            revenue_by_status[order_status] = float(revenue or 0)
+
+    total_orders = sum(orders_by_status.values())
+    total_revenue = sum(revenue_by_status.values())
+    delivered = orders_by_status.get("Delivered", 0)
+
+    return OrderAnalytics(
+        total_orders=total_orders,
+        total_revenue=total_revenue,
+        average_order_value=total_revenue / total_orders if total_orders else 0,
+        conversion_rate=delivered / total_orders * 100 if total_orders else 0,
+        orders_by_status=orders_by_status,
+        revenue_by_status=revenue_by_status,
+    )
+
+@router.get("/timeseries", response_model=OrderTimeseries)
+def read_order_timeseries(
+    session: SessionDep, current_user: CurrentUser,
+    bucket: Literal["day", "week", "month"] = "day",
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    group_by: Literal["status", "customer"] | None = None,
+    compare_previous: bool = False,
+    output_currency: OutputCurrency = None,
+) -> Any:
+    """
+    Retrieve order count and revenue of valid orders per day, week or month.
+    Args:
+        start_date: Optional start date in format "YYYY-MM-DD HH:MM:SS", only the UTC day is used,
+            defaults to 30 days before end_date
+        end_date: Optional end date in format "YYYY-MM-DD HH:MM:SS", only the UTC day is used,
+            defaults to today
+        group_by: Optional "status" or "customer", one series per group
+        compare_previous: Also return the figures of the period of the same length before start_date,
+            aligned with the buckets they compare with
+        output_currency: Currency of the revenue, defaults to SGD
+    """
+    output_currency = output_currency or "SGD"
+    end = as_utc(end_date).date() if end_date else utc_now().date()
+    start = as_utc(start_date).date() if start_date else end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+
+    rows = order_crud.read_order_timeseries(session=session, bucket=bucket, start=start, end=end,
+                                            group_by=group_by, compare=compare_previous)
+    # Order totals are kept in SGD, buckets are converted at the rate of their first day
+    @lru_cache
+    def to_output(day: date) -> float:
+        return 1 / rate_at(output_currency, datetime.combine(day, time(), timezone.utc))
+
+    period = end - start + timedelta(days=1)
+    timeseries = OrderTimeseries(
+        bucket=bucket,
+        currency=output_currency,
+        start_date=start,
+        end_date=end,
+        buckets=[row[0] for row in rows],
+        groups=[row[1] for row in rows] if group_by else None,
+        order_count=[int(row[2]) for row in rows],
+        revenue=[round(row[3] * to_output(row[0]), 2) for row in rows],
+    )
+    if compare_previous:
+        timeseries.previous_start_date = start - period
+        timeseries.previous_order_count = [int(row[4]) for row in rows]
+        timeseries.previous_revenue = [round(row[5] * to_output(row[0] - period), 2) for row in rows]
+    return timeseries
+
+@router.get("/stream")
+async def stream_order_events(current_user: CurrentUser) -> StreamingResponse:
+    """
+    Server-sent events of order changes: "created", "updated" and "deleted"
+    events carry the order id and version, a "resync" event means events were
+    missed and the order list should be reloaded.
+    """
+    async def events() -> AsyncIterator[bytes]:
+        async with order_events.subscribe() as queue:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), settings.ORDER_EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing idle streams
+                    yield b": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/export")
+def export_orders(
+    current_user: CurrentUser,
+    format: Literal["csv", "xlsx", "ndjson"] = "csv", sort_order: str = "desc",
+    display_invalid: bool = False, customer_id: str | None = None, order_status: str | None = None,
+    product_id: str | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None
+) -> StreamingResponse:
+    """
+    Export every order matching the read_orders filters.
+    Args:
+        format: "csv", "xlsx" or "ndjson"
+        start_date: Optional start date in format "YYYY-MM-DD HH:MM:SS"
+        end_date: Optional end date in format "YYYY-MM-DD HH:MM:SS"
+    """
+    order_filter = OrderFilter(display_invalid=display_invalid, customer_id=customer_id,
+                               order_status=order_status, product_id=product_id,
+                               start_date=start_date, end_date=end_date)
+    descending = sort_order.lower() != "asc"
+    order_date, order_id = col(Order.order_date), col(Order.id)
+    keys: list[ColumnElement[Any]] = (
+        [order_date.desc(), order_id.desc()] if descending else [order_date.asc(), order_id.asc()]
+    )
+    query = (select(Order).where(*get_order_filters(order_filter)).order_by(*keys)
+             .execution_options(yield_per=EXPORT_BATCH_SIZE))
+    columns = ["id", *(field for field in OrderPublic.model_fields if field != "id")]
+
+    def iter_rows() -> Iterator[dict[str, Any]]:
+        # The request session is closed once the response starts, the export
+        # reads through its own session with a server-side cursor
+        with Session(engine) as export_session:
+            for order in export_session.exec(query):
+                yield OrderPublic.model_validate(order).model_dump(mode="json")
+
+    if format == "csv":
+        content = stream_csv(iter_rows(), columns)
+    elif format == "xlsx":
+        content = stream_xlsx(iter_rows(), columns)
+    else:
+        content = stream_ndjson(iter_rows())
+
+    # A sync iterator is advanced in the threadpool one chunk at a time, so
+    # no worker thread is held between chunks
+    filename = f"Orders_{utc_now().strftime('%Y%m%d%H%M%S')}.{format}"
+    return StreamingResponse(content, media_type=EXPORT_MEDIA_TYPES[format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+@router.get("/{id}", response_model=OrderPublic)
 def read_order(session: SessionDep, current_user: CurrentUser, id: str) -> Any:
     """
     Get order by ID.
@@ -130,87 +362,172 @@ def read_order(session: SessionDep, current_user: CurrentUser, id: str) -> Any:
 def read_orders(
     session: SessionDep, current_user: CurrentUser, 
     skip: int = 0, limit: int = 100, sort_order: str = "desc", 
-    display_invalid: bool = False, customer_id: str = None, order_status: str = None,
-    start_date: str = None,
-    end_date: str = None 
+    display_invalid: bool = False, customer_id: str | None = None, order_status: str | None = None,
+    product_id: str | None = None,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None,
+    cursor: str | None = None,
+    include_count: bool = True,
+    approximate_count: bool = False,
+    output_currency: OutputCurrency = None,
 ) -> Any:
     """
     Retrieve orders.
     Args:
         sort_order: "asc" for ascending, "desc" for descending order by created date
+        cursor: Optional next_cursor of the previous page, replaces skip
+        product_id: Optional, only orders with a line of this product
         start_date: Optional start date in format "YYYY-MM-DD HH:MM:SS"
         end_date: Optional end date in format "YYYY-MM-DD HH:MM:SS"
+        include_count: Set to false to skip counting, count is then null
+        approximate_count: Estimate the count of unfiltered listings from table statistics
+        output_currency: Currency of the order totals, defaults to SGD which they are kept in
     """
-
-    # Build base query
-    query = select(Order)
-    count_query = select(func.count()).select_from(Order)
-
-    # Add filters
-    if not display_invalid:
-        query = query.where(Order.is_valid == True)
-        count_query = count_query.where(Order.is_valid == True)
-
-    if customer_id:
-        query = query.where(Order.customer_id == customer_id)
-        count_query = count_query.where(Order.customer_id == customer_id)
-
-    if order_status:
-        query = query.where(Order.order_status == order_status)
-        count_query = count_query.where(Order.order_status == order_status)
-
-    # Add date range filter
-    if start_date or end_date:
-        date_filters = []
-        if start_date:
-            date_filters.append(cast(Order.order_date, DateTime) >= cast(start_date, DateTime))
-        if end_date:
-            date_filters.append(cast(Order.order_date, DateTime) <= cast(end_date, DateTime))
-        
-        query = query.where(and_(*date_filters))
-        count_query = count_query.where(and_(*date_filters))
-
-    # Add sorting with string to timestamp casting
-    if sort_order.lower() == "asc":
-        query = query.order_by(cast(Order.order_date, DateTime).asc())
-    else:
-        query = query.order_by(cast(Order.order_date, DateTime).desc())
-
-    # Add pagination
-    query = query.offset(skip).limit(limit)
-        
-    count = session.exec(count_query).one()
-    orders = session.exec(query).all()
-
-    return OrdersPublic(data=orders, count=count)
-
-@router.post("/", response_model=Order)
+    output_currency = output_currency or "SGD"
+
+    # Build filters
+    order_filter = OrderFilter(display_invalid=display_invalid, customer_id=customer_id,
+                               order_status=order_status, product_id=product_id,
+                               start_date=start_date, end_date=end_date)
+    filters = get_order_filters(order_filter)
+
+    # Sort on the (is_valid, order_date, id) index, the id breaks ties,
+    # and seek past the cursor instead of skipping when given
+    descending = sort_order.lower() != "asc"
+    orders, count = fetch_page(session, Order, filters, [Order.order_date, Order.id],
+                               cursor=cursor, descending=descending, skip=skip, limit=limit,
+                               include_count=include_count, approximate_count=approximate_count)
+    next_cursor = get_next_cursor(orders, limit, lambda order: (order.order_date, order.id),
+                                  descending=descending)
+
+    data = [OrderPublic.model_validate(order) for order in orders]
+    if output_currency != "SGD":
+        # The whole page is converted in one pass, orders without a total keep none
+        totals = get_currency_rates().convert([order.total_price or 0 for order in data], "SGD", output_currency)
+        for order, total in zip(data, totals.round(2).tolist(), strict=True):
+            if order.total_price is not None:
+                order.total_price = total
+    return OrdersPublic(data=data, count=count, next_cursor=next_cursor, currency=output_currency)
+
+@router.post("/", response_model=OrderPublic)
 def create_order(
     *, session: SessionDep, current_user: CurrentUser, order_in: OrderCreate
 ) -> Any:
     """
-    Create new order.
+    Create new order. Orders with items get their total computed from the
+    product prices, converted to SGD.
     """
-    count_statement = select(func.count()).select_from(Order)
-    count = session.exec(count_statement).one()
-    
-    current_time = datetime.now()
-    # Format the current time as a string
-    formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S")
-    current_year = current_time.year
-    current_month = current_time.month
-    new_id = current_year * 1000000 + current_month * 10000 + count + 1
-    #order_date_str = "2025-01-13 15:30:00"
-    #order_date = datetime.strptime(order_date_str, "%Y-%m-%d %H:%M:%S")
-    order = Order.model_validate(order_in, update={"id": str(new_id), 
-                                                   "order_date" : formatted_time,
-                                                   "order_update_date" : formatted_time})
+    try:
+        order_items = order_crud.parse_order_items(order_in.order_items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid order items: {e}")
+
+    current_time = utc_now()
+    [new_id] = order_crud.allocate_order_ids(session=session, when=current_time)
+    order = Order.model_validate(order_in, update={"id": new_id, 
+                                                   "order_date" : current_time,
+                                                   "order_update_date" : current_time})
+    try:
+        order_crud.set_order_lines(order=order, items=order_items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if order.lines:
+        try:
+            order_crud.set_order_total(order)
+        except UnknownCurrencyError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     session.add(order)
+    order_crud.apply_order_changes(session=session, removed=[],
+                                   added=[order_crud.get_order_facts(order)])
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.ORDER, removed=[],
+                                       added=[counter_crud.get_counter_key(order.is_valid, order.order_status)])
+    notify_order_changed(session, order.id, "created")
     session.commit()
     session.refresh(order)
     return order
 
 
+@router.post("/import", response_model=OrderImportResult)
+def import_orders(
+    session: SessionDep, current_user: CurrentUser, file: UploadFile
+) -> Any:
+    """
+    Import orders from a CSV or XLSX file with a header row of customer_id,
+    order_date, order_status, payment_status, notes, order_quantity,
+    total_price and order_items columns. Rows are processed in chunks, each
+    committed on its own; rows that fail validation are skipped and listed
+    in the error report with their spreadsheet row number.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+
+    imported = 0
+    failed = 0
+    errors: list[OrderImportError] = []
+    try:
+        for frame in iter_order_frames(file.file, file.filename or "", IMPORT_CHUNK_SIZE):
+            now = utc_now()
+            orders, frame_errors = validate_order_frame(frame, now)
+            chunk_imported = order_crud.import_orders(session=session, orders=orders, errors=frame_errors, now=now)
+            if chunk_imported:
+                # Subscribers reload the list once per chunk rather than per order
+                notify_orders_resync(session)
+            session.commit()
+            imported += chunk_imported
+
+            frame_errors = frame_errors[frame_errors != ""]
+            failed += len(frame_errors)
+            for row, error in frame_errors.items():
+                if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+                    errors.append(OrderImportError(row=row, error=error))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid import file: {e}")
+
+    return OrderImportResult(imported=imported, failed=failed, errors=errors,
+                             errors_truncated=failed > len(errors))
+
+@router.patch("/bulk", response_model=OrdersPublic)
+def bulk_update_orders(
+    *, session: SessionDep, current_user: CurrentUser, bulk_in: OrderBulkUpdate
+) -> Any:
+    """
+    Apply the same changes to the given orders, or to the orders matching
+    the filter, in a single statement.
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+    changes = bulk_in.changes.model_dump(exclude_unset=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="No changes given")
+
+    filters = get_bulk_order_filters(bulk_in.order_ids, bulk_in.filter)
+    orders = order_crud.bulk_update_orders(session=session, filters=filters,
+                                           values={**changes, "order_update_date": utc_now()})
+    notify_orders_changed(session, [order.id for order in orders], "updated")
+    session.commit()
+    for order in orders:
+        invoice_cache.invalidate(order.id)
+    return OrdersPublic(data=orders, count=len(orders))
+
+@router.post("/bulk-delete")
+def bulk_delete_orders(
+    session: SessionDep, current_user: CurrentUser, bulk_in: OrderBulkDelete
+) -> Message:
+    """
+    Delete the given orders, or the orders matching the filter, in a single
+    statement. To mark orders invalid
+    """
+    if not current_user.is_superuser:
+        raise HTTPException(status_code=400, detail="Not enough permissions")
+
+    filters = get_bulk_order_filters(bulk_in.order_ids, bulk_in.filter)
+    orders = order_crud.bulk_update_orders(session=session, filters=filters, values={"is_valid": False})
+    notify_orders_changed(session, [order.id for order in orders], "deleted")
+    session.commit()
+    for order in orders:
+        invoice_cache.invalidate(order.id)
+    return Message(message=f"{len(orders)} orders deleted successfully, mark as invalid")
+
 @router.put("/{id}", response_model=OrderPublic)
 def update_order(
     *,
@@ -220,9 +537,11 @@ def update_order(
     order_in: OrderUpdate,
 ) -> Any:
     """
-    Update an order.
+    Update an order. The total of an order with items is recomputed when the
+    items change and cannot be set directly.
     """
-    order = session.get(Order, id)
+    # Locked so that concurrent updates compute the derived table changes one after the other
+    order = session.get(Order, id, with_for_update=True)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     #if not order.is_valid:
@@ -230,14 +549,37 @@ def update_order(
     if not current_user.is_superuser:
         raise HTTPException(status_code=400, detail="Not enough permissions")
     
-    current_time = datetime.now()
-    # Format the current time as a string
-    formatted_time = current_time.strftime("%Y-%m-%d %H:%M:%S")
-    order_in.order_update_date = formatted_time
+    order_in.order_update_date = utc_now()
     update_dict = order_in.model_dump(exclude_unset=True)
+    previous_facts = order_crud.get_order_facts(order)
+    previous_key = counter_crud.get_counter_key(order.is_valid, order.order_status)
+    if "order_items" in update_dict:
+        try:
+            order_items = order_crud.parse_order_items(update_dict.pop("order_items"))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid order items: {e}")
+        try:
+            order_crud.set_order_lines(order=order, items=order_items)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if order.lines:
+            try:
+                order_crud.set_order_total(order)
+            except UnknownCurrencyError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            update_dict.pop("total_price", None)
+    elif order.lines:
+        # The total of an order with lines is always the computed one
+        update_dict.pop("total_price", None)
     order.sqlmodel_update(update_dict)
     session.add(order)
+    order_crud.apply_order_changes(session=session, removed=[previous_facts],
+                                   added=[order_crud.get_order_facts(order)])
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.ORDER, removed=[previous_key],
+                                       added=[counter_crud.get_counter_key(order.is_valid, order.order_status)])
+    notify_order_changed(session, order.id, "updated")
     session.commit()
+    invoice_cache.invalidate(order.id)
     session.refresh(order)
     return order
 
@@ -248,7 +590,7 @@ def delete_order(
     """
     Delete an order. To mark order invalid
     """
-    order = session.get(Order, id)
+    order = session.get(Order, id, with_for_update=True)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     if not current_user.is_superuser:
@@ -256,57 +598,96 @@ def delete_order(
     order_in = OrderUpdate(is_valid=False, customer_id=order.customer_id)
     update_dict = order_in.model_dump(exclude_unset=True)
     #update_dict = order.model_dump(exclude_unset=True, update={"is_valid": False} )
+    previous_facts = order_crud.get_order_facts(order)
+    previous_key = counter_crud.get_counter_key(order.is_valid, order.order_status)
     order.sqlmodel_update(update_dict)
     session.add(order)
+    order_crud.apply_order_changes(session=session, removed=[previous_facts],
+                                   added=[order_crud.get_order_facts(order)])
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.ORDER, removed=[previous_key],
+                                       added=[counter_crud.get_counter_key(order.is_valid, order.order_status)])
+    notify_order_changed(session, order.id, "deleted")
     session.commit()
+    invoice_cache.invalidate(order.id)
     session.refresh(order)
     return Message(message="Order deleted successfully, mark as invalid")
 
-def parse_str2dict(input:str):
-    try:
-        # Convert JSON string to dictionary
-        out_dict = json.loads(input)
-        return out_dict
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
-        return None  # Return None or an empty dict {} as needed
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
-        return None
-
-def process_order_item_excel(session, sheet, output_currency: str, order_items:str, total_price: float, start_row: int = 15, end_row: int = 36):
-
-    ITEM_COLUMN = "B{}"
-    DESCRIPTION_COLUMN = "C{}"
-    QTY_COLUMN = "E{}"
-    UNIT_PRICE_COLUMN = "F{}"
-    SUBTOTAL_COLUMN = "G{}"
-    
-    row_count = start_row
-    item_count = 0
-    order_dict = parse_str2dict(order_items)
-    
-    for product_name in order_dict:
-        product : Product = session.get(Product, product_name)
-        
-        item_count+=1
-        product_quantity = order_dict[product_name]
-        
-        item_column_str = ITEM_COLUMN.format(row_count)
-        description_column_str = DESCRIPTION_COLUMN.format(row_count)
-        qty_column_str = QTY_COLUMN.format(row_count)
-        unit_price_column_str = UNIT_PRICE_COLUMN.format(row_count)
-        subtotal_column_str = SUBTOTAL_COLUMN.format(row_count)
-        row_count+=2
-
-        sheet[item_column_str] = item_count
-        sheet[description_column_str] = product_name
-        sheet[qty_column_str] = product_quantity
-        if product.price_currency == output_currency:
-            unit_price_converted = product.unit_price
-        else:
-            unit_price_converted = convert_to_target_currency(product.unit_price, product.price_currency, target_currency=output_currency)
-        sheet[unit_price_column_str] = round(unit_price_converted, 2)
-        sheet[subtotal_column_str] = round(product_quantity * unit_price_converted, 2)
-
-    return
\ No newline at end of file
+def get_order_filters(order_filter: OrderFilter) -> list[ColumnElement[bool]]:
+    """
+    Where clauses shared by the endpoints that filter orders like read_orders.
+    """
+    filters = []
+    if not order_filter.display_invalid:
+        filters.append(col(Order.is_valid) == True)
+    if order_filter.customer_id:
+        filters.append(col(Order.customer_id) == order_filter.customer_id)
+    if order_filter.order_status:
+        filters.append(col(Order.order_status) == order_filter.order_status)
+    if order_filter.product_id:
+        # Orders holding the product, found through the order line product index
+        filters.append(col(Order.id).in_(
+            select(OrderLine.order_id).where(OrderLine.product_id == order_filter.product_id)
+        ))
+    if order_filter.start_date:
+        filters.append(col(Order.order_date) >= as_utc(order_filter.start_date))
+    if order_filter.end_date:
+        filters.append(col(Order.order_date) <= as_utc(order_filter.end_date))
+    return filters
+
+def get_bulk_order_filters(
+    order_ids: list[str] | None, order_filter: OrderFilter | None
+) -> list[ColumnElement[bool]]:
+    """
+    Where clauses selecting the orders of a bulk request, by id (one array
+    parameter) or by the read_orders filters.
+    """
+    if order_ids:
+        return [col(Order.id) == any_(bindparam("order_ids", order_ids, type_=ARRAY(String)))]
+    if order_filter is None:
+        raise HTTPException(status_code=400, detail="Either order_ids or filter is required")
+    return get_order_filters(order_filter)
+
+def get_missing_line_prices(orders: Sequence[Order]) -> dict[str, tuple[float | None, str | None]]:
+    """
+    Current price and currency of the products on lines that have no price
+    snapshot, looked up in the product catalog for all the given orders.
+    """
+    product_ids = {line.product_id for order in orders for line in order.lines if line.unit_price is None}
+    if not product_ids:
+        return {}
+    return {product.id: (product.unit_price, product.price_currency)
+            for product in product_catalog.get_many(product_ids).values()}
+
+def build_invoice_data(order: Order, customer: Customer, output_currency: str, invoice_date: str,
+                       product_prices: dict[str, tuple[float | None, str | None]]) -> InvoiceData:
+
+    lines = []
+    for line in order.lines:
+        # Lines keep the price they were sold at, older lines fall back to the product
+        unit_price, price_currency = line.unit_price, line.currency
+        if unit_price is None:
+            if line.product_id not in product_prices:
+                raise HTTPException(status_code=404, detail=f"Product {line.product_id} not found")
+            unit_price, price_currency = product_prices[line.product_id]
+            # A product without a price counts as zero, as in the order total
+            unit_price = unit_price or 0
+        if price_currency != output_currency:
+            # Convert at the rates the order total was computed with, when known,
+            # or else at the rates of the order date
+            rates = order.rate_snapshot or {}
+            try:
+                source_rate = rates.get((price_currency or "").upper()) or rate_at(price_currency or "", order.order_date)
+                target_rate = rates.get(output_currency.upper()) or rate_at(output_currency, order.order_date)
+            except UnknownCurrencyError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            unit_price = unit_price * source_rate / target_rate
+        lines.append(InvoiceLine(description=line.product_id, quantity=line.quantity, unit_price=unit_price))
+
+    return InvoiceData(
+        invoice_no=order.id,
+        invoice_date=invoice_date,
+        company=customer.company,
+        phone=customer.phone,
+        currency=output_currency,
+        lines=tuple(lines),
+    )
@@ -1,14 +1,23 @@
 import uuid
-from typing import Any, List
+from bisect import bisect_right
+from typing import Annotated, Any, List
 import base64
 import json
 
-from fastapi import APIRouter, HTTPException, UploadFile, Body
-from sqlmodel import func, select
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, UploadFile, Body, Header, Response
+from sqlmodel import col, func, select
 from pydantic import BaseModel
 
-from app.api.deps import CurrentUser, SessionDep
+from app.api.deps import CurrentUser, OutputCurrency, SessionDep
+from app.api.pagination import decode_cursor, get_next_cursor
+from app.crud import counter_crud
+from app.crud.product_crud import product_catalog
+from app.models.order_models import Order, OrderLine
 from app.models.product_models import *
+from app.utilities.currency_utils import get_currency_rates
+from app.utilities.datetime_utils import as_utc
 from app.models.user_models import Message
 
 router = APIRouter(prefix="/products", tags=["products"])
@@ -21,22 +30,82 @@ def read_product_count(
     Retrieve customers only for the count.
     """
 
-    # Build base query
-    count_query = select(func.count()).select_from(Product)
-    # Add filters
-    if not display_invalid:
-        count_query = count_query.where(Product.is_valid == True)
-
-    count = session.exec(count_query).one()
+    count = counter_crud.read_count(session=session, entity=counter_crud.PRODUCT,
+                                    display_invalid=display_invalid)
 
     return ProductsCount(count=count)
 
-@router.get("/{id}", response_model=Product)
-def read_product(session: SessionDep, current_user: CurrentUser, id: str) -> Any:
+@router.get("/top", response_model=TopProducts)
+def read_top_products(
+    session: SessionDep, current_user: CurrentUser, limit: int = 10,
+    start_date: datetime | None = None,
+    end_date: datetime | None = None
+) -> Any:
+    """
+    Retrieve the products with the most units sold on valid orders.
+    Args:
+        start_date: Optional start date in format "YYYY-MM-DD HH:MM:SS"
+        end_date: Optional end date in format "YYYY-MM-DD HH:MM:SS"
+    """
+    units_sold = func.sum(OrderLine.quantity)
+    columns: list[Any] = [OrderLine.product_id, Product.brand, Product.type, units_sold,
+                          func.count(col(OrderLine.order_id))]
+    # Orders are found through their date index, their lines through the line primary key
+    query = (
+        select(*columns)
+        .join(Order, Order.id == OrderLine.order_id)
+        .outerjoin(Product, Product.id == OrderLine.product_id)
+        .where(Order.is_valid == True)
+        .group_by(OrderLine.product_id, Product.brand, Product.type)
+        .order_by(units_sold.desc(), OrderLine.product_id)
+        .limit(limit)
+    )
+    if start_date:
+        query = query.where(col(Order.order_date) >= as_utc(start_date))
+    if end_date:
+        query = query.where(col(Order.order_date) <= as_utc(end_date))
+
+    return TopProducts(data=[
+        TopProduct(product_id=product_id, brand=brand, type=type, units_sold=units, order_count=order_count)
+        for product_id, brand, type, units, order_count in session.exec(query).all()
+    ])
+
+@router.get("/facets", response_model=ProductFacets)
+def read_products_facets(
+    current_user: CurrentUser, response: Response,
+    display_invalid: bool = False, brand: str | None = None, type: str | None = None,
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Any:
+    """
+    Product counts per brand, type and price currency, and the unit price
+    range, of the products matching the same filters as the product list.
+    Facets are computed from the product catalog and cached until products
+    are written, the ETag changes with them.
+    """
+    snapshot = product_catalog.snapshot()
+    count, row_versions = snapshot.version
+    etag = f'"facets-{count}-{row_versions}"'
+    if if_none_match and (if_none_match.strip() == "*"
+                          or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    facets = snapshot.get_facets(brand=brand or None, type=type or None, display_invalid=display_invalid)
+    response.headers["ETag"] = etag
+    return facets
+
+@router.get("/catalog-stats", response_model=ProductCatalogStats)
+def read_product_catalog_stats(current_user: CurrentUser) -> Any:
+    """
+    Size, hit and miss counts of this worker's in-memory product catalog.
+    """
+    return product_catalog.stats()
+
+@router.get("/{id}", response_model=ProductPublic)
+def read_product(current_user: CurrentUser, id: str) -> Any:
     """
     Get Product by ID.
     """
-    product = session.get(Product, id)
+    product = product_catalog.get(id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
@@ -44,37 +113,53 @@ def read_product(session: SessionDep, current_user: CurrentUser, id: str) -> Any
 
 @router.get("/", response_model=ProductsPublic)
 def read_products(
-    session: SessionDep, current_user: CurrentUser, skip: int = 0, limit: int = 500,
-    display_invalid: bool = False, brand: str = None, type: str = None
+    current_user: CurrentUser, skip: int = 0, limit: int = 500,
+    display_invalid: bool = False, brand: str | None = None, type: str | None = None,
+    cursor: str | None = None, include_count: bool = True, approximate_count: bool = False,
+    output_currency: OutputCurrency = None,
 ) -> Any:
     """
-    Retrieve products.
+    Retrieve products ordered by id, from the in-memory catalog.
+    Args:
+        cursor: Optional next_cursor of the previous page, replaces skip
+        include_count: Set to false to skip counting, count is then null
+        approximate_count: Kept for compatibility, the count is always exact
+        output_currency: Optional, convert prices and costs to this currency
     """
+    snapshot = product_catalog.snapshot()
+    ids = snapshot.find_ids(brand=brand or None, type=type or None, display_invalid=display_invalid)
 
-     # Build base query
-    query = select(Product)
-    count_query = select(func.count()).select_from(Product)
-
-    # Add filters
-    if not display_invalid:
-        query = query.where(Product.is_valid == True)
-        count_query = count_query.where(Product.is_valid == True)
-
-    if brand:
-        query = query.where(Product.brand == brand)
-        count_query = count_query.where(Product.brand == brand)
+    # Seek past the last id of the previous page
+    start = bisect_right(ids, decode_cursor(cursor, 1)[0]) if cursor else skip
+    products = [snapshot.products[product_id] for product_id in ids[start:start + limit]]
+    count = len(ids) if include_count else None
+    next_cursor = get_next_cursor(products, limit, lambda product: (product.id,))
 
-    if type:
-        query = query.where(Product.type == type)
-        count_query = count_query.where(Product.type == type)
+    if output_currency:
+        # The catalog products are shared, convert copies of them
+        data = [product.model_copy() for product in products]
+        convert_product_prices(data, output_currency)
+    else:
+        data = products
+    return ProductsPublic(data=data, count=count, next_cursor=next_cursor)
 
-    # Add pagination
-    query = query.offset(skip).limit(limit)
-        
-    count = session.exec(count_query).one()
-    products = session.exec(query).all()
 
-    return ProductsPublic(data=products, count=count)
+def convert_product_prices(products: list[ProductPublic], output_currency: str) -> None:
+    """
+    Convert the prices and costs of a page of products in one vectorized pass
+    per column. Amounts in a currency without a known rate are left as they are.
+    """
+    rates = get_currency_rates()
+    for amount_field, currency_field in (("unit_price", "price_currency"), ("unit_cost", "cost_currency")):
+        convertible = [product for product in products
+                       if getattr(product, amount_field) is not None and getattr(product, currency_field) in rates]
+        if not convertible:
+            continue
+        amounts = rates.convert([getattr(product, amount_field) for product in convertible],
+                                [getattr(product, currency_field) for product in convertible], output_currency)
+        for product, amount in zip(convertible, amounts.round(2).tolist(), strict=True):
+            setattr(product, amount_field, amount)
+            setattr(product, currency_field, output_currency)
 
 
 @router.post("/", response_model=Product)
@@ -86,8 +171,11 @@ def create_product(
     """
     product = Product.model_validate(product_in)
     session.add(product)
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.PRODUCT, removed=[],
+                                       added=[counter_crud.get_counter_key(product.is_valid)])
     session.commit()
     session.refresh(product)
+    product_catalog.refresh()
     return product
 
 @router.put("/{id}", response_model=ProductPublic)
@@ -101,17 +189,22 @@ def update_product(
     """
     Update a product.
     """
-    product = session.get(Product, id)
+    # Locked so that concurrent updates move the counters one after the other
+    product = session.get(Product, id, with_for_update=True)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     if not current_user.is_superuser:
         raise HTTPException(status_code=400, detail="Not enough permissions")
     
     update_dict = product_in.model_dump(exclude_unset=True)
+    previous_key = counter_crud.get_counter_key(product.is_valid)
     product.sqlmodel_update(update_dict)
     session.add(product)
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.PRODUCT, removed=[previous_key],
+                                       added=[counter_crud.get_counter_key(product.is_valid)])
     session.commit()
     session.refresh(product)
+    product_catalog.refresh()
     return product
 
 @router.delete("/{id}")
@@ -122,7 +215,7 @@ def delete_product(
     """
     Delete a product.
     """
-    product = session.get(Product, id)
+    product = session.get(Product, id, with_for_update=True)
     if not current_user.is_superuser:
         raise HTTPException(status_code=400, detail="Not enough permissions")
     if not product:
@@ -131,11 +224,14 @@ def delete_product(
     product_in = ProductUpdate(is_valid=False, product_id=product.id, description="Marked as Deleted")
 
     update_dict = product_in.model_dump(exclude_unset=True)
+    previous_key = counter_crud.get_counter_key(product.is_valid)
     #update_dict = order.model_dump(exclude_unset=True, update={"is_valid": False} )
     product.sqlmodel_update(update_dict)
     session.add(product)
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.PRODUCT, removed=[previous_key],
+                                       added=[counter_crud.get_counter_key(product.is_valid)])
     session.commit()
-    session.refresh(product)
+    product_catalog.refresh()
     return Message(message="Product deleted successfully, mark as invalid")
 
 
@@ -144,7 +240,6 @@ class ProductsRequest(BaseModel):
 
 @router.post("/batch-by-names", response_model=ProductsPublic)
 def get_products_by_names(
-    session: SessionDep,
     current_user: CurrentUser,
     request_data: list[str] = Body(..., description="list of string containing a list of product names"),
 ) -> Any:
@@ -154,20 +249,7 @@ def get_products_by_names(
     Accepts a JSON string containing a list of product names and returns information for all found products.
     Products that don't exist will be silently skipped.
     """
-    try:
-        # Parse the JSON string to get the list of product names
-        #product_names = json.loads(request_data)
-        
-        # Build query to fetch all requested products in one database call
-        query = select(Product).where(Product.id.in_(request_data))
-
-        # Execute query
-        products = session.exec(query).all()
-        
-        # Count the number of products found
-        count = len(products)
-        
-        return ProductsPublic(data=products, count=count)
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
\ No newline at end of file
+    products = product_catalog.get_many(request_data)
+    # In the order they were asked for
+    data = [products[product_id] for product_id in dict.fromkeys(request_data) if product_id in products]
+    return ProductsPublic(data=data, count=len(data))
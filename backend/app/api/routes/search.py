@@ -0,0 +1,29 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException
+
+from app.api.deps import CurrentUser, SessionDep
+from app.crud import search_crud
+from app.models.search_models import SearchResults
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("", response_model=SearchResults)
+def search(
+    session: SessionDep, current_user: CurrentUser, q: str,
+    types: str = ",".join(search_crud.SEARCH_TYPES), limit: int = 20,
+) -> Any:
+    """
+    Search valid customers, products and orders, best matches first. Every
+    word of q matches words starting with it, so partial input finds results.
+    Args:
+        q: Words to search for
+        types: Comma separated types to search among customer, product and order
+        limit: Maximum number of results over all types
+    """
+    requested_types = [type.strip() for type in types.split(",") if type.strip()]
+    unknown_types = set(requested_types) - set(search_crud.SEARCH_TYPES)
+    if unknown_types:
+        raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(sorted(unknown_types))}")
+
+    return SearchResults(data=search_crud.search(session=session, q=q, types=requested_types, limit=limit))
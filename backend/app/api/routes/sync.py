@@ -0,0 +1,61 @@
+from typing import Any, Literal
+
+from fastapi import APIRouter
+from sqlalchemy import literal, tuple_
+from sqlmodel import SQLModel, func, select
+
+from app.api.deps import CurrentUser, SessionDep
+from app.api.pagination import decode_cursor, encode_cursor
+from app.models.customer_models import Customer, CustomerPublic
+from app.models.order_models import Order, OrderPublic
+from app.models.product_models import Product, ProductPublic
+from app.models.sync_models import SyncChanges
+
+router = APIRouter(prefix="/sync", tags=["sync"])
+
+# The table models are Any, mypy does not see their columns through a union
+SYNC_ENTITIES: dict[str, tuple[Any, type[SQLModel]]] = {
+    "orders": (Order, OrderPublic),
+    "products": (Product, ProductPublic),
+    "customers": (Customer, CustomerPublic),
+}
+
+@router.get("/{entity}", response_model=SyncChanges)
+def read_changes(
+    session: SessionDep, current_user: CurrentUser,
+    entity: Literal["orders", "products", "customers"],
+    since: int = 0, cursor: str | None = None, limit: int = 1000,
+) -> Any:
+    """
+    Retrieve the rows written since a watermark, soft deleted rows included
+    with is_valid false. A row may be sent again by a later sync, apply rows
+    by id.
+    Args:
+        since: watermark of the previous sync, 0 for every row
+        cursor: Optional next_cursor of the previous page of the same sync
+    """
+    model, public_model = SYNC_ENTITIES[entity]
+
+    query = select(model).where(model.row_version >= since)
+    if cursor:
+        # Pages of one sync share the watermark of its first page, rows
+        # committed in between may sort before the cursor
+        row_version, last_id, watermark = decode_cursor(cursor, 3)
+        query = query.where(tuple_(model.row_version, model.id) > tuple_(
+            literal(row_version, model.row_version.type), literal(last_id, model.id.type)
+        ))
+    else:
+        # Transactions from xmin on may still commit rows, which then have a
+        # row_version of at least xmin and are picked up by the next sync
+        watermark = session.exec(select(func.txid_snapshot_xmin(func.txid_current_snapshot()))).one()
+    rows = session.exec(query.order_by(model.row_version, model.id).limit(limit)).all()
+
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor([rows[-1].row_version, rows[-1].id, watermark])
+    return SyncChanges(
+        entity=entity,
+        data=[public_model.model_validate(row).model_dump(mode="json") for row in rows],
+        next_cursor=next_cursor,
+        watermark=watermark,
+    )
@@ -2,7 +2,7 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import col, delete, func, select
+from sqlmodel import col, delete
 
 from app.crud import user_crud
 from app.api.deps import (
@@ -10,6 +10,7 @@ from app.api.deps import (
     SessionDep,
     get_current_active_superuser,
 )
+from app.api.pagination import fetch_page, get_next_cursor
 from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
 from app.models.user_models import (
@@ -34,18 +35,32 @@ router = APIRouter(prefix="/users", tags=["users"])
     dependencies=[Depends(get_current_active_superuser)],
     response_model=UsersPublic,
 )
-def read_users(session: SessionDep, skip: int = 0, limit: int = 100) -> Any:
+def read_users(
+    session: SessionDep,
+    skip: int = 0,
+    limit: int = 100,
+    cursor: str | None = None,
+    include_count: bool = True,
+    approximate_count: bool = False,
+) -> Any:
     """
     Retrieve users.
     """
 
-    count_statement = select(func.count()).select_from(User)
-    count = session.exec(count_statement).one()
-
-    statement = select(User).offset(skip).limit(limit)
-    users = session.exec(statement).all()
-
-    return UsersPublic(data=users, count=count)
+    users, count = fetch_page(
+        session,
+        User,
+        [],
+        [User.id],
+        cursor=cursor,
+        skip=skip,
+        limit=limit,
+        include_count=include_count,
+        approximate_count=approximate_count,
+    )
+    next_cursor = get_next_cursor(users, limit, lambda user: (user.id,))
+
+    return UsersPublic(data=users, count=count, next_cursor=next_cursor)
 
 
 @router.post(
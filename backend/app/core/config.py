@@ -86,6 +86,23 @@ class Settings(BaseSettings):
 
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
 
+    # Bulk invoice export renders in a pool of worker processes
+    INVOICE_EXPORT_WORKERS: int = 2
+    INVOICE_EXPORT_MAX_ORDERS: int = 5000
+
+    # Rendered invoices are cached on local disk
+    INVOICE_CACHE_DIR: str = ".cache/invoices"
+    INVOICE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # Order change events pushed to /orders/stream subscribers, events a
+    # subscriber has not taken beyond the queue size are replaced by a resync
+    ORDER_EVENTS_QUEUE_SIZE: int = 64
+    ORDER_EVENTS_KEEPALIVE_SECONDS: int = 15
+
+    # Products are served from an in-memory catalog, reloaded when another
+    # worker's writes are seen by a version check this often
+    PRODUCT_CATALOG_CHECK_SECONDS: float = 5
+
     @computed_field  # type: ignore[prop-decorator]
     @property
     def emails_enabled(self) -> bool:
@@ -0,0 +1,67 @@
+from collections import Counter
+from collections.abc import Sequence
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, func, select
+
+from app.models.dashboard_models import EntityCounter
+
+CUSTOMER = "customer"
+ORDER = "order"
+PRODUCT = "product"
+
+# (is_valid, status) of one row, status is "" for entities without one
+CounterKey = tuple[bool, str]
+
+
+def get_counter_key(is_valid: bool | None, status: str | None = None) -> CounterKey:
+    """Key a row is counted under, matching the `is_valid == True` filter."""
+    return (is_valid is True, status or "")
+
+
+def apply_counter_changes(
+    *,
+    session: Session,
+    entity: str,
+    removed: Sequence[CounterKey | None],
+    added: Sequence[CounterKey | None],
+) -> None:
+    """
+    Move rows of `entity` out of the `removed` counters and into the `added`
+    ones, in the caller's transaction. None stands for a row that did not
+    exist before (in removed) or no longer exists (in added).
+    """
+    deltas: Counter[CounterKey] = Counter()
+    deltas.subtract(key for key in removed if key is not None)
+    deltas.update(key for key in added if key is not None)
+
+    # Rows are locked in key order, so that transactions moving rows between
+    # the same counters in opposite directions cannot deadlock
+    rows = [
+        {"entity": entity, "is_valid": is_valid, "status": status, "count": delta}
+        for (is_valid, status), delta in sorted(deltas.items())
+        if delta
+    ]
+    if not rows:
+        return
+
+    statement = insert(EntityCounter).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["entity", "is_valid", "status"],
+        set_={"count": EntityCounter.count + statement.excluded.count},
+    )
+    session.exec(statement)  # type: ignore
+
+
+def read_count(
+    *, session: Session, entity: str, display_invalid: bool = False, status: str | None = None
+) -> int:
+    """Number of rows of `entity`, optionally including invalid ones or of one status."""
+    statement = select(func.coalesce(func.sum(EntityCounter.count), 0)).where(
+        EntityCounter.entity == entity
+    )
+    if not display_invalid:
+        statement = statement.where(EntityCounter.is_valid == True)
+    if status:
+        statement = statement.where(EntityCounter.status == status)
+    return int(session.exec(statement).one())
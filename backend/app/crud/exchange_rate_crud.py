@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from sqlalchemy import Connection, Engine, insert
+from sqlmodel import Session, col, func, select
+
+from app.models.exchange_rate_models import ExchangeRateSnapshot
+
+# Advisory lock key held by the worker refreshing the rates
+RATE_REFRESH_LOCK_KEY = 0x52415445  # "RATE"
+
+
+def read_snapshots(*, session: Session, after: datetime | None = None) -> list[ExchangeRateSnapshot]:
+    query = select(ExchangeRateSnapshot).order_by(col(ExchangeRateSnapshot.fetched_at))
+    if after is not None:
+        query = query.where(col(ExchangeRateSnapshot.fetched_at) > after)
+    return list(session.exec(query).all())
+
+
+class DatabaseRateStore:
+    """
+    Rate snapshots in the exchange_rate_snapshot table. The refresh leader is
+    elected with a transaction level advisory lock, taken in a transaction
+    kept open on its own connection from before the fetch until the snapshot
+    is written, so the lock goes away with the transaction whatever happens.
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+
+    def load_snapshots(self, after: datetime | None) -> list[tuple[datetime, dict[str, float]]]:
+        with Session(self.engine) as session:
+            return [(snapshot.fetched_at, snapshot.rates) for snapshot in read_snapshots(session=session, after=after)]
+
+    def try_lead(self, stale_before: datetime) -> Connection | None:
+        connection = self.engine.connect()
+        try:
+            if connection.execute(select(func.pg_try_advisory_xact_lock(RATE_REFRESH_LOCK_KEY))).scalar():
+                # The previous leader may have written a snapshot since the caller looked
+                last_fetched_at = connection.execute(select(func.max(ExchangeRateSnapshot.fetched_at))).scalar()
+                if last_fetched_at is None or last_fetched_at < stale_before:
+                    return connection
+        except Exception:
+            connection.close()
+            raise
+        self.release(connection)
+        return None
+
+    def save(self, lease: Connection, rates: dict[str, float], fetched_at: datetime, source: str) -> None:
+        lease.execute(insert(ExchangeRateSnapshot).values(fetched_at=fetched_at, source=source, rates=rates))
+        lease.commit()
+
+    def release(self, lease: Connection) -> None:
+        # Closing rolls back whatever was not committed, which releases the lock
+        lease.close()
@@ -0,0 +1,503 @@
+import json
+import uuid
+from collections import Counter, defaultdict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import (
+    Date,
+    DateTime,
+    Float,
+    Integer,
+    String,
+    case,
+    cast,
+    column,
+    literal,
+    null,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import UUID, insert
+from sqlalchemy.sql import ColumnElement
+from sqlmodel import Session, col, func, select
+
+from app.crud import counter_crud
+from app.crud.product_crud import product_catalog
+from app.models.customer_models import Customer, CustomerStats
+from app.models.order_models import Order, OrderDailyRollup, OrderIdCounter, OrderLine
+from app.utilities.currency_utils import (
+    CurrencyRates,
+    get_currency_rates,
+    get_rate_snapshot,
+)
+from app.utilities.datetime_utils import as_utc
+
+UNKNOWN_STATUS = "Unknown"
+
+
+@dataclass(frozen=True)
+class OrderFacts:
+    """The parts of an order that the derived order tables are built from."""
+
+    order_date: datetime
+    order_status: str
+    total_price: float
+    customer_id: str | None
+
+    @property
+    def day(self) -> date:
+        return as_utc(self.order_date).date()
+
+
+def parse_order_items(order_items: str | None) -> dict[str, float]:
+    """
+    Parse the {"<product id>": <quantity>} JSON sent by the frontend.
+    Raises ValueError when it is malformed.
+    """
+    if not order_items:
+        return {}
+    items = json.loads(order_items)
+    if not isinstance(items, dict):
+        raise ValueError("order_items must be a JSON object")
+    try:
+        return {str(product_id): float(quantity) for product_id, quantity in items.items()}
+    except (TypeError, ValueError):
+        raise ValueError("order_items quantities must be numbers")
+
+
+def allocate_order_ids(*, session: Session, when: datetime, count: int = 1) -> list[str]:
+    """
+    Reserve `count` consecutive order ids in the month of `when`, numbered
+    year * 1000000 + month * 10000 + n. Past the 9999th order of a month n
+    takes more digits instead of spilling into the next month's range, so
+    ids stay unique. A single upsert on the month's
+    counter row hands them out, so ids never collide between workers. The
+    row stays locked until the caller commits; ids of a rolled back
+    transaction are not reused.
+    """
+    period = when.year * 100 + when.month
+    statement = insert(OrderIdCounter).values(period=period, last_value=count)
+    statement = statement.on_conflict_do_update(
+        index_elements=["period"],
+        set_={"last_value": OrderIdCounter.last_value + statement.excluded.last_value},
+    )
+    last_value = session.exec(statement.returning(col(OrderIdCounter.last_value))).scalar_one()  # type: ignore
+    return [f"{period}{n:04d}" for n in range(last_value - count + 1, last_value + 1)]
+
+
+def set_order_lines(*, order: Order, items: dict[str, float]) -> None:
+    """
+    Replace the lines of an order. Lines for products that were already on the
+    order keep their price snapshot, new lines take the current product price,
+    looked up in the product catalog. Raises ValueError, leaving the order as
+    it was, when a new line is for an unknown product.
+    """
+    previous_lines = {line.product_id: line for line in order.lines}
+    new_product_ids = [product_id for product_id in items if product_id not in previous_lines]
+    products = product_catalog.get_many(new_product_ids) if new_product_ids else {}
+    missing = [product_id for product_id in new_product_ids if product_id not in products]
+    if missing:
+        raise ValueError(f"Product {missing[0]} not found")
+
+    lines = []
+    for line_no, (product_id, quantity) in enumerate(items.items()):
+        line = previous_lines.get(product_id)
+        if line is None:
+            product = products[product_id]
+            line = OrderLine(product_id=product_id, unit_price=product.unit_price, currency=product.price_currency)
+        line.line_no = line_no
+        line.quantity = quantity
+        lines.append(line)
+    order.lines = lines
+
+
+def compute_line_totals(
+    unit_prices: np.ndarray, quantities: np.ndarray, currencies: np.ndarray, rates: dict[str, float]
+) -> np.ndarray:
+    """SGD value of each line, converting the whole vector of lines at once."""
+    return CurrencyRates(rates).convert(unit_prices * quantities, currencies, "SGD")
+
+
+def set_order_total(order: Order) -> None:
+    """
+    Compute the SGD total of an order from its line price snapshots and keep
+    the rates used with it. Lines without a known price count as zero.
+    """
+    currencies = np.array([(line.currency or "SGD").upper() for line in order.lines], dtype=object)
+    rates = get_rate_snapshot(set(currencies))
+    unit_prices = np.array([line.unit_price or 0 for line in order.lines], dtype=float)
+    quantities = np.array([line.quantity for line in order.lines], dtype=float)
+    order.total_price = round(float(compute_line_totals(unit_prices, quantities, currencies, rates).sum()), 2)
+    order.rate_snapshot = rates
+
+
+def get_order_facts(order: Order) -> OrderFacts | None:
+    """
+    Snapshot an order for the rollups. Invalid (soft deleted) and undated
+    orders do not contribute, so they return None.
+    """
+    if not order.is_valid or order.order_date is None:
+        return None
+    return OrderFacts(
+        order_date=as_utc(order.order_date),
+        order_status=order.order_status or UNKNOWN_STATUS,
+        total_price=order.total_price or 0,
+        customer_id=order.customer_id,
+    )
+
+
+def bulk_update_orders(
+    *, session: Session, filters: list[ColumnElement[bool]], values: dict[str, Any]
+) -> list[Order]:
+    """
+    Apply the same `values` to every order matching `filters` in a single
+    UPDATE ... RETURNING, in the caller's transaction. The previous status
+    and validity are returned by the same statement, from a locked snapshot
+    of the rows, and the rollups and counters are moved accordingly.
+    """
+    previous = (
+        select(Order.id, Order.is_valid, Order.order_status)
+        .where(*filters)
+        .with_for_update()
+        .cte("previous")
+    )
+    statement = (
+        update(Order)
+        .where(col(Order.id) == previous.c.id)
+        .values(**values)
+        .returning(Order, previous.c.is_valid, previous.c.order_status)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    results = session.exec(statement).all()  # type: ignore
+
+    removed_facts, added_facts, removed_keys, added_keys = [], [], [], []
+    for order, was_valid, previous_status in results:
+        # Bulk changes never touch the order date or total
+        if was_valid and order.order_date is not None:
+            removed_facts.append(OrderFacts(
+                order_date=as_utc(order.order_date),
+                order_status=previous_status or UNKNOWN_STATUS,
+                total_price=order.total_price or 0,
+                customer_id=order.customer_id,
+            ))
+        added_facts.append(get_order_facts(order))
+        removed_keys.append(counter_crud.get_counter_key(was_valid, previous_status))
+        added_keys.append(counter_crud.get_counter_key(order.is_valid, order.order_status))
+    apply_order_changes(session=session, removed=removed_facts, added=added_facts)
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.ORDER,
+                                       removed=removed_keys, added=added_keys)
+    return [order for order, _, _ in results]
+
+
+def apply_order_changes(
+    *,
+    session: Session,
+    removed: Sequence[OrderFacts | None],
+    added: Sequence[OrderFacts | None],
+) -> None:
+    """
+    Move the contribution of `removed` orders out of the rollups and add the
+    contribution of `added` orders, in the caller's transaction.
+    """
+    removed_facts = [facts for facts in removed if facts is not None]
+    added_facts = [facts for facts in added if facts is not None]
+    _apply_daily_rollup_changes(session=session, removed=removed_facts, added=added_facts)
+    _apply_customer_stats_changes(session=session, removed=removed_facts, added=added_facts)
+
+
+def _apply_daily_rollup_changes(
+    *, session: Session, removed: list[OrderFacts], added: list[OrderFacts]
+) -> None:
+    deltas: dict[tuple[date, str], list[float]] = defaultdict(lambda: [0, 0.0])
+    for sign, facts_list in ((-1, removed), (1, added)):
+        for facts in facts_list:
+            delta = deltas[(facts.day, facts.order_status)]
+            delta[0] += sign
+            delta[1] += sign * facts.total_price
+
+    # Rows are locked in key order, so that transactions moving orders
+    # between the same keys in opposite directions cannot deadlock
+    rows = [
+        {"day": day, "order_status": status, "order_count": count, "revenue": revenue}
+        for (day, status), (count, revenue) in sorted(deltas.items())
+        if count or revenue
+    ]
+    if not rows:
+        return
+
+    statement = insert(OrderDailyRollup).values(rows)
+    statement = statement.on_conflict_do_update(
+        index_elements=["day", "order_status"],
+        set_={
+            "order_count": OrderDailyRollup.order_count
+            + statement.excluded.order_count,
+            "revenue": OrderDailyRollup.revenue + statement.excluded.revenue,
+        },
+    )
+    session.exec(statement)  # type: ignore
+
+
+def _apply_customer_stats_changes(
+    *, session: Session, removed: list[OrderFacts], added: list[OrderFacts]
+) -> None:
+    """
+    Orders of customer ids that are not customers are not tracked. Adding
+    orders can only widen the first/last order dates; when orders are taken
+    away the dates of their customers are recomputed from the order table.
+    """
+    deltas: dict[uuid.UUID, list[Any]] = {}
+    removed_dates: dict[uuid.UUID, Counter[datetime]] = defaultdict(Counter)
+    for sign, facts_list in ((-1, removed), (1, added)):
+        for facts in facts_list:
+            try:
+                customer_id = uuid.UUID(facts.customer_id)
+            except (TypeError, ValueError):
+                continue
+            delta = deltas.setdefault(customer_id, [0, 0.0, None, None])
+            delta[0] += sign
+            delta[1] += sign * facts.total_price
+            if sign < 0:
+                removed_dates[customer_id][facts.order_date] += 1
+            else:
+                removed_dates[customer_id][facts.order_date] -= 1
+                delta[2] = min(filter(None, (delta[2], facts.order_date)))
+                delta[3] = max(filter(None, (delta[3], facts.order_date)))
+    if not deltas:
+        return
+
+    # The join of an UPDATE ... FROM visits rows in no set order, the rows are
+    # locked in id order first so that orders moved between the same
+    # customers in opposite directions cannot deadlock
+    session.exec(
+        select(Customer.id).where(col(Customer.id).in_(sorted(deltas))).order_by(col(Customer.id)).with_for_update()
+    ).all()
+    # The stats are part of the synced customer, a new row version hands them to the next sync
+    session.exec(  # type: ignore
+        update(Customer)
+        .where(col(Customer.id).in_(sorted(deltas)))
+        .values(row_version=func.txid_current())
+        .execution_options(synchronize_session=False)
+    )
+    session.exec(
+        select(CustomerStats.customer_id)
+        .where(col(CustomerStats.customer_id).in_(sorted(deltas)))
+        .order_by(col(CustomerStats.customer_id))
+        .with_for_update()
+    ).all()
+
+    changes = values(
+        column("customer_id", UUID),
+        column("order_count", Integer),
+        column("revenue", Float),
+        column("first_order_date", DateTime(timezone=True)),
+        column("last_order_date", DateTime(timezone=True)),
+        name="changes",
+    ).data([(customer_id, *delta) for customer_id, delta in deltas.items()])
+    session.exec(  # type: ignore
+        update(CustomerStats)
+        .where(col(CustomerStats.customer_id) == changes.c.customer_id)
+        .values(
+            order_count=CustomerStats.order_count + changes.c.order_count,
+            lifetime_revenue=CustomerStats.lifetime_revenue + changes.c.revenue,
+            # VALUES rows holding only NULL dates leave their type unknown
+            first_order_date=func.least(
+                CustomerStats.first_order_date, cast(changes.c.first_order_date, DateTime(timezone=True))
+            ),
+            last_order_date=func.greatest(
+                CustomerStats.last_order_date, cast(changes.c.last_order_date, DateTime(timezone=True))
+            ),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+    # Orders re-added with the same date (a status change) leave the dates as they are
+    recompute = [customer_id for customer_id, dates in removed_dates.items() if +dates]
+    if recompute:
+        customer_orders = select(Order.order_date).where(
+            Order.customer_id == cast(CustomerStats.customer_id, String), Order.is_valid == True
+        )
+        session.exec(  # type: ignore
+            update(CustomerStats)
+            .where(col(CustomerStats.customer_id).in_(recompute))
+            .values(
+                first_order_date=customer_orders.with_only_columns(func.min(Order.order_date)).scalar_subquery(),
+                last_order_date=customer_orders.with_only_columns(func.max(Order.order_date)).scalar_subquery(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+
+def read_order_timeseries(
+    *, session: Session, bucket: str, start: date, end: date, group_by: str | None, compare: bool
+) -> list[Any]:
+    """
+    Order count and revenue of valid orders per `bucket` ("day", "week" or
+    "month") between the UTC days `start` and `end`, both included, as
+    (bucket, group, order_count, revenue, previous_order_count,
+    previous_revenue) rows ordered by bucket and group.
+
+    Grouping by status or not at all reads the daily rollup, grouping by
+    customer reads the order table through its order date index. With
+    `compare` the period of the same length just before `start` is read in
+    the same query; its days are moved forward one period, so each bucket
+    holds the figures it compares with.
+    """
+    period_days = (end - start).days + 1
+    first_day = start - timedelta(days=period_days) if compare else start
+    # Columns of the selects below are model attributes or SQL expressions,
+    # in more than the four columns select() has typed overloads for
+    columns: list[Any]
+    if group_by == "customer":
+        order_day = cast(func.timezone("UTC", Order.order_date), Date)
+        order_date = col(Order.order_date)
+        columns = [
+            order_day.label("day"), col(Order.customer_id).label("group"),
+            literal(1).label("order_count"), col(Order.total_price).label("revenue"),
+        ]
+        source = select(*columns).where(
+            Order.is_valid == True,
+            order_date >= datetime.combine(first_day, time(), timezone.utc),
+            order_date < datetime.combine(end + timedelta(days=1), time(), timezone.utc),
+        )
+    else:
+        group = col(OrderDailyRollup.order_status) if group_by == "status" else null()
+        columns = [OrderDailyRollup.day, group.label("group"), OrderDailyRollup.order_count, OrderDailyRollup.revenue]
+        source = select(*columns).where(OrderDailyRollup.day >= first_day, OrderDailyRollup.day <= end)
+    rows = source.subquery("rows")
+
+    current = rows.c.day >= start
+    day = case((current, rows.c.day), else_=rows.c.day + period_days)
+    columns = [
+        cast(func.date_trunc(bucket, cast(day, DateTime)), Date).label("bucket"),
+        rows.c.group, current.label("current"), rows.c.order_count, rows.c.revenue,
+    ]
+    bucketed = select(*columns).subquery("bucketed")
+
+    def total(value: ColumnElement[Any], current: bool) -> ColumnElement[Any]:
+        condition = bucketed.c.current if current else ~bucketed.c.current
+        return func.coalesce(func.sum(value).filter(condition), 0)
+
+    columns = [
+        bucketed.c.bucket, bucketed.c.group,
+        total(bucketed.c.order_count, True), total(bucketed.c.revenue, True),
+        total(bucketed.c.order_count, False), total(bucketed.c.revenue, False),
+    ]
+    query = (
+        select(*columns)
+        .group_by(bucketed.c.bucket, bucketed.c.group)
+        .order_by(bucketed.c.bucket, bucketed.c.group)
+    )
+    return session.exec(query).all()  # type: ignore
+
+
+ORDER_COPY_COLUMNS = (
+    "id", "customer_id", "order_date", "order_update_date", "order_status",
+    "payment_status", "notes", "order_quantity", "total_price", "is_valid", "rate_snapshot",
+)
+LINE_COPY_COLUMNS = ("order_id", "product_id", "line_no", "quantity", "unit_price", "currency")
+
+
+def import_orders(*, session: Session, orders: pd.DataFrame, errors: pd.Series, now: datetime) -> int:
+    """
+    Insert a chunk of imported orders, as normalized by validate_order_frame.
+    Customers and products are looked up with one query each; rows that
+    reference unknown ones get an entry in `errors`. The remaining rows and
+    their lines are loaded with COPY, ids are reserved in one block per
+    month, and the rollups and counters are updated once for the chunk.
+    Returns the number of orders inserted, in the caller's transaction.
+    """
+    items_by_row: dict[int, dict[str, float]] = {}
+    for row, order_items in orders.loc[errors == "", "order_items"].items():
+        try:
+            items_by_row[row] = parse_order_items(order_items)
+        except ValueError as e:
+            errors[row] = f"Invalid order items: {e}"
+
+    customer_ids = {}
+    for customer_id in orders.loc[errors == "", "customer_id"].unique():
+        customer_ids[customer_id] = uuid.UUID(customer_id)
+    known_customers = set()
+    if customer_ids:
+        statement = select(Customer.id).where(col(Customer.id).in_(set(customer_ids.values())))
+        known_customers = set(session.exec(statement))
+    unknown_customer = orders["customer_id"].map(lambda value: customer_ids.get(value) not in known_customers)
+    errors[unknown_customer & (errors == "")] = "Customer not found"
+
+    product_ids = {product_id for row, items in items_by_row.items() if not errors[row] for product_id in items}
+    products = {product.id: (product.unit_price, product.price_currency)
+                for product in product_catalog.get_many(product_ids).values()}
+    rates = get_currency_rates()
+    for row, items in items_by_row.items():
+        missing = [product_id for product_id in items if product_id not in products]
+        unknown_currencies = [products[product_id][1] for product_id in items
+                    if product_id in products and (products[product_id][1] or "SGD") not in rates]
+        if missing and not errors[row]:
+            errors[row] = f"Product {missing[0]} not found"
+        elif unknown_currencies and not errors[row]:
+            errors[row] = f"Unknown currency {unknown_currencies[0]}"
+
+    valid = orders[errors == ""].copy()
+    if valid.empty:
+        return 0
+
+    # Lines of the whole chunk as columns, priced in one vectorized pass
+    lines = pd.DataFrame(
+        [
+            (row, product_id, line_no, quantity, *products[product_id])
+            for row in valid.index
+            for line_no, (product_id, quantity) in enumerate(items_by_row.get(row, {}).items())
+        ],
+        columns=["row", "product_id", "line_no", "quantity", "unit_price", "currency"],
+    )
+    rate_snapshot = None
+    priced_rows = set(lines["row"])
+    if priced_rows:
+        lines["unit_price"] = lines["unit_price"].astype(float)
+        currencies = lines["currency"].fillna("SGD").str.upper().to_numpy(dtype=object)
+        line_rates = get_rate_snapshot(set(currencies))
+        lines["total"] = compute_line_totals(
+            lines["unit_price"].fillna(0).to_numpy(), lines["quantity"].to_numpy(dtype=float), currencies, line_rates
+        )
+        # Orders with lines get the computed total, the others keep the file's
+        totals = lines.groupby("row")["total"].sum().round(2)
+        valid.loc[totals.index, "total_price"] = totals
+        rate_snapshot = json.dumps(line_rates)
+
+    # Orders are numbered in the month they were placed
+    order_ids = pd.Series("", index=valid.index, dtype=object)
+    periods = valid["order_date"].dt.year * 100 + valid["order_date"].dt.month
+    for period, rows in valid.groupby(periods).groups.items():
+        when = datetime(period // 100, period % 100, 1)
+        order_ids[rows] = allocate_order_ids(session=session, when=when, count=len(rows))
+
+    raw_connection = session.connection().connection.driver_connection
+    assert raw_connection is not None, "no driver connection"
+    with raw_connection.cursor() as cursor:
+        with cursor.copy(f'COPY "order" ({", ".join(ORDER_COPY_COLUMNS)}) FROM STDIN') as copy:
+            for row, order in zip(valid.index, valid.itertuples(index=False), strict=True):
+                copy.write_row((
+                    order_ids[row], str(customer_ids[order.customer_id]), order.order_date.to_pydatetime(),
+                    now, order.order_status, order.payment_status, order.notes, order.order_quantity,
+                    order.total_price, True, rate_snapshot if row in priced_rows else None,
+                ))
+        with cursor.copy(f'COPY order_line ({", ".join(LINE_COPY_COLUMNS)}) FROM STDIN') as copy:
+            for line in lines.itertuples(index=False):
+                copy.write_row((
+                    order_ids[line.row], line.product_id, line.line_no, line.quantity,
+                    None if pd.isna(line.unit_price) else line.unit_price, line.currency,
+                ))
+
+    apply_order_changes(session=session, removed=[], added=[
+        OrderFacts(order_date=order.order_date.to_pydatetime(), order_status=order.order_status or UNKNOWN_STATUS,
+                   total_price=order.total_price, customer_id=str(customer_ids[order.customer_id]))
+        for order in valid.itertuples(index=False)
+    ])
+    counter_crud.apply_counter_changes(session=session, entity=counter_crud.ORDER, removed=[], added=[
+        counter_crud.get_counter_key(True, order_status) for order_status in valid["order_status"]
+    ])
+    return len(valid)
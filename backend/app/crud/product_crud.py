@@ -0,0 +1,235 @@
+import asyncio
+import logging
+import threading
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import MappingProxyType
+
+from sqlalchemy import Engine
+from sqlmodel import Session, func, select
+
+from app.core.config import settings
+from app.core.db import engine
+from app.models.product_models import (
+    FacetCount,
+    Product,
+    ProductCatalogStats,
+    ProductFacets,
+    ProductPublic,
+)
+
+logger = logging.getLogger(__name__)
+
+# Version of the catalog: the row count and the sum of the row versions.
+# Every insert or update gives its row the id of the writing transaction, so
+# the sum moves whichever transaction commits first
+CatalogVersion = tuple[int, int]
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    Every product as loaded at one version. The mappings are read only and
+    the products are shared by every reader, copy one before modifying it.
+    """
+
+    version: CatalogVersion
+    loaded_at: datetime
+    products: Mapping[str, ProductPublic]
+    # Product ids in id order, and per brand and type, in id order as well
+    ids: tuple[str, ...]
+    by_brand: Mapping[str, tuple[str, ...]]
+    by_type: Mapping[str, tuple[str, ...]]
+    # Facets computed from this snapshot, by filter set. A new snapshot starts
+    # empty, which is what invalidates them on product writes
+    facets: dict[tuple[bool, str | None, str | None], ProductFacets] = field(default_factory=dict, compare=False)
+
+    def find_ids(self, brand: str | None = None, type: str | None = None,
+                 display_invalid: bool = False) -> list[str]:
+        """Ids of the matching products in id order, narrowed down through the brand and type indexes"""
+        if brand is not None and type is not None:
+            candidates = self.by_brand.get(brand, ())
+            if len(self.by_type.get(type, ())) < len(candidates):
+                candidates = self.by_type[type]
+            ids = [product_id for product_id in candidates
+                   if self.products[product_id].brand == brand and self.products[product_id].type == type]
+        elif brand is not None:
+            ids = list(self.by_brand.get(brand, ()))
+        elif type is not None:
+            ids = list(self.by_type.get(type, ()))
+        else:
+            ids = list(self.ids)
+        if not display_invalid:
+            ids = [product_id for product_id in ids if self.products[product_id].is_valid]
+        return ids
+
+    def get_facets(self, brand: str | None = None, type: str | None = None,
+                   display_invalid: bool = False) -> ProductFacets:
+        """
+        Facets of the matching products, computed from this snapshot so that
+        they belong to its version. Only filters on brands and types of the
+        snapshot are cached, which bounds the cache by the catalog rather than
+        by the filters clients send.
+        """
+        if (brand is not None and brand not in self.by_brand) or (type is not None and type not in self.by_type):
+            return compute_product_facets([])
+        key = (display_invalid, brand, type)
+        facets = self.facets.get(key)
+        if facets is None:
+            facets = compute_product_facets(
+                self.products[product_id] for product_id in self.find_ids(brand, type, display_invalid)
+            )
+            self.facets[key] = facets
+        return facets
+
+
+def _build_snapshot(rows: Iterable[Product]) -> CatalogSnapshot:
+    products = {}
+    row_versions = 0
+    for row in rows:
+        products[row.id] = ProductPublic.model_validate(row)
+        row_versions += row.row_version or 0
+    ids = tuple(sorted(products))
+    by_brand: dict[str, list[str]] = defaultdict(list)
+    by_type: dict[str, list[str]] = defaultdict(list)
+    for product_id in ids:
+        product = products[product_id]
+        if product.brand is not None:
+            by_brand[product.brand].append(product_id)
+        if product.type is not None:
+            by_type[product.type].append(product_id)
+    return CatalogSnapshot(
+        version=(len(products), row_versions),
+        loaded_at=datetime.now(timezone.utc),
+        products=MappingProxyType(products),
+        ids=ids,
+        by_brand=MappingProxyType({brand: tuple(ids) for brand, ids in by_brand.items()}),
+        by_type=MappingProxyType({type: tuple(ids) for type, ids in by_type.items()}),
+    )
+
+
+def compute_product_facets(products: Iterable[ProductPublic]) -> ProductFacets:
+    """
+    Product counts per brand, type and price currency, with the overall count
+    and unit price range, of `products`.
+    """
+    brands: Counter[str | None] = Counter()
+    types: Counter[str | None] = Counter()
+    price_currencies: Counter[str | None] = Counter()
+    unit_prices = []
+    for product in products:
+        brands[product.brand] += 1
+        types[product.type] += 1
+        price_currencies[product.price_currency] += 1
+        if product.unit_price is not None:
+            unit_prices.append(product.unit_price)
+
+    def facet_counts(counts: Counter[str | None]) -> list[FacetCount]:
+        return [FacetCount(value=value, count=count)
+                for value, count in sorted(counts.items(), key=lambda item: (-item[1], item[0] or ""))]
+
+    return ProductFacets(
+        count=sum(brands.values()),
+        min_unit_price=min(unit_prices, default=None),
+        max_unit_price=max(unit_prices, default=None),
+        brands=facet_counts(brands),
+        types=facet_counts(types),
+        price_currencies=facet_counts(price_currencies),
+    )
+
+
+class ProductCatalogCache:
+    """
+    The whole product table held in memory as an immutable snapshot, replaced
+    as a whole when products change. Writes through this worker reload it
+    right after their commit; writes through other workers are picked up by
+    run(), which compares the stored version with the table's every
+    `check_interval` seconds. Lookups never query the database once the
+    snapshot is loaded.
+    """
+
+    def __init__(self, engine: Engine, check_interval: float) -> None:
+        self.engine = engine
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self._snapshot: CatalogSnapshot | None = None
+        # One reload at a time, the counters are kept apart so lookups do not wait on it
+        self._lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+
+    def snapshot(self) -> CatalogSnapshot:
+        """The current snapshot, loaded on first use when it was not warmed"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.refresh()
+        return snapshot
+
+    def refresh(self) -> CatalogSnapshot:
+        with self._lock:
+            with Session(self.engine) as session:
+                snapshot = _build_snapshot(session.exec(select(Product)))
+            self._snapshot = snapshot
+            self.reloads += 1
+        return snapshot
+
+    def read_version(self) -> CatalogVersion:
+        with Session(self.engine) as session:
+            count, row_versions = session.exec(
+                select(func.count(), func.coalesce(func.sum(Product.row_version), 0)).select_from(Product)
+            ).one()
+        return count, int(row_versions or 0)
+
+    def check(self) -> bool:
+        """Reload when the table changed since the snapshot, returns whether it did"""
+        if self._snapshot is not None and self._snapshot.version == self.read_version():
+            return False
+        self.refresh()
+        return True
+
+    async def run(self) -> None:
+        """Check the version until cancelled"""
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                await asyncio.to_thread(self.check)
+            except Exception as e:
+                # Keep serving the snapshot in place
+                logger.error(f"Failed to check the product catalog version: {str(e)}")
+
+    def _count(self, hits: int, misses: int) -> None:
+        with self._counter_lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get(self, product_id: str) -> ProductPublic | None:
+        product = self.snapshot().products.get(product_id)
+        self._count(product is not None, product is None)
+        return product
+
+    def get_many(self, product_ids: Iterable[str]) -> dict[str, ProductPublic]:
+        """The products found among `product_ids`, by id"""
+        product_ids = set(product_ids)
+        products = self.snapshot().products
+        found = {product_id: products[product_id] for product_id in product_ids if product_id in products}
+        self._count(len(found), len(product_ids) - len(found))
+        return found
+
+    def stats(self) -> ProductCatalogStats:
+        snapshot = self._snapshot
+        lookups = self.hits + self.misses
+        return ProductCatalogStats(
+            size=len(snapshot.products) if snapshot else 0,
+            loaded_at=snapshot.loaded_at if snapshot else None,
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / lookups if lookups else None,
+            reloads=self.reloads,
+            check_interval=self.check_interval,
+        )
+
+
+product_catalog = ProductCatalogCache(engine, settings.PRODUCT_CATALOG_CHECK_SECONDS)
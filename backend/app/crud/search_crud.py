@@ -0,0 +1,88 @@
+import re
+from typing import Any
+
+from sqlalchemy import Select, String, bindparam, cast, literal, union_all
+from sqlalchemy.sql import ColumnElement
+from sqlmodel import Session, func, select
+
+from app.models.customer_models import Customer
+from app.models.order_models import Order
+from app.models.product_models import Product
+from app.models.search_models import (
+    SEARCH_CONFIG,
+    SearchResult,
+    constant,
+    customer_document,
+    order_document,
+    product_document,
+)
+
+SEARCH_TYPES = ("customer", "product", "order")
+
+# Matches ranked per type at most. A short prefix can match a large share of
+# a table, ranking is then done over the first matches only, which keeps the
+# cost of a keystroke bounded
+SEARCH_CANDIDATE_LIMIT = 1000
+
+
+def build_prefix_query(q: str) -> str | None:
+    """
+    tsquery text matching documents that hold a word starting with every
+    word of `q`, so that a query typed halfway already finds its results.
+    None when `q` has no word.
+    """
+    words = re.findall(r"\w+", q.lower())
+    return " & ".join(f"{word}:*" for word in words) or None
+
+
+def _search_type(type: str, model: Any, document: ColumnElement[Any], title: Any, subtitle: Any,
+                 query: ColumnElement[Any], limit: int) -> Select[Any]:
+    candidates = (
+        select(cast(model.id, String).label("id"), title.label("title"), subtitle.label("subtitle"),
+               document.label("document"))
+        .where(document.op("@@")(query), model.is_valid == True)
+        .limit(SEARCH_CANDIDATE_LIMIT)
+        .subquery()
+    )
+    rank = func.ts_rank(candidates.c.document, query)
+    # Past four columns select() has no typed overload
+    ranked: list[Any] = [literal(type).label("type"), candidates.c.id, candidates.c.title, candidates.c.subtitle,
+                         rank.label("rank")]
+    statement: Select[Any] = select(*ranked).order_by(rank.desc(), candidates.c.id).limit(limit)
+    return statement
+
+
+def search(*, session: Session, q: str, types: list[str], limit: int) -> list[SearchResult]:
+    """
+    Valid customers, products and orders matching `q`, best ranked first,
+    found through the GIN index on the search document of each type and
+    fetched in a single query.
+    """
+    prefix_query = build_prefix_query(q)
+    if prefix_query is None or not types:
+        return []
+    query = func.to_tsquery(constant(SEARCH_CONFIG), bindparam("q", prefix_query))
+
+    selects = []
+    if "customer" in types:
+        selects.append(_search_type(
+            "customer", Customer, customer_document, Customer.company,
+            func.concat_ws(", ", Customer.full_name, Customer.email, Customer.phone), query, limit,
+        ))
+    if "product" in types:
+        selects.append(_search_type(
+            "product", Product, product_document, Product.id,
+            func.concat_ws(", ", Product.brand, Product.type), query, limit,
+        ))
+    if "order" in types:
+        selects.append(_search_type(
+            "order", Order, order_document, Order.id,
+            func.concat_ws(", ", Order.order_status, Order.notes), query, limit,
+        ))
+
+    results = union_all(*selects).subquery()
+    statement = select(*results.c).order_by(results.c.rank.desc(), results.c.type, results.c.id).limit(limit)
+    return [
+        SearchResult(type=type, id=id, title=title, subtitle=subtitle or None, rank=rank)
+        for type, id, title, subtitle, rank in session.exec(statement)
+    ]
@@ -1,10 +1,22 @@
+import asyncio
+from collections.abc import AsyncIterator
+import logging
+from contextlib import asynccontextmanager, suppress
+
 import sentry_sdk
 from fastapi import FastAPI
 from fastapi.routing import APIRoute
 from starlette.middleware.cors import CORSMiddleware
 from app.api.main import api_router
+from app.api.routes.orders import order_events
 from app.core.config import settings
-from app.utilities.currency_utils import initialize_currency_service
+from app.core.db import engine
+from app.crud.exchange_rate_crud import DatabaseRateStore
+from app.crud.product_crud import product_catalog
+from app.utilities.currency_utils import CURRENCY_API_URL, CurrencyRateRefresher
+
+
+logger = logging.getLogger(__name__)
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
@@ -14,8 +26,34 @@ def custom_generate_unique_id(route: APIRoute) -> str:
 if settings.SENTRY_DSN and settings.ENVIRONMENT != "local":
     sentry_sdk.init(dsn=str(settings.SENTRY_DSN), enable_tracing=True)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Serve with the latest stored rates right away, refresh them in the background
+    rate_refresher = CurrencyRateRefresher(CURRENCY_API_URL, DatabaseRateStore(engine))
+    try:
+        await asyncio.to_thread(rate_refresher.load)
+    except Exception as e:
+        logger.error(f"Failed to load stored currency rates, using the defaults: {str(e)}")
+    # Warm the product catalog, the first product read loads it otherwise
+    try:
+        await asyncio.to_thread(product_catalog.refresh)
+    except Exception as e:
+        logger.error(f"Failed to load the product catalog: {str(e)}")
+    # One LISTEN connection per worker process feeds every order event stream
+    conninfo = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+    tasks = [asyncio.create_task(rate_refresher.run()), asyncio.create_task(order_events.run(conninfo)),
+             asyncio.create_task(product_catalog.run())]
+    yield
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
+    lifespan=lifespan,
     openapi_url=f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
 )
@@ -32,5 +70,3 @@ if settings.all_cors_origins:
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
-# Initialize currency service to fetch latest rates
-initialize_currency_service()
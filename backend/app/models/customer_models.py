@@ -1,12 +1,16 @@
 import uuid
 import json
-from pydantic import EmailStr
-from sqlmodel import Field, Relationship, SQLModel
+from pydantic import EmailStr, field_serializer
+from sqlmodel import Field, Index, Relationship, SQLModel
+from sqlalchemy import Column, Computed, DateTime, Float
 from sqlalchemy.dialects.postgresql import JSON
 from enum import Enum
 from datetime import datetime
 from typing import List
 
+from app.models.sync_models import RowVersionField
+from app.utilities.datetime_utils import format_order_date
+
 # Shared properties
 class CustomerBase(SQLModel):
     company: str = Field(min_length=1, index=True, default=None)
@@ -25,15 +29,53 @@ class CustomerProfile(SQLModel, table=True):
 
 # Database model, database table inferred from class name
 class Customer(CustomerBase, table=True):
+    # Sort key of the customer list, the id breaks ties between companies
+    __table_args__ = (Index("ix_customer_company_id", "company", "id"),)
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
     is_valid: bool | None = Field(
         default=True,
         index=True,
         sa_column_kwargs={"index": True}
     )
+    row_version: int | None = RowVersionField()
     #payment_method: str | None = Field(default=None)
     #preferences: str | None = Field(default=None)
     #orders: list[str]
+    stats: "CustomerStats" = Relationship(
+        back_populates="customer",
+        cascade_delete=True,
+        sa_relationship_kwargs={"lazy": "selectin", "uselist": False},
+    )
+
+# Order totals of a customer over its valid orders, maintained on every order write
+class CustomerStatsBase(SQLModel):
+    order_count: int = Field(default=0)
+    lifetime_revenue: float = Field(default=0)
+    first_order_date: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))  # type: ignore[call-overload]
+    last_order_date: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))  # type: ignore[call-overload]
+
+class CustomerStats(CustomerStatsBase, table=True):
+    __tablename__ = "customer_stats"
+    # Sort keys of the customer list, the customer id breaks ties
+    __table_args__ = (
+        Index("ix_customer_stats_order_count", "order_count", "customer_id"),
+        Index("ix_customer_stats_lifetime_revenue", "lifetime_revenue", "customer_id"),
+        Index("ix_customer_stats_average_order_value", "average_order_value", "customer_id"),
+    )
+    customer_id: uuid.UUID = Field(foreign_key="customer.id", primary_key=True, ondelete="CASCADE")
+    average_order_value: float | None = Field(default=None, sa_column=Column(
+        Float,
+        Computed("CASE WHEN order_count > 0 THEN lifetime_revenue / order_count ELSE 0 END", persisted=True),
+    ))
+    customer: Customer = Relationship(back_populates="stats")
+
+class CustomerStatsPublic(CustomerStatsBase):
+    customer_id: uuid.UUID
+    average_order_value: float | None = None
+
+    @field_serializer("first_order_date", "last_order_date", when_used="json")
+    def _serialize_order_dates(self, value: datetime | None) -> str | None:
+        return format_order_date(value)
 
 # Properties to receive on customer update
 class CustomerUpdate(CustomerBase):
@@ -41,13 +83,15 @@ class CustomerUpdate(CustomerBase):
 
 class CustomerPublic(CustomerBase):
     id: uuid.UUID
+    stats: CustomerStatsPublic | None = None
 
 class CustomerCount(SQLModel):
     count: int
 
 class CustomersPublic(SQLModel):
     data: list[CustomerPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
 
 # Properties to receive on customer creation
 class CustomerCreate(CustomerBase):
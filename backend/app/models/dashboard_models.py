@@ -0,0 +1,17 @@
+from sqlmodel import Field, SQLModel
+
+
+# Number of rows per entity, validity and (for orders) status, maintained on
+# every write so the dashboard counts are single row lookups
+class EntityCounter(SQLModel, table=True):
+    __tablename__ = "entity_counters"
+    entity: str = Field(primary_key=True)
+    is_valid: bool = Field(primary_key=True)
+    status: str = Field(default="", primary_key=True)
+    count: int = Field(default=0)
+
+class DashboardSummary(SQLModel):
+    customer_count: int
+    order_count: int
+    product_count: int
+    orders_by_status: dict[str, int]
@@ -0,0 +1,13 @@
+from datetime import datetime
+
+from sqlalchemy import JSON, DateTime
+from sqlmodel import Field, SQLModel
+
+
+# Rates to SGD of one refresh, written once by the worker elected to fetch them
+class ExchangeRateSnapshot(SQLModel, table=True):
+    __tablename__ = "exchange_rate_snapshot"
+    id: int | None = Field(default=None, primary_key=True)
+    fetched_at: datetime = Field(sa_type=DateTime(timezone=True), index=True)  # type: ignore[call-overload]
+    source: str | None = Field(default=None)
+    rates: dict[str, float] = Field(sa_type=JSON)
@@ -1,24 +1,43 @@
 import uuid
+import json
+from typing import Any
 
-from pydantic import EmailStr
-from sqlmodel import Field, Relationship, SQLModel
+from pydantic import EmailStr, field_serializer, field_validator, model_validator
+from sqlalchemy import JSON, DateTime
+from sqlmodel import Field, Index, Relationship, SQLModel
 from enum import Enum
-from datetime import datetime
+from datetime import date, datetime
+
+from app.models.sync_models import RowVersionField
+from app.utilities.datetime_utils import as_utc, format_order_date
 
 class OrderBase(SQLModel):
-    order_items: str | None = Field(max_length=65025, default=None)
     order_quantity: str | None = Field(max_length=65025, default=None)
     customer_id: str | None= Field(min_length=1, index=True)
-    order_date: str | None= Field(min_length=1, default=None)
-    order_update_date: str | None= Field(default=None)
+    order_date: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))  # type: ignore[call-overload]
+    order_update_date: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))  # type: ignore[call-overload]
     order_status: str | None = Field(default=None)
     payment_status: str | None = Field(default=None)
     notes: str | None = Field(default=None)
     total_price: float | None = Field(default=0)
     is_valid: bool | None = Field(default=True)
 
+    # Dates are accepted and emitted as "YYYY-MM-DD HH:MM:SS" in UTC
+    @field_validator("order_date", "order_update_date")
+    @classmethod
+    def _validate_order_dates(cls, value: datetime | None) -> datetime | None:
+        return as_utc(value)
+
+    @field_serializer("order_date", "order_update_date", when_used="json")
+    def _serialize_order_dates(self, value: datetime | None) -> str | None:
+        return format_order_date(value)
+
 # Database model, database table inferred from class name
 class Order(OrderBase, table=True):
+    # Serves the valid-orders date range filters and the (order_date, id) sort
+    __table_args__ = (
+        Index("ix_order_is_valid_order_date", "is_valid", "order_date", "id"),
+    )
     id: str = Field(default=None, primary_key=True)
     customer_id: str | None = Field(
         min_length=1, 
@@ -35,21 +54,134 @@ class Order(OrderBase, table=True):
         index=True,
         sa_column_kwargs={"index": True}
     )
+    # Rates to SGD that total_price was computed with
+    rate_snapshot: dict[str, float] | None = Field(default=None, sa_type=JSON)
+    row_version: int | None = RowVersionField()
+    lines: list["OrderLine"] = Relationship(
+        back_populates="order",
+        cascade_delete=True,
+        sa_relationship_kwargs={"order_by": "OrderLine.line_no", "lazy": "selectin"},
+    )
+
+# One product of an order, with its price as it was at the time of sale
+class OrderLine(SQLModel, table=True):
+    __tablename__ = "order_line"
+    order_id: str = Field(foreign_key="order.id", primary_key=True, ondelete="CASCADE")
+    product_id: str = Field(primary_key=True, index=True)
+    line_no: int = Field(default=0)
+    quantity: float = Field(default=0)
+    unit_price: float | None = Field(default=None)
+    currency: str | None = Field(default=None)
+    order: Order | None = Relationship(back_populates="lines")
+
+def render_order_items(lines: list[OrderLine]) -> str:
+    """Renders order lines in the legacy {"<product id>": <quantity>} JSON shape"""
+    return json.dumps({
+        line.product_id: int(line.quantity) if float(line.quantity).is_integer() else line.quantity
+        for line in lines
+    })
 
 # Properties to receive on order update
 class OrderUpdate(OrderBase):
-    pass
+    order_items: str | None = Field(max_length=65025, default=None)
 
 class OrderPublic(OrderBase):
     id: str = Field(default=None)
+    order_items: str | None = Field(default=None)
+    rate_snapshot: dict[str, float] | None = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _render_order_lines(cls, data: Any) -> Any:
+        if isinstance(data, Order):
+            return {**data.model_dump(), "order_items": render_order_items(data.lines)}
+        return data
 
 class OrdersPublic(SQLModel):
     data: list[OrderPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
+    # Currency of the order totals
+    currency: str = "SGD"
 
 class OrdersCount(SQLModel):
     count: int
 
+# The filters of read_orders, for endpoints that take them in the body
+class OrderFilter(SQLModel):
+    display_invalid: bool = False
+    customer_id: str | None = None
+    order_status: str | None = None
+    product_id: str | None = None
+    start_date: datetime | None = None
+    end_date: datetime | None = None
+
+class InvoiceExportRequest(SQLModel):
+    order_ids: list[str] | None = None
+    filter: OrderFilter | None = None
+    output_currency: str = "SGD"
+
+# Fields that can be changed on many orders at once
+class OrderBulkChanges(SQLModel):
+    order_status: str | None = None
+    payment_status: str | None = None
+    notes: str | None = None
+
+class OrderBulkUpdate(SQLModel):
+    order_ids: list[str] | None = None
+    filter: OrderFilter | None = None
+    changes: OrderBulkChanges
+
+class OrderBulkDelete(SQLModel):
+    order_ids: list[str] | None = None
+    filter: OrderFilter | None = None
+
+class OrderImportError(SQLModel):
+    row: int
+    error: str
+
+class OrderImportResult(SQLModel):
+    imported: int
+    failed: int
+    errors: list[OrderImportError]
+    errors_truncated: bool = False
+
+# Last order number handed out per month, orders are numbered from it
+class OrderIdCounter(SQLModel, table=True):
+    __tablename__ = "order_id_counter"
+    period: int = Field(primary_key=True)  # year * 100 + month
+    last_value: int = Field(default=0)
+
+# Daily per-status totals of valid orders, maintained on every order write
+class OrderDailyRollup(SQLModel, table=True):
+    __tablename__ = "order_daily_rollup"
+    day: date = Field(primary_key=True)
+    order_status: str = Field(primary_key=True)
+    order_count: int = Field(default=0)
+    revenue: float = Field(default=0)
+
+class OrderAnalytics(SQLModel):
+    total_orders: int
+    total_revenue: float
+    average_order_value: float
+    conversion_rate: float
+    orders_by_status: dict[str, int]
+    revenue_by_status: dict[str, float]
+
+# Columnar series, the i-th entry of every list belongs to the same bucket and group
+class OrderTimeseries(SQLModel):
+    bucket: str
+    currency: str
+    start_date: date
+    end_date: date
+    previous_start_date: date | None = None
+    buckets: list[date]
+    groups: list[str | None] | None = None
+    order_count: list[int]
+    revenue: list[float]
+    previous_order_count: list[int] | None = None
+    previous_revenue: list[float] | None = None
+
 # Properties to receive on order creation
 class OrderCreate(OrderBase):
-    pass
\ No newline at end of file
+    order_items: str | None = Field(max_length=65025, default=None)
\ No newline at end of file
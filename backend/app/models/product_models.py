@@ -5,6 +5,8 @@ from sqlmodel import Field, Relationship, SQLModel
 from enum import Enum
 from datetime import datetime
 
+from app.models.sync_models import RowVersionField
+
 # Enum for Product Type
 class ProductType(str, Enum):
     DECORATING_FILM = 'Decorating Film'
@@ -41,6 +43,7 @@ class Product(ProductBase, table=True):
         index=True,
         sa_column_kwargs={"index": True}
     )
+    row_version: int | None = RowVersionField()
 
 # Properties to receive on Product update
 class ProductUpdate(ProductBase):
@@ -51,11 +54,43 @@ class ProductPublic(ProductBase):
 
 class ProductsPublic(SQLModel):
     data: list[ProductPublic]
-    count: int
+    count: int | None
+    next_cursor: str | None = None
 
 class ProductsCount(SQLModel):
     count: int
 
+class TopProduct(SQLModel):
+    product_id: str
+    brand: str | None = None
+    type: str | None = None
+    units_sold: float
+    order_count: int
+
+class TopProducts(SQLModel):
+    data: list[TopProduct]
+
+class FacetCount(SQLModel):
+    value: str | None = None
+    count: int
+
+class ProductFacets(SQLModel):
+    count: int
+    min_unit_price: float | None = None
+    max_unit_price: float | None = None
+    brands: list[FacetCount]
+    types: list[FacetCount]
+    price_currencies: list[FacetCount]
+
+class ProductCatalogStats(SQLModel):
+    size: int
+    loaded_at: datetime | None = None
+    hits: int
+    misses: int
+    hit_ratio: float | None = None
+    reloads: int
+    check_interval: float
+
 # Properties to receive on Product creation
 class ProductCreate(ProductBase):
     id: str = Field(default=None)
\ No newline at end of file
@@ -0,0 +1,70 @@
+from typing import Any
+
+from sqlalchemy import Index, func, literal
+from sqlalchemy.sql import ColumnElement
+from sqlmodel import SQLModel
+
+from app.models.customer_models import Customer
+from app.models.order_models import Order
+from app.models.product_models import Product
+
+
+# The simple configuration lowercases words without stemming, so ids, names,
+# emails and phone numbers are indexed as they are written
+def constant(value: str) -> ColumnElement[str]:
+    # Written inline rather than bound, the planner only uses an expression
+    # index for a query expression that is identical to it
+    return literal(value, literal_execute=True)
+
+
+SEARCH_CONFIG = "simple"
+
+
+def search_document(*weighted_columns: tuple[Any, str]) -> ColumnElement[Any]:
+    """
+    Weighted tsvector over the given (column, weight) pairs, A ranking
+    highest. The GIN indexes below are built on these same expressions.
+    """
+    document: ColumnElement[Any] | None = None
+    for column, weight in weighted_columns:
+        vector = func.setweight(func.to_tsvector(constant(SEARCH_CONFIG), func.coalesce(column, constant(""))),
+                                constant(weight))
+        document = vector if document is None else document.op("||")(vector)
+    assert document is not None, "no column to search"
+    return document
+
+
+customer_document = search_document(
+    (Customer.company, "A"),
+    (Customer.full_name, "B"),
+    # The parser keeps an email address as one word, its parts are added
+    # so that searching for the domain or the local part finds it too
+    (Customer.email, "C"),
+    (func.translate(Customer.email, constant("@."), constant("  ")), "C"),
+    (Customer.phone, "C"),
+)
+product_document = search_document(
+    (Product.id, "A"),
+    (Product.brand, "B"),
+    (Product.type, "C"),
+)
+order_document = search_document(
+    (Order.id, "A"),
+    (Order.notes, "C"),
+)
+
+Index("ix_customer_search", customer_document, postgresql_using="gin")
+Index("ix_product_search", product_document, postgresql_using="gin")
+Index("ix_order_search", order_document, postgresql_using="gin")
+
+
+class SearchResult(SQLModel):
+    type: str
+    id: str
+    title: str | None = None
+    subtitle: str | None = None
+    rank: float
+
+
+class SearchResults(SQLModel):
+    data: list[SearchResult]
@@ -0,0 +1,23 @@
+from typing import Any
+
+from sqlalchemy import BigInteger, text
+from sqlmodel import Field, SQLModel, func
+
+
+# Id of the transaction that last wrote the row. Transaction ids grow
+# monotonically, and every id below the xmin of a snapshot belongs to a
+# finished transaction, which is what makes xmin a safe sync watermark.
+def RowVersionField() -> Any:
+    return Field(
+        default=None,
+        index=True,
+        sa_type=BigInteger,
+        sa_column_kwargs={"server_default": text("txid_current()"), "onupdate": func.txid_current()},
+    )
+
+class SyncChanges(SQLModel):
+    entity: str
+    data: list[dict[str, Any]]
+    next_cursor: str | None = None
+    # Pass as `since` on the next sync, once next_cursor is null
+    watermark: int
@@ -0,0 +1,101 @@
+import time
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.tests.utils.utils import random_lower_string
+
+
+def read_stats(client: TestClient, headers: dict[str, str], customer_id: str) -> Any:
+    r = client.get(f"{settings.API_V1_STR}/customers/{customer_id}/stats", headers=headers)
+    assert r.status_code == 200
+    return r.json()
+
+
+def create_order(client: TestClient, headers: dict[str, str], **order: Any) -> str:
+    r = client.post(f"{settings.API_V1_STR}/orders/", headers=headers, json=order)
+    assert r.status_code == 200
+    return str(r.json()["id"])
+
+
+def test_customer_stats_follow_order_writes(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/customers/",
+        headers=superuser_token_headers,
+        json={"company": "Stats Co"},
+    )
+    customer_id = r.json()["id"]
+    stats = read_stats(client, superuser_token_headers, customer_id)
+    assert stats["order_count"] == 0
+    assert stats["first_order_date"] is None
+
+    first = create_order(client, superuser_token_headers, customer_id=customer_id, total_price=10)
+    last = create_order(client, superuser_token_headers, customer_id=customer_id, total_price=30)
+    stats = read_stats(client, superuser_token_headers, customer_id)
+    assert stats["order_count"] == 2
+    assert stats["lifetime_revenue"] == pytest.approx(40)
+    assert stats["average_order_value"] == pytest.approx(20)
+    assert stats["first_order_date"] <= stats["last_order_date"]
+
+    r = client.put(
+        f"{settings.API_V1_STR}/orders/{first}",
+        headers=superuser_token_headers,
+        json={"customer_id": customer_id, "order_date": "2024-01-05 10:00:00", "total_price": 50},
+    )
+    assert r.status_code == 200
+    stats = read_stats(client, superuser_token_headers, customer_id)
+    assert stats["lifetime_revenue"] == pytest.approx(80)
+    assert stats["first_order_date"] == "2024-01-05 10:00:00"
+
+    # Deleting the latest order moves the last order date back
+    r = client.delete(f"{settings.API_V1_STR}/orders/{last}", headers=superuser_token_headers)
+    assert r.status_code == 200
+    stats = read_stats(client, superuser_token_headers, customer_id)
+    assert stats["order_count"] == 1
+    assert stats["lifetime_revenue"] == pytest.approx(50)
+    assert stats["last_order_date"] == "2024-01-05 10:00:00"
+
+
+def test_read_customer_stats_not_found(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/customers/00000000-0000-0000-0000-000000000000/stats",
+        headers=superuser_token_headers,
+    )
+    assert r.status_code == 404
+
+
+def test_read_customers_sorted_by_revenue(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    company = f"Revenue {random_lower_string()}"
+    # Above the revenue of every customer created by earlier runs
+    base = round(time.time() * 1000)
+    customer_ids = []
+    for revenue in (base + 3, base + 1, base + 2):
+        r = client.post(
+            f"{settings.API_V1_STR}/customers/",
+            headers=superuser_token_headers,
+            json={"company": company},
+        )
+        customer_ids.append(r.json()["id"])
+        create_order(client, superuser_token_headers, customer_id=customer_ids[-1], total_price=revenue)
+
+    seen = []
+    cursor = None
+    for _ in range(3):
+        params: dict[str, Any] = {"sort_by": "lifetime_revenue", "sort_order": "desc", "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get(f"{settings.API_V1_STR}/customers/", headers=superuser_token_headers, params=params)
+        assert r.status_code == 200
+        page = r.json()
+        seen += [customer["id"] for customer in page["data"]]
+        cursor = page["next_cursor"]
+    assert seen == [customer_ids[0], customer_ids[2], customer_ids[1]]
+    assert page["data"][0]["stats"]["lifetime_revenue"] == pytest.approx(base + 1)
@@ -0,0 +1,64 @@
+from typing import Any
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.tests.utils.utils import random_lower_string
+
+
+def read_summary(client: TestClient, headers: dict[str, str]) -> Any:
+    r = client.get(f"{settings.API_V1_STR}/dashboard/summary", headers=headers)
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_dashboard_summary_follows_writes(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    before = read_summary(client, superuser_token_headers)
+
+    r = client.post(
+        f"{settings.API_V1_STR}/customers/",
+        headers=superuser_token_headers,
+        json={"company": "Counter Co"},
+    )
+    customer_id = r.json()["id"]
+    client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": random_lower_string(), "unit_price": 1},
+    )
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={"customer_id": customer_id, "order_status": "Pending"},
+    )
+    order_id = r.json()["id"]
+
+    after = read_summary(client, superuser_token_headers)
+    assert after["customer_count"] == before["customer_count"] + 1
+    assert after["product_count"] == before["product_count"] + 1
+    assert after["order_count"] == before["order_count"] + 1
+    assert (
+        after["orders_by_status"]["Pending"]
+        == before["orders_by_status"].get("Pending", 0) + 1
+    )
+
+    client.put(
+        f"{settings.API_V1_STR}/orders/{order_id}",
+        headers=superuser_token_headers,
+        json={"customer_id": customer_id, "order_status": "Delivered"},
+    )
+    client.delete(f"{settings.API_V1_STR}/customers/{customer_id}", headers=superuser_token_headers)
+
+    final = read_summary(client, superuser_token_headers)
+    assert final["customer_count"] == before["customer_count"]
+    assert final["order_count"] == after["order_count"]
+    assert final["orders_by_status"].get("Pending", 0) == before["orders_by_status"].get("Pending", 0)
+
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/order_count",
+        headers=superuser_token_headers,
+        params={"order_status": "Delivered"},
+    )
+    assert r.json()["count"] == final["orders_by_status"]["Delivered"]
@@ -79,6 +79,27 @@ def test_read_items(
     assert len(content["data"]) >= 2
 
 
+def test_read_items_count_modes(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    create_random_item(db)
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"include_count": False},
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] is None
+
+    response = client.get(
+        f"{settings.API_V1_STR}/items/",
+        headers=superuser_token_headers,
+        params={"approximate_count": True},
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] >= 1
+
+
 def test_update_item(
     client: TestClient, superuser_token_headers: dict[str, str], db: Session
 ) -> None:
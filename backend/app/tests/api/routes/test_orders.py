@@ -0,0 +1,729 @@
+import csv
+import json
+import re
+import time
+import zipfile
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.models.order_models import Order
+from app.tests.utils.utils import random_lower_string
+from app.utilities.invoice_utils import XLSX_MEDIA_TYPE
+
+
+def read_analytics(
+    client: TestClient, headers: dict[str, str], **params: str
+) -> dict[str, Any]:
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/analytics", headers=headers, params=params
+    )
+    assert r.status_code == 200
+    data: dict[str, Any] = r.json()
+    return data
+
+
+def test_order_analytics_follow_order_writes(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    before = read_analytics(client, superuser_token_headers)
+
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={"customer_id": "analytics-customer", "order_status": "Pending", "total_price": 40},
+    )
+    assert r.status_code == 200
+    order_id = r.json()["id"]
+
+    after_create = read_analytics(client, superuser_token_headers)
+    assert after_create["total_orders"] == before["total_orders"] + 1
+    assert after_create["total_revenue"] == pytest.approx(before["total_revenue"] + 40)
+
+    r = client.put(
+        f"{settings.API_V1_STR}/orders/{order_id}",
+        headers=superuser_token_headers,
+        json={"customer_id": "analytics-customer", "order_status": "Delivered", "total_price": 60},
+    )
+    assert r.status_code == 200
+
+    after_update = read_analytics(client, superuser_token_headers)
+    assert after_update["total_orders"] == before["total_orders"] + 1
+    assert after_update["total_revenue"] == pytest.approx(before["total_revenue"] + 60)
+    assert (
+        after_update["orders_by_status"]["Delivered"]
+        == before["orders_by_status"].get("Delivered", 0) + 1
+    )
+
+    r = client.delete(
+        f"{settings.API_V1_STR}/orders/{order_id}", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+
+    after_delete = read_analytics(client, superuser_token_headers)
+    assert after_delete["total_orders"] == before["total_orders"]
+    assert after_delete["total_revenue"] == pytest.approx(before["total_revenue"])
+
+
+def test_order_analytics_date_window(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    content = read_analytics(
+        client,
+        superuser_token_headers,
+        start_date="1990-01-01 00:00:00",
+        end_date="1990-12-31 23:59:59",
+    )
+    assert content["total_orders"] == 0
+    assert content["average_order_value"] == 0
+    assert content["orders_by_status"] == {}
+
+
+def test_order_analytics_invalid_date(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/analytics",
+        headers=superuser_token_headers,
+        params={"start_date": "yesterday"},
+    )
+    assert r.status_code == 422
+
+
+def test_read_orders_cursor_pages(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    for _ in range(3):
+        r = client.post(
+            f"{settings.API_V1_STR}/orders/",
+            headers=superuser_token_headers,
+            json={"customer_id": "cursor-customer", "order_status": "Pending"},
+        )
+        assert r.status_code == 200
+
+    params: dict[str, Any] = {"customer_id": "cursor-customer", "limit": 2}
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/", headers=superuser_token_headers, params=params
+    )
+    assert r.status_code == 200
+    first_page = r.json()
+    assert len(first_page["data"]) == 2
+    assert first_page["next_cursor"]
+
+    params["cursor"] = first_page["next_cursor"]
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/", headers=superuser_token_headers, params=params
+    )
+    assert r.status_code == 200
+    second_page = r.json()
+    assert second_page["count"] == first_page["count"]
+    seen = {order["id"] for order in first_page["data"]}
+    assert all(order["id"] not in seen for order in second_page["data"])
+
+    # Past the end the page is empty but still counted
+    params["skip"] = first_page["count"]
+    del params["cursor"]
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/", headers=superuser_token_headers, params=params
+    )
+    assert r.json()["data"] == []
+    assert r.json()["count"] == first_page["count"]
+
+
+def test_read_orders_cursor_pages_undated_orders(
+    client: TestClient, superuser_token_headers: dict[str, str], db: Session
+) -> None:
+    # Undated orders sort above every date, pages must cross into them
+    customer_id = random_lower_string()
+    dated = [datetime(2023, 1, day, tzinfo=timezone.utc) for day in (1, 2)]
+    orders = [Order(id=random_lower_string(), customer_id=customer_id, order_date=order_date)
+              for order_date in [*dated, None, None, None]]
+    db.add_all(orders)
+    db.commit()
+    expected = [orders[0].id, orders[1].id, *sorted(order.id for order in orders[2:])]
+
+    for sort_order, ids in (("asc", expected), ("desc", expected[::-1])):
+        params: dict[str, Any] = {"customer_id": customer_id, "sort_order": sort_order, "limit": 2}
+        seen = []
+        while True:
+            r = client.get(
+                f"{settings.API_V1_STR}/orders/", headers=superuser_token_headers, params=params
+            )
+            assert r.status_code == 200
+            page = r.json()
+            seen += [order["id"] for order in page["data"]]
+            if not page["next_cursor"]:
+                break
+            params["cursor"] = page["next_cursor"]
+        assert seen == ids
+
+
+def test_read_orders_invalid_cursor(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        params={"cursor": "not-a-cursor"},
+    )
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Invalid cursor"
+
+
+def test_order_dates_keep_string_format(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={"customer_id": "date-customer"},
+    )
+    assert r.status_code == 200
+    order = r.json()
+    assert re.fullmatch(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}", order["order_date"])
+
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        params={"customer_id": "date-customer", "start_date": order["order_date"]},
+    )
+    assert r.status_code == 200
+    assert [o["id"] for o in r.json()["data"]] == [order["id"]]
+
+
+def test_order_items_round_trip_through_order_lines(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    product_id = random_lower_string()
+    r = client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": product_id, "unit_price": 12.5, "price_currency": "SGD"},
+    )
+    assert r.status_code == 200
+
+    # Lines of unknown products could never be priced nor invoiced
+    unknown_items = json.dumps({product_id: 3, "unknown-product": 1.5})
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={"customer_id": "lines-customer", "order_items": unknown_items},
+    )
+    assert r.status_code == 400
+    assert r.json()["detail"] == "Product unknown-product not found"
+
+    order_items = {product_id: 3}
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={"customer_id": "lines-customer", "order_items": json.dumps(order_items)},
+    )
+    assert r.status_code == 200
+    order = r.json()
+    assert json.loads(order["order_items"]) == order_items
+
+    r = client.put(
+        f"{settings.API_V1_STR}/orders/{order['id']}",
+        headers=superuser_token_headers,
+        json={"customer_id": "lines-customer", "order_items": unknown_items},
+    )
+    assert r.status_code == 400
+
+    r = client.put(
+        f"{settings.API_V1_STR}/orders/{order['id']}",
+        headers=superuser_token_headers,
+        json={"customer_id": "lines-customer", "order_items": json.dumps({product_id: 1})},
+    )
+    assert r.status_code == 200
+
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/{order['id']}", headers=superuser_token_headers
+    )
+    assert r.status_code == 200
+    assert json.loads(r.json()["order_items"]) == {product_id: 1}
+
+
+def test_create_order_invalid_order_items(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={"customer_id": "lines-customer", "order_items": "[1, 2]"},
+    )
+    assert r.status_code == 400
+
+
+def test_get_order_invoice(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/customers/",
+        headers=superuser_token_headers,
+        json={"company": "Invoice Co", "phone": "+65 1234 5678"},
+    )
+    assert r.status_code == 200
+    customer_id = r.json()["id"]
+    product_id = random_lower_string()
+    client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": product_id, "unit_price": 10, "price_currency": "SGD"},
+    )
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={"customer_id": customer_id, "order_items": json.dumps({product_id: 2})},
+    )
+    order_id = r.json()["id"]
+
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/get-order-invoice/{order_id}",
+        headers=superuser_token_headers,
+    )
+    assert r.status_code == 200
+    assert r.headers["content-type"] == XLSX_MEDIA_TYPE
+    sheet = load_workbook(BytesIO(r.content))["Invoice"]
+    assert sheet["G3"].value == order_id
+    assert sheet["C15"].value == product_id
+    assert sheet["G15"].value == 20
+
+    # Repeat downloads revalidate against the ETag
+    etag = r.headers["etag"]
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/get-order-invoice/{order_id}",
+        headers={**superuser_token_headers, "If-None-Match": etag},
+    )
+    assert r.status_code == 304
+
+    # Updating the order invalidates the cached invoice
+    client.put(
+        f"{settings.API_V1_STR}/orders/{order_id}",
+        headers=superuser_token_headers,
+        json={"customer_id": customer_id, "order_items": json.dumps({product_id: 3})},
+    )
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/get-order-invoice/{order_id}",
+        headers={**superuser_token_headers, "If-None-Match": etag},
+    )
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    sheet = load_workbook(BytesIO(r.content))["Invoice"]
+    assert sheet["G15"].value == 30
+
+    # So does updating the customer printed on it
+    etag = r.headers["etag"]
+    r = client.put(
+        f"{settings.API_V1_STR}/customers/{customer_id}",
+        headers=superuser_token_headers,
+        json={"company": "Invoice Co", "phone": "+65 8765 4321"},
+    )
+    assert r.status_code == 200
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/get-order-invoice/{order_id}",
+        headers={**superuser_token_headers, "If-None-Match": etag},
+    )
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+
+
+def test_export_order_invoices(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/customers/",
+        headers=superuser_token_headers,
+        json={"company": "Export Co", "phone": "+65 8765 4321"},
+    )
+    customer_id = r.json()["id"]
+    product_id = random_lower_string()
+    client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": product_id, "unit_price": 5, "price_currency": "SGD"},
+    )
+    order_ids = []
+    for quantity in (1, 3):
+        r = client.post(
+            f"{settings.API_V1_STR}/orders/",
+            headers=superuser_token_headers,
+            json={"customer_id": customer_id, "order_items": json.dumps({product_id: quantity})},
+        )
+        order_ids.append(r.json()["id"])
+
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/invoices/export",
+        headers=superuser_token_headers,
+        json={"order_ids": order_ids},
+    )
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/zip"
+    assert r.headers["x-invoice-count"] == "2"
+    archive = zipfile.ZipFile(BytesIO(r.content))
+    invoices = {}
+    for name in archive.namelist():
+        if name.endswith(".xlsx"):
+            sheet = load_workbook(BytesIO(archive.read(name)))["Invoice"]
+            invoices[sheet["G3"].value] = sheet["G15"].value
+    assert invoices == {order_ids[0]: 5, order_ids[1]: 15}
+    summary = json.loads(archive.read("export_summary.json"))
+    assert summary["rendered"] == 2
+    assert summary["failed"] == []
+
+
+def test_export_order_invoices_not_found(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/invoices/export",
+        headers=superuser_token_headers,
+        json={"order_ids": ["does-not-exist"]},
+    )
+    assert r.status_code == 404
+
+
+def test_import_orders(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/customers/",
+        headers=superuser_token_headers,
+        json={"company": "Import Co"},
+    )
+    customer_id = r.json()["id"]
+    product_id = random_lower_string()
+    client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": product_id, "unit_price": 4, "price_currency": "SGD"},
+    )
+    items = json.dumps({product_id: 2}).replace('"', '""')
+    csv = "\n".join([
+        "customer_id,order_date,order_status,total_price,order_items",
+        f'{customer_id},2024-03-05 10:00:00,Delivered,99,"{items}"',
+        f"{customer_id},2024-03-06 11:00:00,Pending,,",
+        f"{customer_id},not a date,Pending,1,",
+        ",2024-03-06 11:00:00,Pending,1,",
+        f'{customer_id},2024-03-06 11:00:00,Pending,1,"{{""missing-product"": 1}}"',
+        "00000000-0000-0000-0000-000000000000,2024-03-06 11:00:00,Pending,1,",
+    ])
+
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/import",
+        headers=superuser_token_headers,
+        files={"file": ("orders.csv", csv.encode(), "text/csv")},
+    )
+    assert r.status_code == 200
+    result = r.json()
+    assert result["imported"] == 2
+    assert result["failed"] == 4
+    assert result["errors"] == [
+        {"row": 4, "error": "order_date is not a valid date"},
+        {"row": 5, "error": "customer_id is required"},
+        {"row": 6, "error": "Product missing-product not found"},
+        {"row": 7, "error": "Customer not found"},
+    ]
+
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        params={"customer_id": customer_id, "sort_order": "asc"},
+    )
+    orders = r.json()["data"]
+    assert [order["order_date"] for order in orders] == ["2024-03-05 10:00:00", "2024-03-06 11:00:00"]
+    assert all(order["id"].startswith("2024030") for order in orders)
+    assert json.loads(orders[0]["order_items"]) == {product_id: 2}
+    # Totals of orders with items are computed, the others keep the file's
+    assert orders[0]["total_price"] == 8
+    assert orders[0]["rate_snapshot"]["SGD"] == 1
+    assert orders[1]["total_price"] == 0
+
+
+def test_import_orders_invalid_file(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/import",
+        headers=superuser_token_headers,
+        files={"file": ("orders.xlsx", b"not a workbook", "application/octet-stream")},
+    )
+    assert r.status_code == 400
+
+
+@pytest.mark.parametrize("export_format", ["csv", "ndjson", "xlsx"])
+def test_export_orders(
+    client: TestClient, superuser_token_headers: dict[str, str], export_format: str
+) -> None:
+    customer_id = f"export-{random_lower_string()}"
+    product_id = random_lower_string()
+    client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": product_id, "unit_price": 4, "price_currency": "SGD"},
+    )
+    created = []
+    for status in ("Pending", "Delivered"):
+        r = client.post(
+            f"{settings.API_V1_STR}/orders/",
+            headers=superuser_token_headers,
+            json={"customer_id": customer_id, "order_status": status,
+                  "order_items": json.dumps({product_id: 2})},
+        )
+        created.append(r.json()["id"])
+
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/export",
+        headers=superuser_token_headers,
+        params={"format": export_format, "customer_id": customer_id, "sort_order": "asc"},
+    )
+    assert r.status_code == 200
+    assert "attachment" in r.headers["content-disposition"]
+
+    if export_format == "csv":
+        rows: list[dict[str, Any]] = list(csv.DictReader(r.text.splitlines()))
+    elif export_format == "ndjson":
+        rows = [json.loads(line) for line in r.text.splitlines()]
+    else:
+        sheet = load_workbook(BytesIO(r.content), read_only=True)["Orders"]
+        header, *values = sheet.iter_rows(values_only=True)
+        rows = [dict(zip(header, row, strict=True)) for row in values]
+    assert [row["id"] for row in rows] == created
+    assert [row["order_status"] for row in rows] == ["Pending", "Delivered"]
+    assert re.fullmatch(r"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}", rows[0]["order_date"])
+    assert json.loads(rows[0]["order_items"]) == {product_id: 2}
+    # Nested values are written as JSON in the spreadsheet formats
+    rate_snapshot = rows[0]["rate_snapshot"]
+    rates = rate_snapshot if export_format == "ndjson" else json.loads(rate_snapshot)
+    assert rates["SGD"] == 1
+
+
+def test_bulk_update_and_delete_orders(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    customer_id = f"bulk-{random_lower_string()}"
+    order_ids = []
+    for _ in range(3):
+        r = client.post(
+            f"{settings.API_V1_STR}/orders/",
+            headers=superuser_token_headers,
+            json={"customer_id": customer_id, "order_status": "Pending", "total_price": 10},
+        )
+        order_ids.append(r.json()["id"])
+    before = read_analytics(client, superuser_token_headers)
+
+    r = client.patch(
+        f"{settings.API_V1_STR}/orders/bulk",
+        headers=superuser_token_headers,
+        json={"order_ids": order_ids[:2], "changes": {"order_status": "Shipped"}},
+    )
+    assert r.status_code == 200
+    assert r.json()["count"] == 2
+    assert {order["id"] for order in r.json()["data"]} == set(order_ids[:2])
+    assert all(order["order_status"] == "Shipped" for order in r.json()["data"])
+
+    after = read_analytics(client, superuser_token_headers)
+    assert after["orders_by_status"]["Shipped"] == before["orders_by_status"].get("Shipped", 0) + 2
+    assert after["orders_by_status"]["Pending"] == before["orders_by_status"]["Pending"] - 2
+
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/bulk-delete",
+        headers=superuser_token_headers,
+        json={"filter": {"customer_id": customer_id}},
+    )
+    assert r.status_code == 200
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        params={"customer_id": customer_id},
+    )
+    assert r.json()["count"] == 0
+    final = read_analytics(client, superuser_token_headers)
+    assert final["total_orders"] == before["total_orders"] - 3
+    assert final["total_revenue"] == pytest.approx(before["total_revenue"] - 30)
+
+
+def test_bulk_update_orders_requires_selection(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    r = client.patch(
+        f"{settings.API_V1_STR}/orders/bulk",
+        headers=superuser_token_headers,
+        json={"changes": {"order_status": "Shipped"}},
+    )
+    assert r.status_code == 400
+
+
+def test_order_total_computed_from_lines(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    sgd_product, usd_product = random_lower_string(), random_lower_string()
+    for product_id, price, currency in ((sgd_product, 10, "SGD"), (usd_product, 2, "USD")):
+        client.post(
+            f"{settings.API_V1_STR}/products/",
+            headers=superuser_token_headers,
+            json={"id": product_id, "unit_price": price, "price_currency": currency},
+        )
+
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={
+            "customer_id": "total-customer",
+            "order_items": json.dumps({sgd_product: 2, usd_product: 3}),
+            "total_price": 1,
+        },
+    )
+    assert r.status_code == 200
+    order = r.json()
+    usd_rate = order["rate_snapshot"]["USD"]
+    assert order["rate_snapshot"]["SGD"] == 1
+    assert order["total_price"] == pytest.approx(round(20 + 6 * usd_rate, 2))
+
+    # A total sent with unchanged items is ignored, changed items recompute it
+    r = client.put(
+        f"{settings.API_V1_STR}/orders/{order['id']}",
+        headers=superuser_token_headers,
+        json={"customer_id": "total-customer", "total_price": 1},
+    )
+    assert r.json()["total_price"] == order["total_price"]
+    r = client.put(
+        f"{settings.API_V1_STR}/orders/{order['id']}",
+        headers=superuser_token_headers,
+        json={"customer_id": "total-customer", "order_items": json.dumps({sgd_product: 1})},
+    )
+    assert r.json()["total_price"] == 10
+
+
+def test_order_timeseries(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    customer_id = f"timeseries-{random_lower_string()}"
+    for order_date, total_price in (("2023-02-10 08:00:00", 30), ("2023-02-20 08:00:00", 20),
+                                    ("2023-01-10 08:00:00", 15)):
+        r = client.post(
+            f"{settings.API_V1_STR}/orders/",
+            headers=superuser_token_headers,
+            json={"customer_id": customer_id, "total_price": total_price},
+        )
+        client.put(
+            f"{settings.API_V1_STR}/orders/{r.json()['id']}",
+            headers=superuser_token_headers,
+            json={"customer_id": customer_id, "order_date": order_date},
+        )
+
+    params: dict[str, Any] = {"start_date": "2023-02-01 00:00:00", "end_date": "2023-02-28 00:00:00",
+                              "group_by": "customer", "compare_previous": True}
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/timeseries",
+        headers=superuser_token_headers,
+        params={**params, "bucket": "month"},
+    )
+    assert r.status_code == 200
+    series = r.json()
+    assert series["previous_start_date"] == "2023-01-04"
+    i = series["groups"].index(customer_id)
+    assert series["buckets"][i] == "2023-02-01"
+    assert series["order_count"][i] == 2
+    assert series["revenue"][i] == 50
+    assert series["previous_order_count"][i] == 1
+    assert series["previous_revenue"][i] == 15
+
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/timeseries",
+        headers=superuser_token_headers,
+        params={**params, "bucket": "week", "output_currency": "USD"},
+    )
+    series = r.json()
+    points = [(bucket, count) for bucket, group, count in
+              zip(series["buckets"], series["groups"], series["order_count"], strict=True) if group == customer_id]
+    assert points == [("2023-02-06", 1), ("2023-02-20", 1)]
+    assert series["currency"] == "USD"
+
+
+def test_top_products_and_product_filter(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    top_product, other_product = random_lower_string(), random_lower_string()
+    for product_id in (top_product, other_product):
+        client.post(
+            f"{settings.API_V1_STR}/products/",
+            headers=superuser_token_headers,
+            json={"id": product_id, "unit_price": 1, "price_currency": "SGD"},
+        )
+    # Order dates are whole seconds, leave out the orders of earlier tests
+    time.sleep(1)
+    start_date = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    order_ids = []
+    for items in ({top_product: 3, other_product: 1}, {top_product: 2}):
+        r = client.post(
+            f"{settings.API_V1_STR}/orders/",
+            headers=superuser_token_headers,
+            json={"customer_id": "top-customer", "order_items": json.dumps(items)},
+        )
+        order_ids.append(r.json()["id"])
+
+    r = client.get(
+        f"{settings.API_V1_STR}/products/top",
+        headers=superuser_token_headers,
+        params={"start_date": start_date},
+    )
+    assert r.status_code == 200
+    top = r.json()["data"]
+    assert [product["product_id"] for product in top] == [top_product, other_product]
+    assert top[0]["units_sold"] == 5
+    assert top[0]["order_count"] == 2
+
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        params={"product_id": other_product},
+    )
+    assert r.json()["count"] == 1
+    assert [order["id"] for order in r.json()["data"]] == order_ids[:1]
+
+
+def test_list_output_currency(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    customer_id = f"currency-{random_lower_string()}"
+    client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={"customer_id": customer_id, "total_price": 135},
+    )
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        params={"customer_id": customer_id, "output_currency": "usd"},
+    )
+    assert r.status_code == 200
+    usd_rate = r.json()["data"][0]["total_price"] / 135
+    assert r.json()["currency"] == "USD"
+
+    product_id = random_lower_string()
+    client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": product_id, "unit_price": 10, "price_currency": "SGD"},
+    )
+    r = client.get(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        params={"output_currency": "USD", "limit": 10000},
+    )
+    product = next(product for product in r.json()["data"] if product["id"] == product_id)
+    assert product["price_currency"] == "USD"
+    assert product["unit_price"] == pytest.approx(round(10 * usd_rate, 2), abs=0.01)
+
+    r = client.get(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        params={"output_currency": "XYZ"},
+    )
+    assert r.status_code == 400
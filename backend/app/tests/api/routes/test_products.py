@@ -0,0 +1,102 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.tests.utils.utils import random_lower_string
+
+
+def test_product_reads_follow_writes(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    brand = random_lower_string()
+    product_ids = sorted(random_lower_string() for _ in range(3))
+    for product_id in product_ids:
+        r = client.post(
+            f"{settings.API_V1_STR}/products/",
+            headers=superuser_token_headers,
+            json={"id": product_id, "brand": brand, "unit_price": 5},
+        )
+        assert r.status_code == 200
+
+    r = client.put(
+        f"{settings.API_V1_STR}/products/{product_ids[0]}",
+        headers=superuser_token_headers,
+        json={"unit_price": 7},
+    )
+    assert r.status_code == 200
+    r = client.get(f"{settings.API_V1_STR}/products/{product_ids[0]}", headers=superuser_token_headers)
+    assert r.json()["unit_price"] == 7
+
+    client.delete(f"{settings.API_V1_STR}/products/{product_ids[1]}", headers=superuser_token_headers)
+    r = client.get(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        params={"brand": brand, "limit": 1},
+    )
+    assert r.json()["count"] == 2
+    assert [product["id"] for product in r.json()["data"]] == [product_ids[0]]
+    r = client.get(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        params={"brand": brand, "limit": 1, "cursor": r.json()["next_cursor"]},
+    )
+    assert [product["id"] for product in r.json()["data"]] == [product_ids[2]]
+
+    # Empty filters are no filters
+    r = client.get(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        params={"brand": "", "type": ""},
+    )
+    assert r.json()["count"] >= 2
+
+    r = client.post(
+        f"{settings.API_V1_STR}/products/batch-by-names",
+        headers=superuser_token_headers,
+        json=[product_ids[2], random_lower_string(), product_ids[0]],
+    )
+    assert [product["id"] for product in r.json()["data"]] == [product_ids[2], product_ids[0]]
+
+    r = client.get(f"{settings.API_V1_STR}/products/catalog-stats", headers=superuser_token_headers)
+    assert r.status_code == 200
+    assert r.json()["misses"] >= 1
+    assert r.json()["size"] >= 3
+
+
+def test_product_facets_follow_writes(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    brand = random_lower_string()
+    for product in [
+        {"unit_price": 5, "type": "Vinyl Wrap"},
+        {"unit_price": 8, "type": "Vinyl Wrap", "price_currency": "USD"},
+        {"unit_price": 2, "type": "Wall Decals"},
+    ]:
+        client.post(
+            f"{settings.API_V1_STR}/products/",
+            headers=superuser_token_headers,
+            json={"id": random_lower_string(), "brand": brand, **product},
+        )
+
+    r = client.get(f"{settings.API_V1_STR}/products/facets", headers=superuser_token_headers,
+                   params={"brand": brand})
+    assert r.status_code == 200
+    facets = r.json()
+    assert (facets["count"], facets["min_unit_price"], facets["max_unit_price"]) == (3, 2, 8)
+    assert facets["brands"] == [{"value": brand, "count": 3}]
+    assert facets["types"] == [{"value": "Vinyl Wrap", "count": 2}, {"value": "Wall Decals", "count": 1}]
+    assert facets["price_currencies"] == [{"value": "SGD", "count": 2}, {"value": "USD", "count": 1}]
+
+    etag = r.headers["ETag"]
+    r = client.get(f"{settings.API_V1_STR}/products/facets", headers={**superuser_token_headers, "If-None-Match": etag},
+                   params={"brand": brand})
+    assert r.status_code == 304
+
+    client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": random_lower_string(), "brand": brand, "unit_price": 20, "type": "Wall Decals"},
+    )
+    r = client.get(f"{settings.API_V1_STR}/products/facets", headers={**superuser_token_headers, "If-None-Match": etag},
+                   params={"brand": brand, "type": "Wall Decals"})
+    assert r.status_code == 200
+    assert (r.json()["count"], r.json()["max_unit_price"]) == (2, 20)
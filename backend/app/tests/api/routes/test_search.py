@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.tests.utils.utils import random_lower_string
+
+
+def test_search_by_prefix(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    word = random_lower_string()
+    r = client.post(
+        f"{settings.API_V1_STR}/customers/",
+        headers=superuser_token_headers,
+        json={"company": f"{word} Trading", "email": f"sales@{word}.example.com"},
+    )
+    customer_id = r.json()["id"]
+    product_id = random_lower_string()
+    client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": product_id, "brand": word},
+    )
+
+    # Half a word is enough, the company match ranks above the brand
+    r = client.get(f"{settings.API_V1_STR}/search", headers=superuser_token_headers,
+                   params={"q": word[:12]})
+    assert r.status_code == 200
+    results = [(result["type"], result["id"]) for result in r.json()["data"]]
+    assert results[:2] == [("customer", customer_id), ("product", product_id)]
+
+    r = client.get(f"{settings.API_V1_STR}/search", headers=superuser_token_headers,
+                   params={"q": f"{word} trad", "types": "product,order"})
+    assert r.json()["data"] == []
+
+    r = client.get(f"{settings.API_V1_STR}/search", headers=superuser_token_headers,
+                   params={"q": word, "types": "invoice"})
+    assert r.status_code == 400
@@ -0,0 +1,81 @@
+from typing import Any
+
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.tests.utils.utils import random_lower_string
+
+
+def read_changes(client: TestClient, headers: dict[str, str], entity: str, **params: Any) -> Any:
+    r = client.get(f"{settings.API_V1_STR}/sync/{entity}", headers=headers, params=params)
+    assert r.status_code == 200
+    return r.json()
+
+
+def test_sync_products_since_watermark(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    deleted_product, new_product = random_lower_string(), random_lower_string()
+    client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": deleted_product, "unit_price": 1},
+    )
+    watermark = read_changes(client, superuser_token_headers, "products", limit=1)["watermark"]
+
+    client.post(
+        f"{settings.API_V1_STR}/products/",
+        headers=superuser_token_headers,
+        json={"id": new_product, "unit_price": 2},
+    )
+    client.delete(f"{settings.API_V1_STR}/products/{deleted_product}", headers=superuser_token_headers)
+
+    first = read_changes(client, superuser_token_headers, "products", since=watermark, limit=1)
+    assert first["next_cursor"]
+    second = read_changes(client, superuser_token_headers, "products", since=watermark, limit=1,
+                          cursor=first["next_cursor"])
+    assert second["watermark"] == first["watermark"]
+    changes = {product["id"]: product for product in first["data"] + second["data"]}
+    assert set(changes) == {new_product, deleted_product}
+    assert changes[deleted_product]["is_valid"] is False
+
+    # Nothing changed since the new watermark
+    last = read_changes(client, superuser_token_headers, "products", since=second["watermark"], limit=1)
+    assert last["data"] == []
+
+
+def test_sync_orders_and_customers(
+    client: TestClient, superuser_token_headers: dict[str, str]
+) -> None:
+    orders = read_changes(client, superuser_token_headers, "orders", limit=1)
+    r = client.post(
+        f"{settings.API_V1_STR}/customers/",
+        headers=superuser_token_headers,
+        json={"company": "Sync Co"},
+    )
+    customer_id = r.json()["id"]
+    r = client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={"customer_id": customer_id},
+    )
+    order_id = r.json()["id"]
+
+    changes = read_changes(client, superuser_token_headers, "orders", since=orders["watermark"])
+    assert [order["id"] for order in changes["data"]] == [order_id]
+    changes = read_changes(client, superuser_token_headers, "customers", since=orders["watermark"])
+    assert [customer["id"] for customer in changes["data"]] == [customer_id]
+
+    # A later order changes the stats of the customer, which is synced again
+    client.post(
+        f"{settings.API_V1_STR}/orders/",
+        headers=superuser_token_headers,
+        json={"customer_id": customer_id, "total_price": 5},
+    )
+    changes = read_changes(client, superuser_token_headers, "customers", since=changes["watermark"])
+    assert [customer["id"] for customer in changes["data"]] == [customer_id]
+    assert changes["data"][0]["stats"]["order_count"] == 2
+    assert changes["data"][0]["stats"]["lifetime_revenue"] == 5
+
+    r = client.get(f"{settings.API_V1_STR}/sync/users", headers=superuser_token_headers)
+    assert r.status_code == 422
@@ -0,0 +1,48 @@
+from collections.abc import Generator
+from datetime import timedelta
+
+import pytest
+from sqlmodel import Session, delete
+
+from app.core.db import engine
+from app.crud.exchange_rate_crud import DatabaseRateStore
+from app.models.exchange_rate_models import ExchangeRateSnapshot
+from app.utilities.datetime_utils import utc_now
+
+
+@pytest.fixture
+def empty_snapshots(db: Session) -> Generator[None, None, None]:
+    db.exec(delete(ExchangeRateSnapshot))  # type: ignore
+    db.commit()
+    yield
+    db.exec(delete(ExchangeRateSnapshot))  # type: ignore
+    db.commit()
+
+
+def test_one_worker_leads_a_refresh(empty_snapshots: None) -> None:
+    store, other_store = DatabaseRateStore(engine), DatabaseRateStore(engine)
+    now = utc_now()
+
+    lease = store.try_lead(stale_before=now)
+    assert lease is not None
+    # The lock is held until the snapshot is written
+    assert other_store.try_lead(stale_before=now) is None
+    store.save(lease, {"SGD": 1.0, "USD": 1.3}, now, "test")
+    store.release(lease)
+
+    # The new snapshot is fresh, nobody needs to lead
+    assert other_store.try_lead(stale_before=now - timedelta(hours=1)) is None
+    [(fetched_at, rates)] = other_store.load_snapshots(after=None)
+    assert fetched_at == now
+    assert rates == {"SGD": 1.0, "USD": 1.3}
+    assert other_store.load_snapshots(after=fetched_at) == []
+
+
+def test_failed_leader_releases_lock(empty_snapshots: None) -> None:
+    store = DatabaseRateStore(engine)
+    lease = store.try_lead(stale_before=utc_now())
+    assert lease is not None
+    store.release(lease)
+    lease = store.try_lead(stale_before=utc_now())
+    assert lease is not None
+    store.release(lease)
@@ -0,0 +1,52 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.crud import order_crud
+from app.models.order_models import OrderIdCounter
+
+
+def test_allocate_order_ids_in_blocks(db: Session) -> None:
+    counter = db.get(OrderIdCounter, 200102)
+    if counter:
+        db.delete(counter)
+        db.commit()
+    when = datetime(2001, 2, 15)
+
+    assert order_crud.allocate_order_ids(session=db, when=when) == ["2001020001"]
+    assert order_crud.allocate_order_ids(session=db, when=when, count=3) == [
+        "2001020002",
+        "2001020003",
+        "2001020004",
+    ]
+    db.commit()
+
+
+def test_allocate_order_ids_concurrently() -> None:
+    when = datetime(2001, 4, 1)
+
+    def allocate(_: int) -> list[str]:
+        with Session(engine) as session:
+            ids = order_crud.allocate_order_ids(session=session, when=when, count=5)
+            session.commit()
+            return ids
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        blocks = list(executor.map(allocate, range(40)))
+
+    ids = [order_id for block in blocks for order_id in block]
+    assert len(set(ids)) == len(ids) == 200
+
+
+def test_allocate_order_ids_past_ten_thousand(db: Session) -> None:
+    counter = db.get(OrderIdCounter, 200105) or OrderIdCounter(period=200105)
+    counter.last_value = 9998
+    db.add(counter)
+    db.commit()
+
+    ids = order_crud.allocate_order_ids(session=db, when=datetime(2001, 5, 1), count=2)
+    db.commit()
+    # The month's numbering widens instead of running into June's ids
+    assert ids == ["2001059999", "20010510000"]
@@ -0,0 +1,53 @@
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.crud.product_crud import ProductCatalogCache
+from app.models.product_models import Product
+from app.tests.utils.utils import random_lower_string
+
+
+def test_catalog_picks_up_writes_of_other_workers(db: Session) -> None:
+    catalog = ProductCatalogCache(engine, check_interval=60)
+    catalog.refresh()
+    assert not catalog.check()
+
+    brand = random_lower_string()
+    product = Product(id=random_lower_string(), brand=brand, type="Vinyl Wrap", unit_price=3)
+    db.add(product)
+    db.commit()
+    # Another worker's write is only seen once the version is checked
+    assert catalog.get(product.id) is None
+    assert catalog.check()
+    cached = catalog.get(product.id)
+    assert cached is not None and cached.unit_price == 3
+    assert catalog.snapshot().find_ids(brand=brand, type="Vinyl Wrap") == [product.id]
+
+    product.unit_price = 4
+    db.add(product)
+    db.commit()
+    assert catalog.check()
+    cached = catalog.get(product.id)
+    assert cached is not None and cached.unit_price == 4
+
+    stats = catalog.stats()
+    assert (stats.hits, stats.misses, stats.reloads) == (2, 1, 3)
+
+
+def test_catalog_facets_come_from_the_snapshot(db: Session) -> None:
+    brand = random_lower_string()
+    db.add(Product(id=random_lower_string(), brand=brand, type="Vinyl Wrap", unit_price=3))
+    db.commit()
+    catalog = ProductCatalogCache(engine, check_interval=60)
+    snapshot = catalog.refresh()
+
+    # A write the snapshot has not seen does not change its facets
+    db.add(Product(id=random_lower_string(), brand=brand, type="Wall Decals", unit_price=7))
+    db.commit()
+    facets = snapshot.get_facets(brand=brand)
+    assert (facets.count, facets.min_unit_price, facets.max_unit_price) == (1, 3, 3)
+    assert snapshot.get_facets(brand=brand) is facets
+
+    # Filters on values missing from the catalog are answered without being cached
+    assert snapshot.get_facets(brand=random_lower_string()).count == 0
+    assert snapshot.get_facets(type=random_lower_string()).count == 0
+    assert list(snapshot.facets) == [(False, brand, None)]
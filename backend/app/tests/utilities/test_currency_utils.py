@@ -0,0 +1,204 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Generator
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import aiohttp
+import numpy as np
+import pytest
+from aiohttp import web
+
+from app.utilities import currency_utils
+from app.utilities.currency_utils import (
+    DEFAULT_CONVERSION_RATES,
+    CurrencyRateRefresher,
+    CurrencyRates,
+    RateHistory,
+    UnknownCurrencyError,
+    convert_to_sgd,
+    convert_to_target_currency,
+    get_conversion_rate,
+    rate_at,
+)
+from app.utilities.datetime_utils import utc_now
+
+RATES = {"SGD": 1.0, "USD": 1.35, "EUR": 1.45}
+
+
+def test_cross_rate_matrix_converts_arrays() -> None:
+    rates = CurrencyRates(RATES)
+    amounts = rates.convert([10, 20, 30], ["usd", "SGD", "EUR"], ["EUR", "USD", "EUR"])
+    np.testing.assert_allclose(amounts, [10 * 1.35 / 1.45, 20 / 1.35, 30])
+    np.testing.assert_allclose(rates.convert([1, 2], "USD", "SGD"), [1.35, 2.7])
+    assert rates.rate("eur") == 1.45
+    assert "usd" in rates and "XYZ" not in rates and None not in rates
+
+
+def test_cross_rate_matrix_is_immutable() -> None:
+    rates = CurrencyRates(RATES)
+    with pytest.raises(ValueError):
+        rates.matrix[0, 0] = 2
+
+
+def test_unknown_currency_raises() -> None:
+    rates = CurrencyRates(RATES)
+    with pytest.raises(UnknownCurrencyError):
+        rates.convert([1, 2], ["USD", "XYZ"], "SGD")
+    with pytest.raises(UnknownCurrencyError):
+        get_conversion_rate("XYZ")
+
+
+def test_scalar_wrappers() -> None:
+    assert convert_to_sgd(10, "SGD") == 10
+    assert convert_to_target_currency(10, "usd", "USD") == pytest.approx(10)
+    assert convert_to_target_currency(convert_to_sgd(10, "EUR"), "SGD", "EUR") == pytest.approx(10)
+
+
+def test_rate_history_point_in_time() -> None:
+    january, march = datetime(2025, 1, 1, tzinfo=timezone.utc), datetime(2025, 3, 1, tzinfo=timezone.utc)
+    history = RateHistory([(january, CurrencyRates({"SGD": 1, "USD": 1.3}))])
+    history = history.extend([(march, CurrencyRates({"SGD": 1, "USD": 1.4}))])
+    assert history.last_fetched_at == march
+    # Before the first snapshot the closest one is used
+    for when, rate in ((datetime(2025, 2, 1, tzinfo=timezone.utc), 1.3), (march, 1.4),
+                       (datetime(2024, 1, 1, tzinfo=timezone.utc), 1.3)):
+        rates = history.rates_at(when)
+        assert rates is not None and rates.rate("USD") == rate
+    assert RateHistory().rates_at(march) is None
+
+
+class MemoryRateStore:
+    def __init__(self, snapshots: list[tuple[datetime, dict[str, float]]] | None = None) -> None:
+        self.snapshots = snapshots or []
+        self.leading = False
+
+    def load_snapshots(self, after: datetime | None) -> list[tuple[datetime, dict[str, float]]]:
+        return [snapshot for snapshot in self.snapshots if after is None or snapshot[0] > after]
+
+    def try_lead(self, stale_before: datetime) -> Any:
+        if self.leading or (self.snapshots and self.snapshots[-1][0] >= stale_before):
+            return None
+        self.leading = True
+        return object()
+
+    def save(self, lease: Any, rates: dict[str, float], fetched_at: datetime, source: str) -> None:
+        self.snapshots.append((fetched_at, rates))
+
+    def release(self, lease: Any) -> None:
+        self.leading = False
+
+
+@pytest.fixture
+def restore_rates() -> Generator[None, None, None]:
+    rates, history = currency_utils.CURRENCY_CONVERSION_RATES, currency_utils._rate_history
+    currency_utils._set_rate_history(RateHistory())
+    yield
+    currency_utils._set_conversion_rates(rates)
+    currency_utils._set_rate_history(history)
+
+
+def run_against_server(
+    handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+    scenario: Callable[[str, aiohttp.ClientSession], Awaitable[None]],
+) -> None:
+    """Run `scenario` with the URL of a local stand-in for the rates API"""
+    async def main() -> None:
+        app = web.Application()
+        app.router.add_get("/latest/SGD", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            async with aiohttp.ClientSession() as session:
+                await scenario(f"http://127.0.0.1:{port}/latest/SGD", session)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(main())
+
+
+def test_refresher_writes_and_loads_snapshots(restore_rates: None) -> None:
+    calls = []
+
+    async def handler(request: web.Request) -> web.Response:
+        calls.append(request)
+        return web.json_response({"result": "success", "rates": {"SGD": 1, "USD": 0.8, "THB": 25}})
+
+    store = MemoryRateStore([(utc_now() - timedelta(days=2), {"SGD": 1, "USD": 1.5})])
+
+    async def scenario(url: str, session: aiohttp.ClientSession) -> None:
+        refresher = CurrencyRateRefresher(url, store)
+        assert await refresher.refresh(session)
+        assert refresher.next_delay() == pytest.approx(refresher.interval, abs=5)
+        # Fresh rates are not fetched again
+        assert not await refresher.refresh(session)
+
+    run_against_server(handler, scenario)
+    assert len(calls) == 1
+    assert len(store.snapshots) == 2
+    assert get_conversion_rate("USD") == pytest.approx(1.25)
+    assert get_conversion_rate("THB") == pytest.approx(0.04)
+    assert rate_at("USD", utc_now() - timedelta(days=1)) == 1.5
+
+
+def test_refresher_follows_the_leader(restore_rates: None) -> None:
+    async def handler(request: web.Request) -> web.Response:
+        raise AssertionError("only the leader fetches")
+
+    store = MemoryRateStore()
+    store.leading = True
+
+    async def scenario(url: str, session: aiohttp.ClientSession) -> None:
+        refresher = CurrencyRateRefresher(url, store, retry_delay=2)
+        assert not await refresher.refresh(session)
+        assert refresher.next_delay() == 2
+        # The leader writes its snapshot, the follower picks it up
+        store.snapshots.append((utc_now(), {"SGD": 1, "USD": 0.5}))
+        store.leading = False
+        assert not await refresher.refresh(session)
+
+    run_against_server(handler, scenario)
+    assert get_conversion_rate("USD") == 0.5
+
+
+def test_refresher_backs_off_and_opens_circuit(restore_rates: None) -> None:
+    calls = []
+    store = MemoryRateStore()
+
+    async def handler(request: web.Request) -> web.Response:
+        calls.append(request)
+        return web.Response(status=503)
+
+    async def scenario(url: str, session: aiohttp.ClientSession) -> None:
+        refresher = CurrencyRateRefresher(url, store, retry_delay=1, failure_threshold=3, circuit_reset=60)
+        assert not await refresher.refresh(session)
+        assert refresher.next_delay() == 1
+        assert not await refresher.refresh(session)
+        assert refresher.next_delay() == 2
+        assert not await refresher.refresh(session)
+        assert refresher.next_delay() == pytest.approx(60, abs=1)
+        # While the circuit is open the API is not called
+        assert not await refresher.refresh(session)
+        assert len(calls) == 3
+
+    run_against_server(handler, scenario)
+    assert get_conversion_rate("USD") == DEFAULT_CONVERSION_RATES["USD"]
+    assert store.snapshots == [] and not store.leading
+
+
+def test_refresher_times_out(restore_rates: None) -> None:
+    async def handler(request: web.Request) -> web.Response:
+        await asyncio.sleep(5)
+        return web.json_response({"rates": {}})
+
+    async def scenario(url: str, session: aiohttp.ClientSession) -> None:
+        refresher = CurrencyRateRefresher(url, MemoryRateStore(), timeout=0.2)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert not await refresher.refresh(session)
+        assert loop.time() - started < 2
+        assert refresher.failures == 1
+
+    run_against_server(handler, scenario)
@@ -0,0 +1,41 @@
+import os
+from pathlib import Path
+
+from app.utilities.invoice_cache_utils import InvoiceDiskCache, invoice_cache_key
+
+
+def test_invoice_cache_key_depends_on_every_part() -> None:
+    key = invoice_cache_key("2025010001", "2025-01-01 00:00:00", "SGD", "v1")
+    assert key == invoice_cache_key("2025010001", "2025-01-01 00:00:00", "SGD", "v1")
+    assert key != invoice_cache_key("2025010001", "2025-01-01 00:00:00", "USD", "v1")
+    assert key != invoice_cache_key("2025010001", "2025-01-01 00:00:00", "SGD", "v2")
+
+
+def test_invoice_cache_get_put_invalidate(tmp_path: Path) -> None:
+    cache = InvoiceDiskCache(tmp_path, max_bytes=1024)
+    assert cache.get("1", "a") is None
+    cache.put("1", "a", b"invoice")
+    cache.put("1", "b", b"other invoice")
+    cache.put("2", "a", b"kept")
+    assert cache.get("1", "a") == b"invoice"
+
+    cache.invalidate("1")
+    assert cache.get("1", "a") is None
+    assert cache.get("1", "b") is None
+    assert cache.get("2", "a") == b"kept"
+
+
+def test_invoice_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = InvoiceDiskCache(tmp_path, max_bytes=250)
+    for order_id in ("1", "2"):
+        cache.put(order_id, "k", b"x" * 100)
+        path = tmp_path / order_id / "k.xlsx"
+        os.utime(path, (int(order_id), int(order_id)))
+
+    # Reading order 1 makes order 2 the least recently used
+    assert cache.get("1", "k") is not None
+    cache.put("3", "k", b"x" * 100)
+
+    assert cache.get("2", "k") is None
+    assert cache.get("1", "k") is not None
+    assert cache.get("3", "k") is not None
@@ -0,0 +1,55 @@
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from app.utilities.invoice_utils import (
+    LINES_PER_PAGE,
+    InvoiceData,
+    InvoiceLine,
+    render_invoice,
+)
+
+
+def make_invoice(line_count: int) -> InvoiceData:
+    return InvoiceData(
+        invoice_no="2025010001",
+        invoice_date="01-01-2025",
+        company="Acme",
+        phone="+65 0000 0000",
+        currency="SGD",
+        lines=tuple(
+            InvoiceLine(description=f"product-{i}", quantity=2, unit_price=1.255)
+            for i in range(line_count)
+        ),
+    )
+
+
+def test_render_invoice_single_page() -> None:
+    wb = load_workbook(BytesIO(render_invoice(make_invoice(3))))
+    assert wb.sheetnames == ["Invoice"]
+    sheet = wb["Invoice"]
+    assert sheet["G3"].value == "2025010001"
+    assert sheet["B7"].value == "Acme"
+    assert sheet["F14"].value == "UNIT PRICE (SGD)"
+    assert [sheet[f"C{row}"].value for row in (15, 17, 19, 21)] == [
+        "product-0",
+        "product-1",
+        "product-2",
+        None,
+    ]
+    assert sheet["F15"].value == 1.25
+    assert sheet["G15"].value == 2.51
+    assert sheet["G37"].value == "=SUM(G15:G36)"
+
+
+def test_render_invoice_overflow_pages() -> None:
+    wb = load_workbook(BytesIO(render_invoice(make_invoice(LINES_PER_PAGE * 2 + 1))))
+    assert wb.sheetnames == ["Invoice", "Invoice (2)", "Invoice (3)"]
+    last_page = wb["Invoice (3)"]
+    assert last_page["B15"].value == LINES_PER_PAGE * 2 + 1
+    assert last_page["C17"].value is None
+    assert last_page["G37"].value == (
+        "=SUM('Invoice'!G15:G36,'Invoice (2)'!G15:G36,'Invoice (3)'!G15:G36)"
+    )
+    assert wb["Invoice"]["F37"].value == "Page 1 of 3"
+    assert wb["Invoice"]["G37"].value is None
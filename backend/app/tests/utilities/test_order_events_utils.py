@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+from sqlmodel import Session
+
+from app.core.db import engine
+from app.utilities import order_events_utils
+from app.utilities.order_events_utils import (
+    RESYNC_EVENT,
+    OrderEventBroker,
+    format_sse,
+    notify_order_changed,
+    notify_orders_changed,
+)
+
+CONNINFO = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def test_committed_order_events_reach_subscribers() -> None:
+    async def scenario() -> None:
+        broker = OrderEventBroker(queue_size=8)
+        listener = asyncio.create_task(broker.run(CONNINFO))
+        try:
+            await asyncio.wait_for(broker.listening.wait(), 5)
+            async with broker.subscribe() as first, broker.subscribe() as second:
+                assert broker.subscriber_count == 2
+                with Session(engine) as session:
+                    notify_order_changed(session, "rolled-back", "updated")
+                    session.rollback()
+                    notify_order_changed(session, "2025010001", "updated")
+                    session.commit()
+                for queue in (first, second):
+                    event = await asyncio.wait_for(queue.get(), 5)
+                    assert event["id"] == "2025010001"
+                    assert event["action"] == "updated"
+                    assert event["version"] > 0
+                    assert queue.empty()
+            assert broker.subscriber_count == 0
+        finally:
+            listener.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_bulk_order_events(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(order_events_utils, "MAX_BULK_EVENTS", 2)
+
+    async def scenario() -> None:
+        broker = OrderEventBroker(queue_size=8)
+        listener = asyncio.create_task(broker.run(CONNINFO))
+        try:
+            await asyncio.wait_for(broker.listening.wait(), 5)
+            async with broker.subscribe() as queue:
+                with Session(engine) as session:
+                    notify_orders_changed(session, ["1", "2"], "deleted")
+                    notify_orders_changed(session, ["3", "4", "5"], "updated")
+                    session.commit()
+                events = [await asyncio.wait_for(queue.get(), 5) for _ in range(3)]
+                assert [(event.get("id"), event["action"]) for event in events] == [
+                    ("1", "deleted"), ("2", "deleted"), (None, "resync"),
+                ]
+        finally:
+            listener.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_gets_resync() -> None:
+    async def scenario() -> None:
+        broker = OrderEventBroker(queue_size=2)
+        async with broker.subscribe() as queue:
+            for order_id in ("1", "2", "3"):
+                broker.publish({"id": order_id, "action": "created"})
+            assert queue.qsize() == 1
+            assert queue.get_nowait() == RESYNC_EVENT
+
+    asyncio.run(scenario())
+
+
+def test_format_sse() -> None:
+    assert format_sse({"id": "1", "action": "deleted"}) == (
+        b'event: deleted\ndata: {"id": "1", "action": "deleted"}\n\n'
+    )
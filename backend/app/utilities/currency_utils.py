@@ -1,7 +1,17 @@
 import aiohttp
 import asyncio
 from datetime import datetime, timedelta
+from bisect import bisect_right
+from collections.abc import Iterable, Mapping, Sequence
+import hashlib
+import json
 import logging
+from typing import Any, Protocol
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from app.utilities.datetime_utils import utc_now
 
 # Default currency conversion rates to SGD (fallback if API fails)
 DEFAULT_CONVERSION_RATES = {
@@ -24,96 +34,288 @@ CURRENCY_CONVERSION_RATES = DEFAULT_CONVERSION_RATES.copy()
 # API endpoint for currency conversion rates
 CURRENCY_API_URL = 'https://open.er-api.com/v6/latest/SGD'
 
-# Last update timestamp
-last_update = None
-
 # Update interval (24 hours)
 UPDATE_INTERVAL = timedelta(hours=24)
 
 logger = logging.getLogger(__name__)
 
-async def fetch_currency_rates():
-    """Fetches the latest currency conversion rates from the API"""
-    global CURRENCY_CONVERSION_RATES, last_update
-    
+
+class UnknownCurrencyError(ValueError):
+    def __init__(self, currency: object) -> None:
+        super().__init__(f"Unknown currency {currency}")
+        self.currency = currency
+
+
+class CurrencyRates:
+    """
+    Immutable cross-rate matrix of a set of rates to SGD. matrix[i, j] is the
+    value in currency j of one unit of currency i, so a conversion is one
+    multiplication by an element picked by the currency indexes.
+    """
+
+    def __init__(self, rates_to_sgd: Mapping[str, float]) -> None:
+        self.codes = tuple(sorted(code.upper() for code in rates_to_sgd))
+        self._index = {code: i for i, code in enumerate(self.codes)}
+        to_sgd = np.array([rates_to_sgd[code] for code in sorted(rates_to_sgd, key=str.upper)], dtype=float)
+        matrix = to_sgd[:, np.newaxis] / to_sgd[np.newaxis, :]
+        matrix.flags.writeable = False
+        self.matrix = matrix
+        self._sgd = self._index["SGD"]
+
+    def __contains__(self, currency: object) -> bool:
+        return isinstance(currency, str) and currency.upper() in self._index
+
+    def index(self, currencies: ArrayLike) -> np.ndarray:
+        """Matrix indexes of an array (or a single code) of currency codes,
+        each distinct code is looked up once"""
+        currencies = np.asarray(currencies, dtype=object)
+        unique, inverse = np.unique(currencies.ravel(), return_inverse=True)
+        positions = np.empty(len(unique), dtype=np.intp)
+        for i, currency in enumerate(unique):
+            position = self._index.get(currency.upper()) if isinstance(currency, str) else None
+            if position is None:
+                raise UnknownCurrencyError(currency)
+            positions[i] = position
+        return positions[inverse].reshape(currencies.shape)
+
+    def convert(self, amounts: ArrayLike, from_currencies: ArrayLike, to_currencies: ArrayLike) -> np.ndarray:
+        """
+        Convert amounts element-wise, currencies are arrays of codes or single
+        codes broadcast over the amounts. Raises UnknownCurrencyError.
+        """
+        rates = self.matrix[self.index(from_currencies), self.index(to_currencies)]
+        converted: np.ndarray = np.asarray(amounts, dtype=float) * rates
+        return converted
+
+    def rate(self, currency: str) -> float:
+        """Value in SGD of one unit of `currency`"""
+        return float(self.matrix[self.index(currency), self._sgd])
+
+
+class RateHistory:
+    """
+    Immutable, time ordered list of rate snapshots for point in time lookups.
+    A time before the first snapshot gets the first one, the closest known.
+    """
+
+    def __init__(self, snapshots: Sequence[tuple[datetime, CurrencyRates]] = ()) -> None:
+        self._times = tuple(fetched_at for fetched_at, _ in snapshots)
+        self._rates = tuple(rates for _, rates in snapshots)
+
+    @property
+    def last_fetched_at(self) -> datetime | None:
+        return self._times[-1] if self._times else None
+
+    def extend(self, snapshots: Sequence[tuple[datetime, CurrencyRates]]) -> "RateHistory":
+        """A new history with later snapshots appended"""
+        return RateHistory([*zip(self._times, self._rates, strict=True), *snapshots])
+
+    def rates_at(self, when: datetime) -> CurrencyRates | None:
+        if not self._times:
+            return None
+        return self._rates[max(bisect_right(self._times, when) - 1, 0)]
+
+
+# Swapped as a whole when the rates change, readers never see a partial update
+_currency_rates = CurrencyRates(CURRENCY_CONVERSION_RATES)
+_rate_history = RateHistory()
+
+def get_currency_rates() -> CurrencyRates:
+    return _currency_rates
+
+def get_rates_at(when: datetime | None) -> CurrencyRates:
+    """The rates in effect at `when` (an aware datetime), the current rates
+    when it is unknown or no history is loaded"""
+    rates = _rate_history.rates_at(when) if when is not None else None
+    return rates or _currency_rates
+
+def rate_at(currency: str, when: datetime | None) -> float:
+    """Value in SGD of one unit of `currency` at `when`, raises UnknownCurrencyError"""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(CURRENCY_API_URL, ssl=False) as response:
-                if response.status != 200:
-                    raise aiohttp.ClientError(f"API error: {response.status}")
-                
-                data = await response.json()
-                
-                # The API returns rates from base currency to others
-                # We need to invert them as our system uses rates TO SGD
-                rates = {}
-                
-                # Set SGD base rate
-                rates['SGD'] = 1.0
-                
-                # Convert other currencies
-                for currency, rate in data['rates'].items():
-                    if currency != 'SGD':
-                        # Invert the rate to get X to SGD conversion
-                        rates[currency] = 1 / rate
-                
-                # Update the global conversion rates
-                CURRENCY_CONVERSION_RATES.update(rates)
-                last_update = datetime.now()
-                
-                logger.info('Currency rates updated successfully')
-    except Exception as e:
-        logger.error(f'Failed to fetch currency rates: {str(e)}')
-        logger.info('Using default currency rates as fallback')
-        # Keep using the default rates if API fails
-        CURRENCY_CONVERSION_RATES = DEFAULT_CONVERSION_RATES.copy()
+        return get_rates_at(when).rate(currency)
+    except UnknownCurrencyError:
+        # Currencies the API added since are only known at the current rate
+        return _currency_rates.rate(currency)
+
+def _set_conversion_rates(rates: dict[str, float]) -> None:
+    global CURRENCY_CONVERSION_RATES, _currency_rates
+    _currency_rates = CurrencyRates(rates)
+    CURRENCY_CONVERSION_RATES = rates
+
+def _set_rate_history(history: RateHistory) -> None:
+    global _rate_history
+    _rate_history = history
+
+def get_rates_version() -> str:
+    """
+    Short fingerprint of the active conversion rates. It only depends on the
+    rates themselves, so every worker process holding the same rates agrees on it.
+    """
+    rates = json.dumps(sorted(CURRENCY_CONVERSION_RATES.items()))
+    return hashlib.sha256(rates.encode()).hexdigest()[:16]
 
 def get_conversion_rate(currency: str) -> float:
-    """Gets the conversion rate for a specific currency to SGD"""
-    # Ensure currency is uppercase
-    currency = currency.upper()
-    return CURRENCY_CONVERSION_RATES.get(currency, CURRENCY_CONVERSION_RATES['USD'])
+    """Gets the conversion rate for a specific currency to SGD, raises UnknownCurrencyError"""
+    return get_currency_rates().rate(currency)
+
+def get_rate_snapshot(currencies: Iterable[str]) -> dict[str, float]:
+    """The current rates to SGD of the given currencies, plus SGD itself"""
+    rates = get_currency_rates()
+    return {currency.upper(): rates.rate(currency) for currency in {"SGD", *currencies}}
 
 def convert_to_sgd(amount: float, currency: str) -> float:
     """Converts an amount from the specified currency to SGD"""
-    rate = get_conversion_rate(currency)
-    return amount * rate
+    return float(get_currency_rates().convert(amount, currency, "SGD"))
 
 def convert_to_target_currency(amount: float, original_currency: str, target_currency: str) -> float:
-    """Converts an amount from the specified currency to SGD"""
-    rate = get_conversion_rate(original_currency)
-    sgd_value = amount * rate
-
-    """Converts an amount from SGD to the specified currency"""
-    rate2 = get_conversion_rate(target_currency)
-    target_currency_value = sgd_value / rate2
-    
-    return target_currency_value
-
-async def update_rates_if_needed():
-    """Updates the currency rates if the last update was more than UPDATE_INTERVAL ago"""
-    global last_update
-    
-    if last_update is None or datetime.now() - last_update > UPDATE_INTERVAL:
-        await fetch_currency_rates()
-
-# Initialize currency rates
-def initialize_currency_service():
-    """Initializes the currency service by fetching the initial rates"""
-    try:
-        # Try to get the current event loop
-        loop = asyncio.get_event_loop()
-        if loop.is_running():
-            # If we're in an async context, create a task
-            asyncio.create_task(fetch_currency_rates())
-        else:
-            # If we're not in an async context but have a loop
-            loop.run_until_complete(fetch_currency_rates())
-    except RuntimeError:
-        # No event loop exists, create one and run the coroutine
-        asyncio.run(fetch_currency_rates())
-    except Exception as e:
-        logger.error(f"Error initializing currency service: {str(e)}")
-        # Fall back to default rates
-        global CURRENCY_CONVERSION_RATES
-        CURRENCY_CONVERSION_RATES = DEFAULT_CONVERSION_RATES.copy()
\ No newline at end of file
+    """Converts an amount from the specified currency to the target currency"""
+    return float(get_currency_rates().convert(amount, original_currency, target_currency))
+
+def parse_api_rates(data: dict[str, Any]) -> dict[str, float]:
+    """
+    The API returns rates from SGD to other currencies, they are inverted
+    as the rates used here are TO SGD
+    """
+    rates = {"SGD": 1.0}
+    for currency, rate in data["rates"].items():
+        if currency != "SGD" and rate:
+            rates[currency.upper()] = 1 / float(rate)
+    return rates
+
+
+class ExchangeRateStore(Protocol):
+    """Shared storage of the rate snapshots of every worker"""
+
+    def load_snapshots(self, after: datetime | None) -> list[tuple[datetime, dict[str, float]]]:
+        """Snapshots fetched after `after`, oldest first"""
+
+    def try_lead(self, stale_before: datetime) -> Any:
+        """
+        Become the one worker refreshing the rates, when the latest snapshot
+        was fetched before `stale_before` and no other worker leads. Returns
+        a lease for save and release, or None.
+        """
+
+    def save(self, lease: Any, rates: dict[str, float], fetched_at: datetime, source: str) -> None:
+        ...
+
+    def release(self, lease: Any) -> None:
+        ...
+
+
+class CurrencyRateRefresher:
+    """
+    Keeps the conversion rates of this worker in line with the snapshots in
+    the shared store, from a background task. Requests always use the rates
+    in place, a newer snapshot only swaps them.
+
+    When the latest snapshot is older than `interval`, one worker is elected
+    through the store to fetch the API and write the next snapshot, the others
+    pick it up from the store. Failed fetches are retried with exponential
+    backoff; after `failure_threshold` consecutive failures the circuit opens
+    and the API is left alone for `circuit_reset` seconds.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        store: ExchangeRateStore,
+        interval: float = UPDATE_INTERVAL.total_seconds(),
+        timeout: float = 10.0,
+        retry_delay: float = 5.0,
+        failure_threshold: int = 3,
+        circuit_reset: float = 15 * 60.0,
+    ) -> None:
+        self.url = url
+        self.store = store
+        self.interval = interval
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self.failure_threshold = failure_threshold
+        self.circuit_reset = circuit_reset
+        self.failures = 0
+        self.circuit_open_until: float | None = None
+
+    def load(self) -> None:
+        """Swap in the snapshots written since the last load, the latest becomes the current rates"""
+        snapshots = self.store.load_snapshots(_rate_history.last_fetched_at)
+        if not snapshots:
+            return
+        latest_rates = snapshots[-1][1]
+        _set_rate_history(_rate_history.extend([
+            (fetched_at, CurrencyRates({**DEFAULT_CONVERSION_RATES, **rates})) for fetched_at, rates in snapshots
+        ]))
+        _set_conversion_rates({**DEFAULT_CONVERSION_RATES, **latest_rates})
+        logger.info("Loaded currency rates fetched at %s", snapshots[-1][0])
+
+    def is_fresh(self) -> bool:
+        last_fetched_at = _rate_history.last_fetched_at
+        return last_fetched_at is not None and utc_now() - last_fetched_at < timedelta(seconds=self.interval)
+
+    async def fetch(self, session: aiohttp.ClientSession) -> dict[str, float] | None:
+        """One fetch attempt through the circuit breaker"""
+        loop = asyncio.get_running_loop()
+        if self.circuit_open_until is not None:
+            if loop.time() < self.circuit_open_until:
+                return None
+            # Half open, a single attempt decides whether it closes again
+            self.circuit_open_until = None
+        try:
+            async with session.get(self.url, timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                   ssl=False) as response:
+                if response.status != 200:
+                    raise aiohttp.ClientError(f"API error: {response.status}")
+                rates = parse_api_rates(await response.json())
+        except (aiohttp.ClientError, asyncio.TimeoutError, KeyError, TypeError, ValueError) as e:
+            self.failures += 1
+            logger.error(f"Failed to fetch currency rates ({self.failures} in a row): {str(e)!r}")
+            if self.failures >= self.failure_threshold:
+                self.circuit_open_until = loop.time() + self.circuit_reset
+                logger.warning("Currency rate fetches paused for %.0fs", self.circuit_reset)
+            return None
+        self.failures = 0
+        return rates
+
+    async def refresh(self, session: aiohttp.ClientSession) -> bool:
+        """Load new snapshots, and fetch and write one when the rates are
+        stale and this worker is elected. Returns whether it wrote one."""
+        await asyncio.to_thread(self.load)
+        if self.is_fresh():
+            return False
+        lease = await asyncio.to_thread(self.store.try_lead, utc_now() - timedelta(seconds=self.interval))
+        if lease is None:
+            return False
+        try:
+            rates = await self.fetch(session)
+            if rates is not None:
+                await asyncio.to_thread(self.store.save, lease, rates, utc_now(), self.url)
+        finally:
+            await asyncio.to_thread(self.store.release, lease)
+        if rates is None:
+            return False
+        await asyncio.to_thread(self.load)
+        logger.info("Currency rates updated successfully")
+        return True
+
+    def next_delay(self) -> float:
+        if self.circuit_open_until is not None:
+            return max(self.circuit_open_until - asyncio.get_running_loop().time(), 0)
+        if self.failures:
+            return min(self.retry_delay * 2.0 ** (self.failures - 1), self.interval)
+        last_fetched_at = _rate_history.last_fetched_at
+        if last_fetched_at is None or not self.is_fresh():
+            # Another worker is refreshing, pick its snapshot up shortly
+            return self.retry_delay
+        age = (utc_now() - last_fetched_at).total_seconds()
+        return max(self.interval - age, self.retry_delay)
+
+    async def run(self) -> None:
+        """Refresh until cancelled, over one pooled HTTP session"""
+        async with aiohttp.ClientSession() as session:
+            while True:
+                try:
+                    await self.refresh(session)
+                except Exception as e:
+                    # The store is unreachable, keep the rates in place
+                    logger.error(f"Failed to refresh currency rates: {str(e)}")
+                await asyncio.sleep(self.next_delay())
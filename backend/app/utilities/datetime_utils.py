@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+from typing import overload
+
+# Wire format of order timestamps, kept from when they were stored as strings
+ORDER_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def utc_now() -> datetime:
+    """Returns the current time as an aware UTC datetime"""
+    return datetime.now(timezone.utc)
+
+
+@overload
+def as_utc(value: datetime) -> datetime: ...
+@overload
+def as_utc(value: None) -> None: ...
+def as_utc(value: datetime | None) -> datetime | None:
+    """Treats naive datetimes as UTC and converts aware ones to UTC"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def format_order_date(value: datetime | None) -> str | None:
+    """Formats a timestamp in the "YYYY-MM-DD HH:MM:SS" API format (UTC)"""
+    if value is None:
+        return None
+    return as_utc(value).strftime(ORDER_DATE_FORMAT)
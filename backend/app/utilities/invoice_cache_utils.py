@@ -0,0 +1,108 @@
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+from urllib.parse import quote
+
+logger = logging.getLogger(__name__)
+
+
+def invoice_cache_key(*parts: object) -> str:
+    """
+    Content address of a rendered invoice: a hash of everything the rendered
+    file depends on. Two requests with the same key get byte-identical files.
+    """
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+
+
+class InvoiceDiskCache:
+    """
+    Rendered invoices on local disk, one directory per order so all entries of
+    an order can be dropped at once. Entries are evicted least recently used
+    first (a hit refreshes the file mtime) once the total size goes over
+    `max_bytes`.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Size on disk, None until the first write scans the directory
+        self._size: int | None = None
+
+    def _order_dir(self, order_id: str) -> Path:
+        return self.directory / quote(order_id, safe="")
+
+    def get(self, order_id: str, key: str) -> bytes | None:
+        path = self._order_dir(order_id) / f"{key}.xlsx"
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return content
+
+    def put(self, order_id: str, key: str, content: bytes) -> None:
+        order_dir = self._order_dir(order_id)
+        path = order_dir / f"{key}.xlsx"
+        try:
+            order_dir.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so readers never see a partial file
+            tmp_path = order_dir / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+            tmp_path.write_bytes(content)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"Failed to cache invoice of order {order_id}: {str(e)}")
+            return
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(content)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def invalidate(self, order_id: str) -> None:
+        """Drop every cached invoice of an order"""
+        order_dir = self._order_dir(order_id)
+        if not order_dir.is_dir():
+            return
+        with self._lock:
+            for path in order_dir.iterdir():
+                try:
+                    size = path.stat().st_size
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                if self._size is not None:
+                    self._size -= size
+            try:
+                order_dir.rmdir()
+            except OSError:
+                pass
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for path in self.directory.glob("*/*.xlsx"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        # Rescan rather than trust the running total, other processes share the directory
+        entries = sorted(self._entries())
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+        self._size = size
@@ -0,0 +1,216 @@
+import json
+import logging
+import multiprocessing
+import pickle
+import time
+import zipfile
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+from openpyxl import load_workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+INVOICE_TEMPLATE_PATH = Path(__file__).resolve().parent.parent / "Invoice_Template.xlsx"
+INVOICE_SHEET = "Invoice"
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Line items are written on every other row between the header and the total
+LINE_ROWS = range(15, 36, 2)
+LINES_PER_PAGE = len(LINE_ROWS)
+TOTAL_LABEL_CELL = "F37"
+TOTAL_CELL = "G37"
+TOTAL_RANGE = "G15:G36"
+
+# Log export progress every this many invoices
+PROGRESS_LOG_INTERVAL = 100
+
+logger = logging.getLogger(__name__)
+
+_invoice_pool: ProcessPoolExecutor | None = None
+
+
+@dataclass(frozen=True)
+class InvoiceLine:
+    description: str
+    quantity: float
+    unit_price: float
+
+
+@dataclass(frozen=True)
+class InvoiceData:
+    """Everything an invoice shows, with prices already in the invoice currency"""
+
+    invoice_no: str
+    invoice_date: str
+    company: str | None
+    phone: str | None
+    currency: str
+    lines: tuple[InvoiceLine, ...]
+
+
+@lru_cache(maxsize=1)
+def _template_snapshot() -> bytes:
+    """Parses the template once per process and keeps it as a pickle, which
+    is several times cheaper to restore than parsing the xlsx again"""
+    return pickle.dumps(load_workbook(INVOICE_TEMPLATE_PATH))
+
+
+def _fill_page(sheet: Worksheet, invoice: InvoiceData, lines: tuple[InvoiceLine, ...], first_item: int) -> None:
+    sheet["G2"] = invoice.invoice_date
+    sheet["G3"] = invoice.invoice_no
+    sheet["B7"] = invoice.company
+    sheet["C11"] = invoice.phone
+    sheet["F14"] = f"UNIT PRICE ({invoice.currency})"
+    sheet["G14"] = f"SUBTOTAL ({invoice.currency})"
+
+    for item_count, (row, line) in enumerate(zip(LINE_ROWS, lines, strict=False), start=first_item):
+        sheet[f"B{row}"] = item_count
+        sheet[f"C{row}"] = line.description
+        sheet[f"E{row}"] = line.quantity
+        sheet[f"F{row}"] = round(line.unit_price, 2)
+        sheet[f"G{row}"] = round(line.quantity * line.unit_price, 2)
+
+
+def render_invoice(invoice: InvoiceData) -> bytes:
+    """
+    Renders an invoice to xlsx bytes. Orders with more lines than fit on the
+    template get overflow pages, each a copy of the template sheet; the total
+    cell of the last page sums the line subtotals of every page.
+    """
+    wb = pickle.loads(_template_snapshot())
+    template = wb[INVOICE_SHEET]
+
+    pages = [
+        invoice.lines[start:start + LINES_PER_PAGE]
+        for start in range(0, len(invoice.lines), LINES_PER_PAGE)
+    ] or [()]
+    sheets = [template]
+    for page_no in range(2, len(pages) + 1):
+        sheet = wb.copy_worksheet(template)
+        sheet.title = f"{INVOICE_SHEET} ({page_no})"
+        sheet.print_area = template.print_area
+        sheets.append(sheet)
+
+    for page_no, (sheet, lines) in enumerate(zip(sheets, pages, strict=True)):
+        _fill_page(sheet, invoice, lines, first_item=page_no * LINES_PER_PAGE + 1)
+
+    if len(sheets) > 1:
+        for page_no, sheet in enumerate(sheets[:-1], start=1):
+            sheet[TOTAL_LABEL_CELL] = f"Page {page_no} of {len(sheets)}"
+            sheet[TOTAL_CELL] = None
+        sheets[-1][TOTAL_CELL] = "=SUM({})".format(
+            ",".join(f"'{sheet.title}'!{TOTAL_RANGE}" for sheet in sheets)
+        )
+
+    output = BytesIO()
+    wb.save(output)
+    return output.getvalue()
+
+
+def get_invoice_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Returns the process pool used for bulk rendering, created on first use.
+    Workers are spawned rather than forked so they do not inherit the
+    server's threads and database connections.
+    """
+    global _invoice_pool
+    if _invoice_pool is None:
+        _invoice_pool = ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _invoice_pool
+
+
+class _ZipChunkBuffer:
+    """Write-only, unseekable file object collecting what ZipFile writes, so
+    the archive can be streamed out while it is being assembled"""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+        self._position = 0
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_invoice_zip(
+    invoices: Iterable[InvoiceData], pool: ProcessPoolExecutor, max_pending: int
+) -> Iterator[bytes]:
+    """
+    Renders invoices in the process pool and yields a ZIP archive of them
+    chunk by chunk, adding each invoice as soon as it is rendered. At most
+    `max_pending` invoices are queued at a time, which bounds memory. The
+    archive ends with export_summary.json holding the throughput figures.
+    """
+    buffer = _ZipChunkBuffer()
+    started = time.perf_counter()
+    rendered = 0
+    failed: list[str] = []
+    pending: dict[Future[bytes], InvoiceData] = {}
+    invoice_iter = iter(invoices)
+
+    def report_progress() -> float:
+        elapsed = time.perf_counter() - started
+        rate = rendered / elapsed if elapsed else 0.0
+        logger.info("Exported %d invoices in %.1fs (%.1f invoices/s)", rendered, elapsed, rate)
+        return rate
+
+    # xlsx files are already deflated, storing them avoids compressing twice
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_pending:
+                invoice = next(invoice_iter, None)
+                if invoice is None:
+                    exhausted = True
+                else:
+                    pending[pool.submit(render_invoice, invoice)] = invoice
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                invoice = pending.pop(future)
+                try:
+                    content = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to render invoice {invoice.invoice_no}: {str(e)}")
+                    failed.append(invoice.invoice_no)
+                    continue
+                archive.writestr(
+                    f"Invoice_{invoice.invoice_no}_{invoice.invoice_date}.xlsx", content
+                )
+                rendered += 1
+                if rendered % PROGRESS_LOG_INTERVAL == 0:
+                    report_progress()
+            yield buffer.drain()
+
+        elapsed = time.perf_counter() - started
+        summary = {
+            "rendered": rendered,
+            "failed": failed,
+            "seconds": round(elapsed, 3),
+            "invoices_per_second": round(report_progress(), 2),
+        }
+        archive.writestr("export_summary.json", json.dumps(summary, indent=2))
+    yield buffer.drain()
@@ -0,0 +1,133 @@
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+import psycopg
+from sqlalchemy import String, Text, bindparam, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlmodel import Session
+
+ORDER_EVENTS_CHANNEL = "orders_changed"
+
+# Sent instead of the events a subscriber missed, it should reload the list
+RESYNC_EVENT = {"action": "resync"}
+
+# Bulk writes touching more orders than this send a single resync event
+# instead of one event per order
+MAX_BULK_EVENTS = 100
+
+# Seconds to wait before reconnecting a lost LISTEN connection
+RECONNECT_DELAY = 1.0
+MAX_RECONNECT_DELAY = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+def notify_order_changed(session: Session, order_id: str, action: str) -> None:
+    """
+    Queue an order change event in the session's transaction. Postgres
+    delivers it on commit and drops it on rollback. The version is the
+    transaction id, which is the row_version the order is written with.
+    """
+    payload = func.json_build_object(
+        "id", literal(order_id), "action", literal(action), "version", func.txid_current()
+    )
+    session.exec(select(func.pg_notify(ORDER_EVENTS_CHANNEL, cast(payload, Text))))  # type: ignore
+
+
+def notify_orders_changed(session: Session, order_ids: list[str], action: str) -> None:
+    """
+    Queue the change events of a bulk write in the session's transaction,
+    one per order in a single statement, or a resync event when more than
+    MAX_BULK_EVENTS orders changed.
+    """
+    if not order_ids:
+        return
+    if len(order_ids) > MAX_BULK_EVENTS:
+        notify_orders_resync(session)
+        return
+    ids = (
+        func.unnest(bindparam("order_ids", order_ids, type_=ARRAY(String)))
+        .table_valued("order_id")
+        .render_derived(name="ids")
+    )
+    payload = func.json_build_object(
+        "id", ids.c.order_id, "action", literal(action), "version", func.txid_current()
+    )
+    session.exec(select(func.pg_notify(ORDER_EVENTS_CHANNEL, cast(payload, Text))).select_from(ids)).all()  # type: ignore
+
+
+def notify_orders_resync(session: Session) -> None:
+    """Queue a resync event in the session's transaction, for writes too large to list"""
+    session.exec(select(func.pg_notify(ORDER_EVENTS_CHANNEL, json.dumps(RESYNC_EVENT))))  # type: ignore
+
+
+class OrderEventBroker:
+    """
+    Fans the order change notifications of one LISTEN connection out to the
+    subscribers of this process. Every subscriber has a bounded queue; when
+    it falls that far behind its queue is replaced by a single resync event,
+    so memory stays bounded however slow a client is.
+    """
+
+    def __init__(self, queue_size: int) -> None:
+        self.queue_size = queue_size
+        self._subscribers: set[asyncio.Queue[dict[str, Any]]] = set()
+        self.listening = asyncio.Event()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue[dict[str, Any]]]:
+        queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        try:
+            yield queue
+        finally:
+            self._subscribers.discard(queue)
+
+    def publish(self, event: dict[str, Any]) -> None:
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(RESYNC_EVENT)
+
+    async def run(self, conninfo: str) -> None:
+        """
+        Listen on the order channel until cancelled, reconnecting with
+        backoff when the connection is lost. Events sent while disconnected
+        are lost, so subscribers are told to resync after a reconnect.
+        """
+        delay = RECONNECT_DELAY
+        reconnecting = False
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as connection:
+                    await connection.execute(f"LISTEN {ORDER_EVENTS_CHANNEL}")
+                    self.listening.set()
+                    delay = RECONNECT_DELAY
+                    if reconnecting:
+                        self.publish(RESYNC_EVENT)
+                    async for notify in connection.notifies():
+                        try:
+                            self.publish(json.loads(notify.payload))
+                        except ValueError:
+                            logger.warning("Ignoring malformed order event %r", notify.payload)
+            except psycopg.Error as e:
+                logger.error(f"Order event listener disconnected: {str(e)}")
+            self.listening.clear()
+            reconnecting = True
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+
+def format_sse(event: dict[str, Any]) -> bytes:
+    return f"event: {event['action']}\ndata: {json.dumps(event)}\n\n".encode()
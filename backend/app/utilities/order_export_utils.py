@@ -0,0 +1,72 @@
+import csv
+import json
+import tempfile
+from collections.abc import Iterable, Iterator
+from io import StringIO
+from itertools import islice
+from typing import Any
+
+from openpyxl import Workbook
+
+from app.utilities.invoice_utils import XLSX_MEDIA_TYPE
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "xlsx": XLSX_MEDIA_TYPE,
+}
+
+# Rows are encoded and handed to the response this many at a time
+EXPORT_BATCH_SIZE = 1000
+XLSX_READ_SIZE = 64 * 1024
+
+
+def _cell(value: Any) -> Any:
+    # Spreadsheet cells hold scalars, nested values such as the rate snapshot are written as JSON
+    return json.dumps(value) if isinstance(value, dict | list) else value
+
+
+def _batches(rows: Iterable[dict[str, Any]]) -> Iterator[list[dict[str, Any]]]:
+    rows = iter(rows)
+    while batch := list(islice(rows, EXPORT_BATCH_SIZE)):
+        yield batch
+
+
+def stream_csv(rows: Iterable[dict[str, Any]], columns: list[str]) -> Iterator[bytes]:
+    buffer = StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    for batch in _batches(rows):
+        writer.writerows({column: _cell(row.get(column)) for column in columns} for row in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def stream_ndjson(rows: Iterable[dict[str, Any]]) -> Iterator[bytes]:
+    for batch in _batches(rows):
+        yield "".join(json.dumps(row) + "\n" for row in batch).encode()
+
+
+def stream_xlsx(rows: Iterable[dict[str, Any]], columns: list[str]) -> Iterator[bytes]:
+    """
+    An xlsx file is a zip archive whose directory is only known at the end,
+    so the rows go through a write-only workbook, which keeps them in a
+    temporary file rather than in memory, and the file is streamed once saved.
+    """
+    wb = Workbook(write_only=True)
+    sheet = wb.create_sheet("Orders")
+    sheet.append(columns)
+    for batch in _batches(rows):
+        for row in batch:
+            sheet.append([_cell(row.get(column)) for column in columns])
+        # Hand control back between batches like the other formats do
+        yield b""
+
+    with tempfile.TemporaryFile() as output:
+        wb.save(output)
+        output.seek(0)
+        while chunk := output.read(XLSX_READ_SIZE):
+            yield chunk
@@ -0,0 +1,102 @@
+from collections.abc import Iterator
+from datetime import datetime
+from itertools import islice
+from typing import IO
+from zipfile import BadZipFile
+
+import pandas as pd
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+# Columns read from an order import file, order_items is the same
+# {"<product id>": <quantity>} JSON that POST /orders/ accepts
+IMPORT_COLUMNS = [
+    "customer_id",
+    "order_date",
+    "order_status",
+    "payment_status",
+    "notes",
+    "order_quantity",
+    "total_price",
+    "order_items",
+]
+TEXT_COLUMNS = ["order_status", "payment_status", "notes", "order_quantity", "order_items"]
+
+UUID_PATTERN = r"[0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}"
+
+# Spreadsheet row number of the first data row, after the header
+FIRST_DATA_ROW = 2
+
+
+def iter_order_frames(file: IO[bytes], filename: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Read an uploaded CSV or XLSX file `chunk_size` rows at a time, so memory
+    stays bounded whatever the file size. Frames are indexed by their
+    spreadsheet row number.
+    """
+    first_row = FIRST_DATA_ROW
+    for frame in _read_chunks(file, filename, chunk_size):
+        frame.index = pd.RangeIndex(first_row, first_row + len(frame))
+        first_row += len(frame)
+        yield frame
+
+
+def _read_chunks(file: IO[bytes], filename: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    if filename.lower().endswith(".xlsx"):
+        # Read only mode streams the sheet instead of loading the whole workbook
+        try:
+            wb = load_workbook(file, read_only=True, data_only=True)
+        except (BadZipFile, InvalidFileException, KeyError):
+            raise ValueError("Not a valid xlsx file")
+        try:
+            rows = wb.active.iter_rows(values_only=True)
+            header = [str(value).strip() if value is not None else "" for value in next(rows, ())]
+            while chunk := list(islice(rows, chunk_size)):
+                yield pd.DataFrame(chunk, columns=header, dtype=object)
+        finally:
+            wb.close()
+    elif filename.lower().endswith(".csv"):
+        yield from pd.read_csv(file, chunksize=chunk_size, dtype=str, keep_default_na=False,
+                               skipinitialspace=True)
+    else:
+        raise ValueError("Only .csv and .xlsx files can be imported")
+
+
+def validate_order_frame(frame: pd.DataFrame, now: datetime) -> tuple[pd.DataFrame, pd.Series]:
+    """
+    Validate and normalize one chunk of imported orders column by column.
+    Returns the normalized frame and a Series holding the first error of
+    every row, empty for valid rows.
+    """
+    frame = frame.reindex(columns=IMPORT_COLUMNS)
+    errors = pd.Series("", index=frame.index, dtype=object)
+
+    def fail(mask: pd.Series, message: str) -> None:
+        errors[mask & (errors == "")] = message
+
+    def text(column: str) -> pd.Series:
+        values = frame[column].astype(object).where(frame[column].notna(), "")
+        return values.astype(str).str.strip()
+
+    customer_id = text("customer_id")
+    fail(customer_id == "", "customer_id is required")
+    fail(~customer_id.str.fullmatch(UUID_PATTERN), "customer_id is not a valid customer id")
+
+    raw_date = frame["order_date"].astype(object).where(text("order_date") != "")
+    order_date = pd.to_datetime(raw_date, errors="coerce", utc=True, format="mixed")
+    fail(raw_date.notna() & order_date.isna(), "order_date is not a valid date")
+    order_date = order_date.fillna(pd.Timestamp(now))
+
+    raw_price = frame["total_price"].astype(object).where(text("total_price") != "")
+    total_price = pd.to_numeric(raw_price, errors="coerce")
+    fail(raw_price.notna() & total_price.isna(), "total_price is not a number")
+
+    result = pd.DataFrame({
+        "customer_id": customer_id,
+        "order_date": order_date,
+        "total_price": total_price.fillna(0).astype(float),
+    }, index=frame.index)
+    for column in TEXT_COLUMNS:
+        values = text(column)
+        result[column] = values.astype(object).where(values != "", None)
+    return result, errors